@@ -0,0 +1,339 @@
+"""
+Content-addressed upload storage
+Files are stored once per SHA-256 in the configured storage backend
+(app.storage) and shared by every FileUpload with the same content_hash,
+with a reference count on the blob.
+"""
+
+import hashlib
+import os
+from datetime import datetime
+from typing import Optional, Tuple
+
+from sqlalchemy import delete, or_, text, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.file_utils import UPLOAD_CHUNK_SIZE, remove_file_quietly
+from app.models.file import DocumentChunk, DocumentChunkTerm, FileBlob, FilePage, FileUpload
+from app.storage import STORAGE_BACKEND, LocalStorage, TextOnlyStorage, copy_between, get_storage, storage_key
+
+# Unreferenced blobs deleted / blobs relocated per transaction
+BLOB_GC_BATCH_SIZE = int(os.getenv("BLOB_GC_BATCH_SIZE", "100"))
+
+
+def hash_file(file_path: str) -> Tuple[str, int]:
+    """Return (sha256_hex, size_in_bytes) of a file on disk"""
+    sha256 = hashlib.sha256()
+    size = 0
+    with open(file_path, "rb") as f:
+        while chunk := f.read(UPLOAD_CHUNK_SIZE):
+            sha256.update(chunk)
+            size += len(chunk)
+    return sha256.hexdigest(), size
+
+
+def acquire_blob(session: Session, temp_path: str, content_hash: str, size: int, file_type: str) -> Tuple[FileBlob, bool]:
+    """
+    Take a reference on the blob for content_hash, storing temp_path if it is new
+
+    The temp file is consumed either way: put into storage for a new blob,
+    deleted for a duplicate. The blob row is inserted (or locked by the
+    ref_count update) before the object is stored, so the garbage
+    collector, which deletes under the same row lock, can never remove a
+    freshly stored object. Blocking (it may upload to S3); caller commits.
+
+    Args:
+        session: Database session
+        temp_path: File holding the uploaded bytes
+        content_hash: SHA-256 hex of the file
+        size: Size in bytes
+        file_type: File extension (pdf, docx, doc)
+
+    Returns:
+        (blob, created) - created is False when identical content was already stored
+    """
+    for _ in range(3):
+        existing = session.execute(
+            update(FileBlob)
+            .where(FileBlob.content_hash == content_hash)
+            .values(ref_count=FileBlob.ref_count + 1)
+            .returning(FileBlob.ref_count, FileBlob.storage_backend, FileBlob.storage_key)
+        ).first()
+        if existing:
+            # An unreferenced blob the collector hasn't reached yet is reused;
+            # re-store the bytes in case a failed collection removed them
+            backend = get_storage(existing.storage_backend)
+            if existing.ref_count == 1 and not backend.exists(existing.storage_key):
+                backend.put(existing.storage_key, temp_path)
+            else:
+                remove_file_quietly(temp_path)
+            return session.get(FileBlob, content_hash, populate_existing=True), False
+
+        blob = FileBlob(
+            content_hash=content_hash,
+            size=size,
+            file_type=file_type,
+            storage_backend=STORAGE_BACKEND,
+            storage_key=storage_key(content_hash),
+        )
+        try:
+            with session.begin_nested():
+                session.add(blob)
+        except IntegrityError:
+            # Another upload of the same content won the insert; take a reference instead
+            continue
+
+        get_storage(blob.storage_backend).put(blob.storage_key, temp_path)
+        return blob, True
+
+    raise RuntimeError(f"Could not acquire blob {content_hash}")
+
+
+def release_blob(session: Session, content_hash: Optional[str]):
+    """
+    Drop one reference to a blob
+
+    A blob whose count reaches zero is left for collect_unreferenced_blobs()
+    rather than deleted here: object stores can't rename a file aside until
+    commit, and a re-upload in the meantime simply takes the blob back.
+    Caller commits.
+    """
+    if not content_hash:
+        return
+
+    session.execute(
+        update(FileBlob)
+        .where(FileBlob.content_hash == content_hash, FileBlob.ref_count > 0)
+        .values(ref_count=FileBlob.ref_count - 1)
+    )
+
+
+def collect_unreferenced_blobs(batch_size: int = BLOB_GC_BATCH_SIZE) -> int:
+    """
+    Delete blobs no upload references any more: stored object, pages, index and row
+
+    Rows are locked with SKIP LOCKED, so replicas collect different blobs
+    and an upload taking a new reference waits for (then re-creates) a blob
+    being deleted. The object is deleted before the row is, so a failure
+    leaves the row for the next run rather than an orphaned object.
+    Blobs being extracted are skipped until the job finishes.
+
+    Returns:
+        Number of blobs deleted
+    """
+    deleted = 0
+    with Session(engine) as session:
+        while True:
+            blobs = session.exec(
+                select(FileBlob)
+                .where(FileBlob.ref_count <= 0, FileBlob.extraction_status != "processing")
+                .order_by(FileBlob.created_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not blobs:
+                break
+
+            removed = []
+            for blob in blobs:
+                try:
+                    get_storage(blob.storage_backend).delete(blob.storage_key)
+                    removed.append(blob.content_hash)
+                except Exception as e:
+                    print(f"Could not delete stored blob {blob.content_hash[:12]}: {e}")
+
+            if removed:
+                session.execute(delete(FilePage).where(FilePage.content_hash.in_(removed)))
+                session.execute(
+                    delete(DocumentChunkTerm).where(
+                        DocumentChunkTerm.chunk_id.in_(
+                            select(DocumentChunk.id).where(DocumentChunk.content_hash.in_(removed))
+                        )
+                    )
+                )
+                session.execute(delete(DocumentChunk).where(DocumentChunk.content_hash.in_(removed)))
+                session.execute(delete(FileBlob).where(FileBlob.content_hash.in_(removed)))
+            session.commit()
+            deleted += len(removed)
+
+            if len(removed) < len(blobs):
+                break  # Storage is failing; try again next run
+
+    return deleted
+
+
+def relocate_blobs(batch_size: int = BLOB_GC_BATCH_SIZE) -> int:
+    """
+    Move blobs to the current backend and sharded key layout
+
+    Covers blobs stored flat by earlier versions (uploads/blobs/<hash>) and
+    blobs left in local storage after switching STORAGE_BACKEND to s3.
+    Objects in another backend that this replica can't read (e.g. another
+    pod's local disk) are reported and skipped. Text-only blobs have no
+    object to move.
+
+    Returns:
+        Number of blobs moved
+    """
+    target = get_storage()
+    moved = 0
+    failed = set()
+
+    with Session(engine) as session:
+        while True:
+            statement = (
+                select(FileBlob)
+                .where(or_(FileBlob.storage_backend != target.name, ~FileBlob.storage_key.like("__/__/%")))
+                .where(FileBlob.storage_backend != TextOnlyStorage.name)
+                .order_by(FileBlob.content_hash)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            )
+            if failed:
+                statement = statement.where(FileBlob.content_hash.not_in(failed))
+            blobs = session.exec(statement).all()
+            if not blobs:
+                break
+
+            for blob in blobs:
+                source = get_storage(blob.storage_backend)
+                key = storage_key(blob.content_hash)
+                try:
+                    if isinstance(source, LocalStorage) and isinstance(target, LocalStorage):
+                        target.put(key, source.path(blob.storage_key))
+                    else:
+                        copy_between(source, blob.storage_key, target, key)
+                        source.delete(blob.storage_key)
+                except Exception as e:
+                    failed.add(blob.content_hash)
+                    print(f"Could not relocate blob {blob.content_hash[:12]}: {e}")
+                    continue
+
+                blob.storage_backend = target.name
+                blob.storage_key = key
+                session.add(blob)
+                session.execute(
+                    update(FileUpload).where(FileUpload.content_hash == blob.content_hash).values(file_path=key)
+                )
+                moved += 1
+            session.commit()
+
+    return moved
+
+
+def backfill_blobs(batch_size: int = 100) -> int:
+    """
+    Move uploads stored before the blob store into it
+
+    Legacy files (uploads/<uuid>.<ext>) are hashed if needed, moved into the
+    store (or deleted, if identical content is already there) and re-pointed.
+    Their blobs start out 'pending', so the extraction queue re-extracts them.
+    Rows whose file is missing on disk are left alone.
+
+    Returns:
+        Number of uploads moved
+    """
+    moved = 0
+    last_id = 0
+
+    with Session(engine) as session:
+        while True:
+            files = session.exec(
+                select(FileUpload)
+                .where(FileUpload.id > last_id)
+                .where(~select(FileBlob.content_hash).where(FileBlob.content_hash == FileUpload.content_hash).exists())
+                .order_by(FileUpload.id)
+                .limit(batch_size)
+            ).all()
+            if not files:
+                break
+
+            for file in files:
+                last_id = file.id
+                if not os.path.exists(file.file_path):
+                    continue
+
+                try:
+                    content_hash, size = hash_file(file.file_path)
+                    blob, _ = acquire_blob(session, file.file_path, content_hash, size, file.file_type)
+                    file.content_hash = content_hash
+                    file.file_path = blob.storage_key
+                    session.add(file)
+                    session.commit()
+                    moved += 1
+                except Exception as e:
+                    session.rollback()
+                    print(f"Blob backfill failed for file {file.id}: {e}")
+
+    return moved
+
+
+def restore_legacy_text(batch_size: int = 100) -> int:
+    """
+    Give uploads whose file is gone their legacy extracted text back
+
+    Before file_uploads.processed_content was dropped, its non-empty values
+    were copied to legacy_upload_texts (see MIGRATIONS). Run after
+    backfill_blobs(): uploads it moved into the store are re-extracted from
+    their file, so only uploads still without a blob need the saved text.
+    Each gets a text-only blob (keyed by the text's hash, in the "none"
+    storage backend: there is no file to store) holding the text as page 0
+    and marked extracted, so the chat index picks it up; downloading such
+    an upload answers 410 Gone. Rows are deleted once handled.
+
+    Returns:
+        Number of uploads given their text back
+    """
+    restored = 0
+
+    with Session(engine) as session:
+        try:
+            session.execute(text("SELECT 1 FROM legacy_upload_texts LIMIT 1"))
+        except Exception:
+            return 0  # No legacy data was ever saved
+        session.rollback()
+
+        while True:
+            rows = session.execute(
+                text("SELECT file_id, content FROM legacy_upload_texts ORDER BY file_id LIMIT :limit FOR UPDATE SKIP LOCKED"),
+                {"limit": batch_size}
+            ).all()
+            if not rows:
+                break
+
+            for row in rows:
+                upload = session.get(FileUpload, row.file_id)
+                has_blob = upload is not None and upload.content_hash is not None and (
+                    session.get(FileBlob, upload.content_hash) is not None
+                )
+
+                if upload is not None and not has_blob:
+                    content_hash = hashlib.sha256(row.content.encode("utf-8")).hexdigest()
+                    blob = session.get(FileBlob, content_hash)
+                    if blob is None:
+                        blob = FileBlob(
+                            content_hash=content_hash,
+                            size=upload.file_size,
+                            file_type=upload.file_type,
+                            storage_backend=TextOnlyStorage.name,
+                            storage_key=storage_key(content_hash),
+                            ref_count=0,
+                            extraction_status="done",
+                            processed_at=datetime.utcnow(),
+                            page_count=1,
+                            pages_extracted=1,
+                        )
+                        session.add(blob)
+                        session.add(FilePage(content_hash=content_hash, page_number=0, content=row.content))
+                    blob.ref_count += 1
+                    upload.content_hash = content_hash
+                    upload.processed = True
+                    session.add(upload)
+                    restored += 1
+
+                session.execute(text("DELETE FROM legacy_upload_texts WHERE file_id = :file_id"), {"file_id": row.file_id})
+            session.commit()
+
+    return restored
@@ -0,0 +1,269 @@
+"""
+Chat history context
+The conversation history sent with each chat message: a rolling summary of
+older messages (Conversation.summary) followed by the newest messages that
+fit a token budget. Once the unsummarized messages grow past a threshold
+or fill the history window, the summary is extended in the background by
+folding in, oldest first, only the messages added since the last run, so
+neither the prompt nor the summarization work per turn grows with the
+length of the conversation.
+"""
+
+import asyncio
+import os
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import update
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.metrics import PromptCacheStats
+from app.models.conversation import Conversation, Message
+
+# History in the prompt: the latest CHAT_HISTORY_MESSAGES unsummarized
+# messages are read, then the newest that fit in CHAT_HISTORY_TOKENS
+# (including the summary) are kept
+CHAT_HISTORY_MESSAGES = int(os.getenv("CHAT_HISTORY_MESSAGES", "50"))
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "3000"))
+
+# Summarize once the unsummarized messages pass CHAT_SUMMARY_TRIGGER_TOKENS
+# or fill the history window, folding in all but the newest
+# CHAT_SUMMARY_KEEP_TOKENS of them (and at most half a window), oldest
+# first, up to CHAT_SUMMARY_BATCH_TOKENS per model call
+CHAT_SUMMARY_TRIGGER_TOKENS = int(os.getenv("CHAT_SUMMARY_TRIGGER_TOKENS", "3000"))
+CHAT_SUMMARY_KEEP_TOKENS = int(os.getenv("CHAT_SUMMARY_KEEP_TOKENS", "1000"))
+CHAT_SUMMARY_BATCH_TOKENS = int(os.getenv("CHAT_SUMMARY_BATCH_TOKENS", "6000"))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+
+# Chat format overhead per message (role and separators), in tokens
+MESSAGE_TOKEN_OVERHEAD = 4
+
+SUMMARY_PROMPT = """You maintain the running summary of a conversation between a user and TaskFlow's task management assistant.
+
+Update the current summary with the new messages. Keep what the assistant may need later: the user's goals and preferences, tasks discussed (titles and ids), actions taken, decisions and open questions. Drop greetings and small talk. Write plain prose or short bullets, in the third person, and reply with the updated summary only."""
+
+# Prompt and cached tokens of chat model calls (admin chat-stats)
+prompt_cache_stats = PromptCacheStats()
+
+# Conversations being summarized by this process, and their tasks (kept
+# referenced so they aren't garbage collected mid-run)
+_summarizing: Set[int] = set()
+_tasks: Set[asyncio.Task] = set()
+
+
+def estimate_tokens(content: Optional[str]) -> int:
+    """
+    Estimate the prompt tokens a message takes
+
+    Local and cheap: about 4 characters or 3/4 of a word per token,
+    whichever is more, plus the per-message overhead. Only used to budget
+    the prompt, so being close is enough.
+    """
+    content = content or ""
+    return max((len(content) + 3) // 4, len(content.split()) * 4 // 3) + MESSAGE_TOKEN_OVERHEAD
+
+
+def _message_tokens(session: Session, message: Message) -> int:
+    """A message's token count, counting and caching it for rows stored before counts existed"""
+    if message.token_count is None:
+        message.token_count = estimate_tokens(message.content)
+        session.add(message)
+    return message.token_count
+
+
+def recent_messages(session: Session, conversation: Conversation) -> List[Message]:
+    """A conversation's latest messages not yet in its summary, newest first"""
+    statement = select(Message).where(Message.conversation_id == conversation.id)
+    if conversation.summary_through is not None:
+        statement = statement.where(Message.id > conversation.summary_through)
+    return session.exec(
+        statement.order_by(Message.created_at.desc(), Message.id.desc()).limit(CHAT_HISTORY_MESSAGES)
+    ).all()
+
+
+def load_history(session: Session, conversation: Conversation) -> Tuple[Optional[str], List[Message]]:
+    """
+    Summary and recent messages for a conversation's next prompt
+
+    Args:
+        session: Database session; newly counted token counts are saved
+            with its next commit
+        conversation: Conversation being continued
+
+    Returns:
+        (summary or None, messages in conversation order)
+    """
+    budget = CHAT_HISTORY_TOKENS
+    if conversation.summary:
+        budget -= estimate_tokens(conversation.summary)
+
+    history = []
+    used = 0
+    for message in recent_messages(session, conversation):
+        used += _message_tokens(session, message)
+        if used > budget:
+            break
+        history.append(message)
+
+    history.reverse()
+    return conversation.summary, history
+
+
+def _transcript_line(message: Message) -> str:
+    """One message as a line of the transcript given to the summarizer"""
+    speaker = "User" if message.role == "user" else "Assistant"
+    calls = (message.tool_calls or {}).get("calls") or []
+    tools = sorted({call["name"] for call in calls})
+    if not tools and (message.tool_calls or {}).get("tool"):
+        tools = [message.tool_calls["tool"]]
+    if tools:
+        speaker += f" (used {', '.join(tools)})"
+    return f"{speaker}: {message.content or ''}"
+
+
+def _messages_to_fold(conversation_id: int) -> Optional[Tuple[Optional[str], Optional[int], int, List[str]]]:
+    """
+    Pick the messages the next summary should fold in (blocking)
+
+    Folding is due when the unsummarized messages in the history window
+    pass CHAT_SUMMARY_TRIGGER_TOKENS, or fill the window (older ones would
+    otherwise drop out of the prompt unsummarized). The newest messages are
+    kept verbatim; everything before them is folded by id, from
+    summary_through up, so no message is ever skipped. One call folds at
+    most CHAT_SUMMARY_BATCH_TOKENS; summarize_conversation() repeats until
+    caught up.
+
+    Returns:
+        (current summary, its summary_through, id of the last message to
+        fold, transcript lines to fold), or None if nothing is due
+    """
+    with Session(engine) as session:
+        conversation = session.get(Conversation, conversation_id)
+        if conversation is None:
+            return None
+
+        recent = recent_messages(session, conversation)
+        tokens = [_message_tokens(session, message) for message in recent]
+        job = None
+
+        if sum(tokens) > CHAT_SUMMARY_TRIGGER_TOKENS or len(recent) >= CHAT_HISTORY_MESSAGES:
+            # Keep the newest messages verbatim, within CHAT_SUMMARY_KEEP_TOKENS
+            # and half a window, so a fold always makes room
+            kept = 0
+            split = 0
+            for count in tokens:
+                if kept + count > CHAT_SUMMARY_KEEP_TOKENS or split >= CHAT_HISTORY_MESSAGES // 2:
+                    break
+                kept += count
+                split += 1
+
+            statement = select(Message).where(Message.conversation_id == conversation.id)
+            if conversation.summary_through is not None:
+                statement = statement.where(Message.id > conversation.summary_through)
+            if split:
+                statement = statement.where(Message.id < recent[split - 1].id)
+
+            fold = []
+            folded_tokens = 0
+            for message in session.exec(statement.order_by(Message.id).limit(CHAT_HISTORY_MESSAGES)):
+                folded_tokens += _message_tokens(session, message)
+                if fold and folded_tokens > CHAT_SUMMARY_BATCH_TOKENS:
+                    break
+                fold.append(message)
+
+            if fold:
+                job = (
+                    conversation.summary,
+                    conversation.summary_through,
+                    fold[-1].id,
+                    [_transcript_line(message) for message in fold],
+                )
+
+        session.commit()
+        return job
+
+
+def _save_summary(conversation_id: int, previous_through: Optional[int], summary: str, through: int) -> bool:
+    """
+    Store a new summary, unless another run already replaced the one it extends
+
+    Returns:
+        True if stored
+    """
+    statement = update(Conversation).where(Conversation.id == conversation_id)
+    if previous_through is None:
+        statement = statement.where(Conversation.summary_through.is_(None))
+    else:
+        statement = statement.where(Conversation.summary_through == previous_through)
+
+    with Session(engine) as session:
+        saved = session.execute(statement.values(summary=summary, summary_through=through)).rowcount == 1
+        session.commit()
+        return saved
+
+
+async def summarize_conversation(client, model: str, conversation_id: int) -> int:
+    """
+    Fold older messages into the conversation's summary while folding is due
+
+    Args:
+        client: AsyncOpenAI client
+        model: Model for the summary
+        conversation_id: Conversation to compact
+
+    Returns:
+        Number of messages folded
+    """
+    folded = 0
+    while True:
+        job = await asyncio.to_thread(_messages_to_fold, conversation_id)
+        if job is None:
+            return folded
+        summary, previous_through, through, lines = job
+
+        response = await client.chat.completions.create(
+            model=model,
+            messages=[
+                {"role": "system", "content": SUMMARY_PROMPT},
+                {
+                    "role": "user",
+                    "content": f"Current summary:\n{summary or '(none yet)'}\n\nNew messages:\n" + "\n".join(lines)
+                }
+            ],
+            max_tokens=CHAT_SUMMARY_MAX_TOKENS
+        )
+        new_summary = (response.choices[0].message.content or "").strip()
+        if not new_summary:
+            return folded
+
+        # Another process extended the summary meanwhile; it carries on from there
+        if not await asyncio.to_thread(_save_summary, conversation_id, previous_through, new_summary, through):
+            return folded
+
+        folded += len(lines)
+        print(f"Conversation {conversation_id} summarized through message {through} ({len(lines)} messages folded)")
+
+
+async def _summarize_quietly(client, model: str, conversation_id: int):
+    try:
+        await summarize_conversation(client, model, conversation_id)
+    except Exception as e:
+        print(f"Summarizing conversation {conversation_id} failed: {e}")
+    finally:
+        _summarizing.discard(conversation_id)
+
+
+def schedule_summary(client, model: str, conversation_id: int):
+    """
+    Check and, if needed, extend a conversation's summary in the background
+
+    Call from the event loop after a reply is stored. Returns immediately;
+    at most one run per conversation is in flight in this process, and
+    _save_summary settles races between processes.
+    """
+    if conversation_id in _summarizing:
+        return
+    _summarizing.add(conversation_id)
+    task = asyncio.create_task(_summarize_quietly(client, model, conversation_id))
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
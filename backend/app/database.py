@@ -2,7 +2,7 @@
 Database connection and session management
 """
 
-from sqlmodel import create_engine, SQLModel, Session
+from sqlmodel import create_engine, SQLModel, Session, text
 from typing import Generator
 import os
 from dotenv import load_dotenv
@@ -10,7 +10,8 @@ from dotenv import load_dotenv
 # Import all models so SQLModel knows about them
 from app.models.user import User
 from app.models.task import Task
-from app.models.file import FileUpload, FilePermission, PermissionRequest
+from app.models.reminder import TaskReminder
+from app.models.file import FileUpload, FileBlob, FilePage, DocumentChunk, DocumentChunkTerm, UploadSession, UploadChunk, UserStorageUsage, FilePermission, PermissionRequest
 from app.models.conversation import Conversation, Message
 
 load_dotenv()
@@ -29,9 +30,107 @@ engine = create_engine(
 )
 
 
+# Idempotent upgrades for tables that already exist
+# (create_all only creates missing tables, it never alters existing ones)
+MIGRATIONS = [
+    # Multi-offset reminders
+    "ALTER TABLE tasks ADD COLUMN IF NOT EXISTS reminder_offsets JSON",
+    """
+    INSERT INTO task_reminders (task_id, fire_at, kind)
+    SELECT t.id, t.reminder_date, 'custom' FROM tasks t
+    WHERE t.reminder_date IS NOT NULL AND t.completed = false
+      AND NOT EXISTS (SELECT 1 FROM task_reminders r WHERE r.task_id = t.id)
+    """,
+    # Upload content hashes
+    "ALTER TABLE file_uploads ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64)",
+    "CREATE INDEX IF NOT EXISTS ix_file_uploads_content_hash ON file_uploads (content_hash)",
+    # Content-addressed blob store: extraction state and pages moved from
+    # file_uploads to file_blobs. Pages keyed by file_id from before are
+    # dropped; backfill_blobs() moves legacy files into the store and their
+    # blobs are re-extracted.
+    "ALTER TABLE file_pages ADD COLUMN IF NOT EXISTS content_hash VARCHAR(64) REFERENCES file_blobs (content_hash) ON DELETE CASCADE",
+    "ALTER TABLE file_pages DROP COLUMN IF EXISTS file_id",
+    "DELETE FROM file_pages WHERE content_hash IS NULL",
+    "ALTER TABLE file_pages ALTER COLUMN content_hash SET NOT NULL",
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_file_pages_hash_page ON file_pages (content_hash, page_number)",
+    "ALTER TABLE file_uploads DROP COLUMN IF EXISTS extraction_status",
+    "ALTER TABLE file_uploads DROP COLUMN IF EXISTS extraction_error",
+    "ALTER TABLE file_uploads DROP COLUMN IF EXISTS processed_at",
+    "ALTER TABLE file_uploads DROP COLUMN IF EXISTS page_count",
+    "ALTER TABLE file_uploads DROP COLUMN IF EXISTS pages_extracted",
+    # Storage backends: blobs are addressed by backend + key instead of a
+    # local path. Flat keys are moved to ab/cd/<hash> by relocate_blobs().
+    """
+    DO $$ BEGIN
+        IF EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'file_blobs' AND column_name = 'storage_path') THEN
+            ALTER TABLE file_blobs RENAME COLUMN storage_path TO storage_key;
+        END IF;
+    END $$
+    """,
+    "ALTER TABLE file_blobs ADD COLUMN IF NOT EXISTS storage_backend VARCHAR(20) NOT NULL DEFAULT 'local'",
+    "UPDATE file_blobs SET storage_key = content_hash WHERE storage_backend = 'local' AND storage_key NOT LIKE '__/__/%'",
+    # Per-user upload totals
+    """
+    INSERT INTO user_storage_usage (user_id, file_count, total_bytes, updated_at)
+    SELECT f.user_id, COUNT(*), COALESCE(SUM(f.file_size), 0), CURRENT_TIMESTAMP FROM file_uploads f
+    WHERE NOT EXISTS (SELECT 1 FROM user_storage_usage u WHERE u.user_id = f.user_id)
+    GROUP BY f.user_id
+    """,
+    # Extracted text lives only in file_pages, so file_uploads rows stay
+    # small. Legacy processed_content is kept in legacy_upload_texts first:
+    # uploads whose file is gone can't be re-extracted, and
+    # restore_legacy_text() gives them a blob with that text as page 0.
+    # Postgres already compresses large page values (TOAST); lz4 is cheaper
+    # to decompress than the default pglz (PostgreSQL 14+, applies to newly
+    # written pages).
+    """
+    DO $$ BEGIN
+        IF EXISTS (SELECT 1 FROM information_schema.columns
+                   WHERE table_name = 'file_uploads' AND column_name = 'processed_content') THEN
+            CREATE TABLE IF NOT EXISTS legacy_upload_texts (
+                file_id INTEGER PRIMARY KEY REFERENCES file_uploads (id) ON DELETE CASCADE,
+                content TEXT NOT NULL
+            );
+            INSERT INTO legacy_upload_texts (file_id, content)
+            SELECT f.id, f.processed_content FROM file_uploads f
+            WHERE f.processed_content IS NOT NULL AND f.processed_content <> ''
+            ON CONFLICT (file_id) DO NOTHING;
+        END IF;
+    END $$
+    """,
+    "ALTER TABLE file_uploads DROP COLUMN IF EXISTS processed_content",
+    "ALTER TABLE file_pages ALTER COLUMN content SET COMPRESSION lz4",
+    # Chat retrieval index; index_pending_blobs() chunks already extracted blobs
+    "ALTER TABLE file_blobs ADD COLUMN IF NOT EXISTS pages_indexed INTEGER NOT NULL DEFAULT 0",
+    # Chat history window: latest messages of a conversation by index, with
+    # cached token counts (older rows are counted on first use)
+    "ALTER TABLE messages ADD COLUMN IF NOT EXISTS token_count INTEGER",
+    "CREATE INDEX IF NOT EXISTS ix_messages_conversation_created ON messages (conversation_id, created_at)",
+    # Rolling conversation summaries
+    "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary TEXT",
+    "ALTER TABLE conversations ADD COLUMN IF NOT EXISTS summary_through INTEGER",
+    # Extraction leases: only jobs whose replica stopped renewing them are requeued
+    "ALTER TABLE file_blobs ADD COLUMN IF NOT EXISTS claimed_at TIMESTAMP",
+    # Daily digest claims, so only one replica mails each user per day
+    "ALTER TABLE users ADD COLUMN IF NOT EXISTS digest_sent_on DATE",
+]
+
+
+def run_migrations():
+    """Apply MIGRATIONS; each statement runs in its own transaction"""
+    for migration in MIGRATIONS:
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(migration))
+        except Exception as e:
+            print(f"[SKIP] Migration failed: {migration.strip()[:60]}... ({e})")
+
+
 def create_db_and_tables():
-    """Create all tables in the database"""
+    """Create all tables in the database and apply pending migrations"""
     SQLModel.metadata.create_all(engine)
+    run_migrations()
 
 
 def get_session() -> Generator[Session, None, None]:
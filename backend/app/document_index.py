@@ -0,0 +1,258 @@
+"""
+Document retrieval index
+Extracted pages are split into passages (document_chunks) with an inverted
+index of their terms (document_chunk_terms). Chat retrieves the passages
+most relevant to each message by BM25 over the user's own documents, so
+the prompt carries a bounded amount of relevant text from anywhere in a
+document instead of the first characters of every file.
+"""
+
+import heapq
+import math
+import os
+import re
+from collections import Counter, defaultdict
+from dataclasses import dataclass
+from typing import List, Tuple
+
+from sqlalchemy import func, insert
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.file_utils import chunk_text
+from app.models.file import DocumentChunk, DocumentChunkTerm, FileBlob, FilePage, FileUpload
+
+# Passage size in tokens (~4 characters each)
+DOCUMENT_CHUNK_TOKENS = int(os.getenv("DOCUMENT_CHUNK_TOKENS", "200"))
+
+# Passages added to the chat prompt per message
+DOCUMENT_CONTEXT_CHUNKS = int(os.getenv("DOCUMENT_CONTEXT_CHUNKS", "5"))
+
+# Pages chunked per transaction
+INDEX_PAGE_BATCH = 50
+
+# BM25 term-frequency saturation and length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Reciprocal rank fusion constant: damps the weight of the very top ranks
+RRF_K = 60
+
+TERM_PATTERN = re.compile(r"\w+")
+MAX_TERM_LENGTH = 64
+STOPWORDS = frozenset("""
+    a an and are as at be but by can did do does for from had has have he her his how i if in into is it its
+    me my no not of on or our she so than that the their them then there these they this to was we were what
+    when where which who why will with you your
+""".split())
+
+
+@dataclass
+class ChunkHit:
+    """A retrieved passage"""
+    filename: str
+    page_number: int  # 0-based
+    content: str
+    score: float
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased word terms of text, without stopwords and single characters"""
+    return [
+        term for term in TERM_PATTERN.findall(text.lower())
+        if 1 < len(term) <= MAX_TERM_LENGTH and term not in STOPWORDS
+    ]
+
+
+def index_blob(content_hash: str) -> int:
+    """
+    Chunk and index a blob's extracted pages that aren't indexed yet
+
+    Incremental: pages extracted later (on demand) are appended by the next
+    call. The blob row is locked per batch, so concurrent calls for the same
+    blob never index a page twice. Blocking.
+
+    Returns:
+        Number of chunks added
+    """
+    added = 0
+    while True:
+        with Session(engine) as session:
+            blob = session.exec(
+                select(FileBlob).where(FileBlob.content_hash == content_hash).with_for_update()
+            ).first()
+            if blob is None or blob.pages_indexed >= blob.pages_extracted:
+                return added
+
+            last_page = min(blob.pages_indexed + INDEX_PAGE_BATCH, blob.pages_extracted)
+            pages = session.exec(
+                select(FilePage.page_number, FilePage.content)
+                .where(
+                    FilePage.content_hash == content_hash,
+                    FilePage.page_number >= blob.pages_indexed,
+                    FilePage.page_number < last_page,
+                )
+                .order_by(FilePage.page_number)
+            ).all()
+
+            chunks = []
+            for page in pages:
+                for passage in chunk_text(page.content, DOCUMENT_CHUNK_TOKENS):
+                    terms = Counter(tokenize(passage))
+                    if terms:
+                        chunk = DocumentChunk(
+                            content_hash=content_hash,
+                            page_number=page.page_number,
+                            content=passage.strip(),
+                            length=sum(terms.values()),
+                        )
+                        chunks.append((chunk, terms))
+
+            if chunks:
+                session.add_all(chunk for chunk, _ in chunks)
+                session.flush()
+                session.execute(
+                    insert(DocumentChunkTerm),
+                    [
+                        {"chunk_id": chunk.id, "term": term, "tf": tf}
+                        for chunk, terms in chunks
+                        for term, tf in terms.items()
+                    ],
+                )
+
+            blob.pages_indexed = last_page
+            session.add(blob)
+            session.commit()
+            added += len(chunks)
+
+
+def index_pending_blobs() -> int:
+    """
+    Index every blob with extracted pages missing from the index
+
+    Catches up blobs extracted before the index existed and any whose
+    indexing failed. Blocking.
+
+    Returns:
+        Number of chunks added
+    """
+    with Session(engine) as session:
+        hashes = session.exec(
+            select(FileBlob.content_hash)
+            .where(FileBlob.pages_indexed < FileBlob.pages_extracted, FileBlob.ref_count > 0)
+            .order_by(FileBlob.created_at)
+        ).all()
+
+    added = 0
+    for content_hash in hashes:
+        try:
+            added += index_blob(content_hash)
+        except Exception as e:
+            print(f"Indexing failed for blob {content_hash[:12]}: {e}")
+    return added
+
+
+def user_chunks(user_id: str):
+    """Select of the ids of every chunk in a user's documents, for use as a filter"""
+    user_blobs = select(FileUpload.content_hash).where(FileUpload.user_id == user_id).distinct()
+    return select(DocumentChunk.id).where(DocumentChunk.content_hash.in_(user_blobs))
+
+
+def rank_chunks(session: Session, user_id: str, query: str, limit: int = DOCUMENT_CONTEXT_CHUNKS) -> List[Tuple[int, float]]:
+    """
+    Rank the passages of a user's documents against a query with BM25
+
+    Corpus statistics (passage count, average length, document frequency)
+    are taken over the user's own documents, and only the postings of the
+    query's terms are read.
+
+    Args:
+        session: Database session
+        user_id: Owner of the documents searched
+        query: Free text, e.g. the user's chat message
+        limit: Maximum number of passages
+
+    Returns:
+        (chunk_id, score) pairs, best first
+    """
+    terms = set(tokenize(query))
+    if not terms or limit <= 0:
+        return []
+
+    user_blobs = select(FileUpload.content_hash).where(FileUpload.user_id == user_id).distinct()
+
+    chunk_count, total_length = session.exec(
+        select(func.count(DocumentChunk.id), func.coalesce(func.sum(DocumentChunk.length), 0))
+        .where(DocumentChunk.content_hash.in_(user_blobs))
+    ).one()
+    if not chunk_count:
+        return []
+    avg_length = total_length / chunk_count
+
+    postings = session.exec(
+        select(DocumentChunkTerm.term, DocumentChunkTerm.chunk_id, DocumentChunkTerm.tf, DocumentChunk.length)
+        .join(DocumentChunk, DocumentChunk.id == DocumentChunkTerm.chunk_id)
+        .where(DocumentChunkTerm.term.in_(terms), DocumentChunk.content_hash.in_(user_blobs))
+    ).all()
+
+    document_frequency = Counter(posting.term for posting in postings)
+    scores = defaultdict(float)
+    for posting in postings:
+        df = document_frequency[posting.term]
+        idf = math.log(1 + (chunk_count - df + 0.5) / (df + 0.5))
+        norm = posting.tf + BM25_K1 * (1 - BM25_B + BM25_B * posting.length / avg_length)
+        scores[posting.chunk_id] += idf * posting.tf * (BM25_K1 + 1) / norm
+
+    return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+def fuse_rankings(*rankings: List[Tuple[int, float]], limit: int = DOCUMENT_CONTEXT_CHUNKS) -> List[Tuple[int, float]]:
+    """
+    Merge rankings from different retrievers by reciprocal rank fusion
+
+    Only positions matter, so BM25 scores and cosine similarities can be
+    combined without calibrating one against the other.
+
+    Returns:
+        (chunk_id, fused score) pairs, best first
+    """
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, (chunk_id, _) in enumerate(ranking):
+            scores[chunk_id] += 1 / (RRF_K + rank + 1)
+    return heapq.nlargest(limit, scores.items(), key=lambda item: item[1])
+
+
+def load_chunk_hits(session: Session, user_id: str, ranked: List[Tuple[int, float]]) -> List[ChunkHit]:
+    """Load the text and file name of ranked chunks, keeping their order"""
+    if not ranked:
+        return []
+
+    chunks = {
+        chunk.id: chunk
+        for chunk in session.exec(select(DocumentChunk).where(DocumentChunk.id.in_([chunk_id for chunk_id, _ in ranked])))
+    }
+    filenames = dict(session.exec(
+        select(FileUpload.content_hash, func.min(FileUpload.original_filename))
+        .where(
+            FileUpload.user_id == user_id,
+            FileUpload.content_hash.in_({chunk.content_hash for chunk in chunks.values()}),
+        )
+        .group_by(FileUpload.content_hash)
+    ).all())
+
+    return [
+        ChunkHit(
+            filename=filenames.get(chunks[chunk_id].content_hash, ""),
+            page_number=chunks[chunk_id].page_number,
+            content=chunks[chunk_id].content,
+            score=score,
+        )
+        for chunk_id, score in ranked
+        if chunk_id in chunks
+    ]
+
+
+def search_chunks(session: Session, user_id: str, query: str, limit: int = DOCUMENT_CONTEXT_CHUNKS) -> List[ChunkHit]:
+    """Keyword search: the passages of a user's documents that best match a query (BM25)"""
+    return load_chunk_hits(session, user_id, rank_chunks(session, user_id, query, limit))
@@ -1,98 +1,235 @@
 """
 Email notification service for task reminders
-Uses SendGrid API for reliable email delivery
+Delivers through a pluggable transport (SendGrid API by default, see app.email_transports)
 """
 
+from concurrent.futures import Future, ThreadPoolExecutor
 from datetime import datetime, timedelta
-from typing import List
+from string import Template
+from typing import Any, Dict, List, Optional, Tuple
 import os
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail, Email, To, Content
+from sqlalchemy import and_, case, func, or_, update
 from sqlmodel import Session, select
 from app.models.task import Task
 from app.models.user import User
+from app.reminders import REMINDER_CLAIM_BATCH_SIZE, claim_due_reminders, claim_user_reminders, release_reminders
+from app.email_transports import EmailTransport, OutgoingEmail, apply_substitutions, get_transport
+
+
+# Daily digest templates are parsed once at import time and reused for every
+# recipient; only the per-user values are substituted.
+DIGEST_TEMPLATE = Template("""
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <meta charset="UTF-8">
+            <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        </head>
+        <body style="margin: 0; padding: 0; background-color: #f3f4f6; font-family: Arial, sans-serif;">
+            <table width="100%" cellpadding="0" cellspacing="0" style="background-color: #f3f4f6; padding: 20px;">
+                <tr>
+                    <td align="center">
+                        <table width="600" cellpadding="0" cellspacing="0" style="background-color: white; border-radius: 8px; overflow: hidden; box-shadow: 0 4px 6px rgba(0,0,0,0.1);">
+                            <!-- Header -->
+                            <tr>
+                                <td style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; text-align: center;">
+                                    <h1 style="margin: 0; color: white; font-size: 28px;">📊 Daily Task Summary</h1>
+                                    <p style="margin: 10px 0 0 0; color: rgba(255,255,255,0.9); font-size: 16px;">$date</p>
+                                </td>
+                            </tr>
+
+                            <!-- Stats -->
+                            <tr>
+                                <td style="padding: 30px;">
+                                    <p style="margin: 0 0 20px 0; color: #374151; font-size: 16px;">Good morning $user_name! 👋</p>
+
+                                    <table width="100%" cellpadding="0" cellspacing="10">
+                                        <tr>
+                                            <td width="33%" style="background-color: #dbeafe; padding: 15px; border-radius: 6px; text-align: center;">
+                                                <div style="font-size: 28px; font-weight: bold; color: #1e40af;">$total</div>
+                                                <div style="font-size: 12px; color: #6b7280; margin-top: 5px;">Total Tasks</div>
+                                            </td>
+                                            <td width="33%" style="background-color: #fef3c7; padding: 15px; border-radius: 6px; text-align: center;">
+                                                <div style="font-size: 28px; font-weight: bold; color: #b45309;">$due_today</div>
+                                                <div style="font-size: 12px; color: #6b7280; margin-top: 5px;">Due Today</div>
+                                            </td>
+                                            <td width="33%" style="background-color: #fee2e2; padding: 15px; border-radius: 6px; text-align: center;">
+                                                <div style="font-size: 28px; font-weight: bold; color: #b91c1c;">$overdue</div>
+                                                <div style="font-size: 12px; color: #6b7280; margin-top: 5px;">Overdue</div>
+                                            </td>
+                                        </tr>
+                                    </table>
+
+                                    <h3 style="margin: 30px 0 15px 0; color: #111827;">Your Tasks:</h3>
+                                    <table width="100%" cellpadding="0" cellspacing="0" style="border: 1px solid #e5e7eb; border-radius: 6px; overflow: hidden;">
+                                        $tasks_html
+                                    </table>
+
+                                    <!-- CTA Button -->
+                                    <table width="100%" cellpadding="0" cellspacing="0" style="margin: 30px 0;">
+                                        <tr>
+                                            <td align="center">
+                                                <a href="https://asif-todo-app.vercel.app" style="display: inline-block; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; text-decoration: none; padding: 14px 32px; border-radius: 6px; font-weight: bold; font-size: 16px;">
+                                                    Open TaskFlow
+                                                </a>
+                                            </td>
+                                        </tr>
+                                    </table>
+                                </td>
+                            </tr>
+
+                            <!-- Footer -->
+                            <tr>
+                                <td style="background-color: #f9fafb; padding: 20px; text-align: center; border-top: 1px solid #e5e7eb;">
+                                    <p style="margin: 0; color: #9ca3af; font-size: 12px;">
+                                        Created by Asif Ali AstolixGen | GIAIC Hackathon 2026
+                                    </p>
+                                </td>
+                            </tr>
+                        </table>
+                    </td>
+                </tr>
+            </table>
+        </body>
+        </html>
+        """)
+
+DIGEST_ROW_TEMPLATE = Template("""
+            <tr>
+                <td style="padding: 12px; border-bottom: 1px solid #e5e7eb;">
+                    <div style="display: flex; align-items: center;">
+                        <span style="font-size: 20px; margin-right: 10px;">$status_icon</span>
+                        <div style="flex: 1;">
+                            <strong style="color: #111827;">$title</strong>
+                            $description_html
+                        </div>
+                        <span style="margin-left: 10px;">$priority_emoji</span>
+                    </div>
+                </td>
+            </tr>
+            """)
+
+DIGEST_DESCRIPTION_TEMPLATE = Template(
+    '<br><span style="color: #6b7280; font-size: 13px;">$description...</span>'
+)
+
+# Reminder type -> (emoji, title, message, accent color)
+REMINDER_STYLES = {
+    "due_soon": ("⏰", "Task Due Soon!", "This task is due soon:", "#f59e0b"),  # Yellow
+    "due_now": ("🔔", "Task Due Now!", "This task is due now:", "#3b82f6"),  # Blue
+    "overdue": ("⚠️", "Task Overdue!", "This task is overdue:", "#ef4444"),  # Red
+    "default": ("📋", "Task Reminder", "You have a task reminder:", "#8b5cf6"),  # Purple
+}
+
+PRIORITY_COLORS = {
+    "high": "#ef4444",
+    "medium": "#f59e0b",
+    "low": "#10b981"
+}
+
+# Digest pipeline tuning
+DIGEST_BATCH_SIZE = int(os.getenv("DIGEST_BATCH_SIZE", "500"))
+EMAIL_SEND_WORKERS = int(os.getenv("EMAIL_SEND_WORKERS", "8"))
+
+DIGEST_PRIORITY_EMOJI = {"high": "🔴", "medium": "🟡", "low": "🟢"}
+DIGEST_MAX_TASKS = 10
+
+# A user getting a reminder email also gets, in the same email, their
+# reminders falling due within this many minutes
+REMINDER_COALESCE_WINDOW_MINUTES = int(os.getenv("REMINDER_COALESCE_WINDOW_MINUTES", "60"))
+
+# Sections of a combined reminder email, most urgent first
+COALESCED_SECTION_ORDER = ["overdue", "due_now", "due_soon"]
+
+REMINDER_SECTION_TEMPLATE = Template("""
+                                    <h3 style="margin: 25px 0 10px 0; color: $color; font-size: 16px;">$emoji $title ($count)</h3>
+                                    <table width="100%" cellpadding="0" cellspacing="0" style="border-left: 4px solid $color; background-color: #f9fafb; border-radius: 6px;">
+                                        $rows
+                                    </table>
+""")
+
+REMINDER_ROW_TEMPLATE = Template(
+    '<tr><td style="padding: 10px 14px; border-bottom: 1px solid #e5e7eb;">'
+    '<strong style="color: #111827;">$title</strong> <span>$priority_emoji</span>'
+    '<br><span style="color: #9ca3af; font-size: 12px;">📅 Due: $due_date</span></td></tr>'
+)
 
 
 class EmailService:
-    """Email notification service using SendGrid API"""
+    """Email notification service"""
 
-    def __init__(self):
-        # SendGrid API configuration from environment variables
-        self.sendgrid_api_key = os.getenv("SENDGRID_API_KEY", "")
+    def __init__(self, transport: Optional[EmailTransport] = None):
+        # Sender configuration from environment variables
         self.sender_email = os.getenv("SENDER_EMAIL", "noreply@taskflow.app")
         self.sender_name = "TaskFlow"
         self.app_name = "TaskFlow"
 
-    def send_email(self, to_email: str, subject: str, html_content: str) -> bool:
-        """Send an email using SendGrid API"""
-        if not self.sendgrid_api_key:
-            print("SendGrid API key not configured")
-            return False
-
-        try:
-            print(f"Sending email to {to_email} via SendGrid...")
-
-            # Create SendGrid message
-            message = Mail(
-                from_email=Email(self.sender_email, self.sender_name),
-                to_emails=To(to_email),
-                subject=subject,
-                html_content=Content("text/html", html_content)
-            )
+        # Delivery backend chosen by EMAIL_TRANSPORT
+        self.transport = transport or get_transport()
+        if not self.transport.configured:
+            print(f"⚠️ Warning: email transport '{self.transport.name}' is not configured - emails will not be sent. "
+                  "Set SENDGRID_API_KEY, or EMAIL_TRANSPORT=smtp|memory|mbox|maildir for local delivery.")
 
-            # Send via SendGrid API
-            sg = SendGridAPIClient(self.sendgrid_api_key)
-            response = sg.send(message)
+        self._reminder_templates: Dict[str, str] = {}
 
-            print(f"✅ Email sent successfully! Status code: {response.status_code}")
-            return True
+        # Outbound send pool so bulk jobs don't wait on each provider call in turn
+        self._outbox = ThreadPoolExecutor(max_workers=EMAIL_SEND_WORKERS, thread_name_prefix="email-send")
 
-        except Exception as e:
-            print(f"❌ Failed to send email: {type(e).__name__}: {str(e)}")
-            return False
+    def send_email(self, to_email: str, subject: str, html_content: str) -> bool:
+        """Send a single email through the configured transport"""
+        print(f"Sending email to {to_email} via {self.transport.name}...")
+
+        return self.transport.send(OutgoingEmail(
+            to_email=to_email,
+            subject=subject,
+            html_content=html_content,
+            from_email=self.sender_email,
+            from_name=self.sender_name
+        ))
+
+    def enqueue_email(self, to_email: str, subject: str, html_content: str) -> Future:
+        """Queue an email on the send pool; the future resolves to send_email's result"""
+        return self._outbox.submit(self.send_email, to_email, subject, html_content)
+
+    def send_batch(
+        self,
+        subject: str,
+        html_template: str,
+        recipients: List[Tuple[str, Dict[str, str]]],
+        failed: Optional[List[str]] = None
+    ) -> int:
+        """
+        Send one templated email to many recipients
 
-    def get_task_reminder_email(self, task: Task, user_name: str, reminder_type: str) -> str:
-        """Generate HTML email for task reminder"""
+        The subject and HTML contain substitution keys (e.g. "-user_name-")
+        that are filled per recipient. The SendGrid transport sends up to
+        1000 recipients per API call using personalizations; other transports
+        render each recipient locally.
 
-        # Determine emoji and message based on reminder type
-        if reminder_type == "due_soon":
-            emoji = "⏰"
-            title = "Task Due Soon!"
-            message = "This task is due in 1 hour:"
-            color = "#f59e0b"  # Yellow
-        elif reminder_type == "due_now":
-            emoji = "🔔"
-            title = "Task Due Now!"
-            message = "This task is due now:"
-            color = "#3b82f6"  # Blue
-        elif reminder_type == "overdue":
-            emoji = "⚠️"
-            title = "Task Overdue!"
-            message = "This task is overdue:"
-            color = "#ef4444"  # Red
-        else:
-            emoji = "📋"
-            title = "Task Reminder"
-            message = "You have a task reminder:"
-            color = "#8b5cf6"  # Purple
-
-        # Priority badge
-        priority_colors = {
-            "high": "#ef4444",
-            "medium": "#f59e0b",
-            "low": "#10b981"
-        }
-        priority_color = priority_colors.get(task.priority, "#6b7280")
+        Args:
+            subject: Subject line, may contain substitution keys
+            html_template: HTML body containing substitution keys
+            recipients: List of (email, substitutions) pairs
+            failed: If given, addresses the transport did not accept are appended
 
-        # Format due date
-        due_date_str = "Not set"
-        if task.due_date:
-            due_date_str = task.due_date.strftime("%B %d, %Y at %I:%M %p")
+        Returns:
+            Number of recipients accepted by the transport
+        """
+        return self.transport.send_batch(subject, html_template, recipients, self.sender_email, self.sender_name, failed)
 
-        # Tags
-        tags_html = ""
-        if task.tags:
-            tags_html = " ".join([f'<span style="background-color: #8b5cf6; color: white; padding: 2px 8px; border-radius: 4px; font-size: 12px; margin-right: 4px;">#{tag}</span>' for tag in task.tags])
+    def get_task_reminder_template(self, reminder_type: str) -> str:
+        """
+        Get the HTML template for a reminder type
+
+        Task- and user-specific values are left as substitution keys (see
+        get_task_reminder_substitutions) so one template serves a whole batch.
+        Templates are built once per reminder type and cached.
+        """
+        if reminder_type in self._reminder_templates:
+            return self._reminder_templates[reminder_type]
+
+        # Determine emoji and message based on reminder type
+        emoji, title, message, color = REMINDER_STYLES.get(reminder_type, REMINDER_STYLES["default"])
 
         html = f"""
         <!DOCTYPE html>
@@ -117,7 +254,7 @@ class EmailService:
                             <!-- Content -->
                             <tr>
                                 <td style="padding: 30px;">
-                                    <p style="margin: 0 0 20px 0; color: #374151; font-size: 16px;">Hi {user_name},</p>
+                                    <p style="margin: 0 0 20px 0; color: #374151; font-size: 16px;">Hi -user_name-,</p>
                                     <p style="margin: 0 0 20px 0; color: #6b7280; font-size: 14px;">{message}</p>
 
                                     <!-- Task Card -->
@@ -125,16 +262,16 @@ class EmailService:
                                         <tr>
                                             <td style="padding: 20px;">
                                                 <div style="display: flex; align-items: center; margin-bottom: 10px;">
-                                                    <h2 style="margin: 0; color: #111827; font-size: 20px; flex: 1;">{task.title}</h2>
-                                                    <span style="background-color: {priority_color}; color: white; padding: 4px 12px; border-radius: 4px; font-size: 12px; font-weight: bold; text-transform: uppercase;">{task.priority}</span>
+                                                    <h2 style="margin: 0; color: #111827; font-size: 20px; flex: 1;">-task_title-</h2>
+                                                    <span style="background-color: -priority_color-; color: white; padding: 4px 12px; border-radius: 4px; font-size: 12px; font-weight: bold; text-transform: uppercase;">-task_priority-</span>
                                                 </div>
 
-                                                {f'<p style="margin: 10px 0; color: #6b7280; font-size: 14px;">{task.description}</p>' if task.description else ''}
+                                                -description_html-
 
-                                                {f'<div style="margin: 10px 0;">{tags_html}</div>' if tags_html else ''}
+                                                -tags_html-
 
                                                 <p style="margin: 15px 0 0 0; color: #9ca3af; font-size: 13px;">
-                                                    📅 <strong>Due:</strong> {due_date_str}
+                                                    📅 <strong>Due:</strong> -due_date-
                                                 </p>
                                             </td>
                                         </tr>
@@ -172,36 +309,47 @@ class EmailService:
         </html>
         """
 
+        self._reminder_templates[reminder_type] = html
         return html
 
-    def get_daily_digest_email(self, user_name: str, tasks: List[Task]) -> str:
-        """Generate HTML email for daily task digest"""
+    def get_task_reminder_substitutions(self, task: Task, user_name: str) -> Dict[str, str]:
+        """Build the per-recipient substitutions for a reminder template"""
 
-        # Count tasks by status
-        total = len(tasks)
-        overdue = len([t for t in tasks if t.due_date and t.due_date < datetime.utcnow() and not t.completed])
-        due_today = len([t for t in tasks if t.due_date and t.due_date.date() == datetime.utcnow().date() and not t.completed])
+        # Format due date
+        due_date_str = "Not set"
+        if task.due_date:
+            due_date_str = task.due_date.strftime("%B %d, %Y at %I:%M %p")
 
-        # Generate task list HTML
-        tasks_html = ""
-        for task in tasks[:10]:  # Show max 10 tasks
-            status_icon = "✅" if task.completed else "⭕"
-            priority_emoji = {"high": "🔴", "medium": "🟡", "low": "🟢"}.get(task.priority, "⚪")
+        # Tags
+        tags_html = ""
+        if task.tags:
+            tags_html = " ".join([f'<span style="background-color: #8b5cf6; color: white; padding: 2px 8px; border-radius: 4px; font-size: 12px; margin-right: 4px;">#{tag}</span>' for tag in task.tags])
 
-            tasks_html += f"""
-            <tr>
-                <td style="padding: 12px; border-bottom: 1px solid #e5e7eb;">
-                    <div style="display: flex; align-items: center;">
-                        <span style="font-size: 20px; margin-right: 10px;">{status_icon}</span>
-                        <div style="flex: 1;">
-                            <strong style="color: #111827;">{task.title}</strong>
-                            {f'<br><span style="color: #6b7280; font-size: 13px;">{task.description[:50]}...</span>' if task.description else ''}
-                        </div>
-                        <span style="margin-left: 10px;">{priority_emoji}</span>
-                    </div>
-                </td>
-            </tr>
-            """
+        return {
+            "-user_name-": user_name,
+            "-task_title-": task.title,
+            "-task_priority-": task.priority,
+            "-priority_color-": PRIORITY_COLORS.get(task.priority, "#6b7280"),
+            "-description_html-": f'<p style="margin: 10px 0; color: #6b7280; font-size: 14px;">{task.description}</p>' if task.description else "",
+            "-tags_html-": f'<div style="margin: 10px 0;">{tags_html}</div>' if tags_html else "",
+            "-due_date-": due_date_str,
+        }
+
+    def get_task_reminder_email(self, task: Task, user_name: str, reminder_type: str) -> str:
+        """Generate HTML email for task reminder"""
+        return apply_substitutions(
+            self.get_task_reminder_template(reminder_type),
+            self.get_task_reminder_substitutions(task, user_name)
+        )
+
+    def get_coalesced_reminder_template(self) -> str:
+        """
+        Get the HTML template for a combined "due soon / due now / overdue" email
+
+        Substitution keys: -user_name-, -task_count-, -sections_html-.
+        """
+        if "coalesced" in self._reminder_templates:
+            return self._reminder_templates["coalesced"]
 
         html = f"""
         <!DOCTYPE html>
@@ -218,44 +366,24 @@ class EmailService:
                             <!-- Header -->
                             <tr>
                                 <td style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 30px; text-align: center;">
-                                    <h1 style="margin: 0; color: white; font-size: 28px;">📊 Daily Task Summary</h1>
-                                    <p style="margin: 10px 0 0 0; color: rgba(255,255,255,0.9); font-size: 16px;">{datetime.utcnow().strftime("%A, %B %d, %Y")}</p>
+                                    <h1 style="margin: 0; color: white; font-size: 28px;">🔔 {self.app_name}</h1>
+                                    <p style="margin: 10px 0 0 0; color: rgba(255,255,255,0.9); font-size: 16px;">-task_count- tasks need your attention</p>
                                 </td>
                             </tr>
 
-                            <!-- Stats -->
+                            <!-- Content -->
                             <tr>
                                 <td style="padding: 30px;">
-                                    <p style="margin: 0 0 20px 0; color: #374151; font-size: 16px;">Good morning {user_name}! 👋</p>
-
-                                    <table width="100%" cellpadding="0" cellspacing="10">
-                                        <tr>
-                                            <td width="33%" style="background-color: #dbeafe; padding: 15px; border-radius: 6px; text-align: center;">
-                                                <div style="font-size: 28px; font-weight: bold; color: #1e40af;">{total}</div>
-                                                <div style="font-size: 12px; color: #6b7280; margin-top: 5px;">Total Tasks</div>
-                                            </td>
-                                            <td width="33%" style="background-color: #fef3c7; padding: 15px; border-radius: 6px; text-align: center;">
-                                                <div style="font-size: 28px; font-weight: bold; color: #b45309;">{due_today}</div>
-                                                <div style="font-size: 12px; color: #6b7280; margin-top: 5px;">Due Today</div>
-                                            </td>
-                                            <td width="33%" style="background-color: #fee2e2; padding: 15px; border-radius: 6px; text-align: center;">
-                                                <div style="font-size: 28px; font-weight: bold; color: #b91c1c;">{overdue}</div>
-                                                <div style="font-size: 12px; color: #6b7280; margin-top: 5px;">Overdue</div>
-                                            </td>
-                                        </tr>
-                                    </table>
-
-                                    <h3 style="margin: 30px 0 15px 0; color: #111827;">Your Tasks:</h3>
-                                    <table width="100%" cellpadding="0" cellspacing="0" style="border: 1px solid #e5e7eb; border-radius: 6px; overflow: hidden;">
-                                        {tasks_html}
-                                    </table>
+                                    <p style="margin: 0 0 20px 0; color: #374151; font-size: 16px;">Hi -user_name-,</p>
+                                    <p style="margin: 0 0 10px 0; color: #6b7280; font-size: 14px;">Here's what's coming up on your list:</p>
+                                    -sections_html-
 
                                     <!-- CTA Button -->
                                     <table width="100%" cellpadding="0" cellspacing="0" style="margin: 30px 0;">
                                         <tr>
                                             <td align="center">
                                                 <a href="https://asif-todo-app.vercel.app" style="display: inline-block; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; text-decoration: none; padding: 14px 32px; border-radius: 6px; font-weight: bold; font-size: 16px;">
-                                                    Open TaskFlow
+                                                    View Tasks in App
                                                 </a>
                                             </td>
                                         </tr>
@@ -269,6 +397,9 @@ class EmailService:
                                     <p style="margin: 0; color: #9ca3af; font-size: 12px;">
                                         Created by Asif Ali AstolixGen | GIAIC Hackathon 2026
                                     </p>
+                                    <p style="margin: 10px 0 0 0; color: #9ca3af; font-size: 12px;">
+                                        You're receiving this because you have task reminders enabled in TaskFlow.
+                                    </p>
                                 </td>
                             </tr>
                         </table>
@@ -279,49 +410,365 @@ class EmailService:
         </html>
         """
 
+        self._reminder_templates["coalesced"] = html
         return html
 
-    def check_and_send_reminders(self, session: Session):
-        """Check for tasks that need reminders and send emails"""
-        now = datetime.utcnow()
-        one_hour_later = now + timedelta(hours=1)
+    def get_coalesced_reminder_substitutions(self, reminders: List[Tuple[Task, str]], user_name: str) -> Dict[str, str]:
+        """Build substitutions for a combined reminder email from (task, reminder_type) pairs"""
+        sections = []
+        for reminder_type in COALESCED_SECTION_ORDER:
+            tasks = [task for task, kind in reminders if kind == reminder_type]
+            if not tasks:
+                continue
+
+            emoji, title, _, color = REMINDER_STYLES[reminder_type]
+            rows = "".join(
+                REMINDER_ROW_TEMPLATE.substitute(
+                    title=task.title,
+                    priority_emoji=DIGEST_PRIORITY_EMOJI.get(task.priority, "⚪"),
+                    due_date=task.due_date.strftime("%b %d, %I:%M %p") if task.due_date else "Not set",
+                )
+                for task in tasks
+            )
+            sections.append(REMINDER_SECTION_TEMPLATE.substitute(
+                color=color, emoji=emoji, title=title, count=len(tasks), rows=rows
+            ))
+
+        return {
+            "-user_name-": user_name,
+            "-task_count-": str(len(reminders)),
+            "-sections_html-": "".join(sections),
+        }
 
-        # Get all tasks with reminder dates
-        statement = select(Task).where(
-            Task.reminder_date.isnot(None),
-            Task.completed == False,
-            Task.reminder_date <= one_hour_later
+    def get_digest_tasks_html(self, tasks: List[Any]) -> str:
+        """Render the digest task rows for up to DIGEST_MAX_TASKS tasks"""
+        return "".join(
+            DIGEST_ROW_TEMPLATE.substitute(
+                status_icon="✅" if task.completed else "⭕",
+                priority_emoji=DIGEST_PRIORITY_EMOJI.get(task.priority, "⚪"),
+                title=task.title,
+                description_html=DIGEST_DESCRIPTION_TEMPLATE.substitute(description=task.description[:50]) if task.description else "",
+            )
+            for task in tasks[:DIGEST_MAX_TASKS]
         )
-        tasks = session.exec(statement).all()
 
-        for task in tasks:
-            # Get user
-            user_statement = select(User).where(User.id == task.user_id)
-            user = session.exec(user_statement).first()
+    def get_daily_digest_email(self, user_name: str, stats: Dict[str, int], tasks: List[Any], date_str: Optional[str] = None) -> str:
+        """
+        Generate HTML email for daily task digest
 
-            if not user:
-                continue
+        Args:
+            user_name: Recipient's display name
+            stats: Pre-aggregated counts with "total", "due_today" and "overdue" keys
+            tasks: Up to DIGEST_MAX_TASKS rows exposing title, description, priority and completed
+            date_str: Preformatted date header (computed once per digest run)
+        """
+        return DIGEST_TEMPLATE.substitute(
+            date=date_str or datetime.utcnow().strftime("%A, %B %d, %Y"),
+            user_name=user_name,
+            total=stats.get("total", 0),
+            due_today=stats.get("due_today", 0),
+            overdue=stats.get("overdue", 0),
+            tasks_html=self.get_digest_tasks_html(tasks),
+        )
 
-            # Determine reminder type
-            if task.reminder_date <= now:
-                reminder_type = "due_now"
-            elif task.reminder_date <= one_hour_later:
-                reminder_type = "due_soon"
-            else:
-                continue
+    def get_digest_stats(self, session: Session, user_ids: List[str], now: datetime) -> Dict[str, Dict[str, int]]:
+        """
+        Aggregate digest counts for a batch of users in a single GROUP BY query
+
+        Returns:
+            Mapping of user_id -> {"total", "due_today", "overdue"}; users without tasks are absent
+        """
+        today_start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+        tomorrow_start = today_start + timedelta(days=1)
+
+        statement = select(
+            Task.user_id,
+            func.count(Task.id),
+            func.count(case((and_(Task.completed == False, Task.due_date >= today_start, Task.due_date < tomorrow_start), 1))),
+            func.count(case((and_(Task.completed == False, Task.due_date < now), 1))),
+        ).where(
+            Task.user_id.in_(user_ids)
+        ).group_by(Task.user_id)
+
+        return {
+            user_id: {"total": total, "due_today": due_today, "overdue": overdue}
+            for user_id, total, due_today, overdue in session.exec(statement).all()
+        }
+
+    def get_digest_top_tasks(self, session: Session, user_ids: List[str]) -> Dict[str, List[Any]]:
+        """
+        Fetch each user's top DIGEST_MAX_TASKS tasks for a batch of users
 
-            # Generate and send email
-            html_content = self.get_task_reminder_email(task, user.name, reminder_type)
-            subject = f"⏰ Reminder: {task.title}"
+        Uses a row_number() window so the database returns at most
+        DIGEST_MAX_TASKS rows per user (open tasks first, soonest due first),
+        with descriptions already truncated.
+        """
+        rank = func.row_number().over(
+            partition_by=Task.user_id,
+            order_by=(Task.completed.asc(), Task.due_date.asc().nulls_last(), Task.created_at.desc())
+        ).label("rank")
+
+        ranked = select(
+            Task.user_id,
+            Task.title,
+            func.substr(Task.description, 1, 50).label("description"),
+            Task.priority,
+            Task.completed,
+            rank,
+        ).where(
+            Task.user_id.in_(user_ids)
+        ).subquery()
+
+        statement = select(
+            ranked.c.user_id,
+            ranked.c.title,
+            ranked.c.description,
+            ranked.c.priority,
+            ranked.c.completed,
+        ).where(
+            ranked.c.rank <= DIGEST_MAX_TASKS
+        ).order_by(ranked.c.user_id, ranked.c.rank)
+
+        top_tasks: Dict[str, List[Any]] = {}
+        for row in session.exec(statement).all():
+            top_tasks.setdefault(row.user_id, []).append(row)
+        return top_tasks
+
+    def send_daily_digests(self, session: Session, batch_size: int = DIGEST_BATCH_SIZE) -> Dict[str, int]:
+        """
+        Send the daily digest to every user that has tasks
 
-            self.send_email(user.email, subject, html_content)
+        Users are streamed in keyset-paginated batches; each batch costs two
+        grouped queries (counts + top tasks) and becomes one personalized
+        send_batch call on the send pool. At most EMAIL_SEND_WORKERS batches
+        are in flight, so memory stays bounded regardless of user count.
 
-            # Update reminder_date to avoid sending multiple times
-            task.reminder_date = None
-            session.add(task)
+        Every replica runs the job, so each user is claimed first with a
+        conditional UPDATE of users.digest_sent_on to today's date; only the
+        replica whose UPDATE matched sends. Users whose email is not accepted
+        are released again for a later run the same day.
+        """
+        now = datetime.utcnow()
+        today = now.date()
+        subject = f"📊 Your Daily Task Summary - {now.strftime('%b %d')}"
+
+        # Rendered once per run; per-user values are SendGrid substitutions
+        html_template = DIGEST_TEMPLATE.substitute(
+            date=now.strftime("%A, %B %d, %Y"),
+            user_name="-user_name-",
+            total="-total-",
+            due_today="-due_today-",
+            overdue="-overdue-",
+            tasks_html="-tasks_html-",
+        )
 
-        session.commit()
-        print(f"Checked reminders: {len(tasks)} tasks processed")
+        summary = {"users": 0, "sent": 0, "failed": 0, "skipped": 0}
+        in_flight: List[Tuple[Future, Dict[str, str], List[str]]] = []
+        last_user_id = ""
+
+        def drain(limit: int):
+            while len(in_flight) > limit:
+                future, claimed, failed = in_flight.pop(0)
+                accepted = future.result()
+                summary["sent"] += accepted
+                summary["failed"] += len(claimed) - accepted
+
+                released = [claimed[email] for email in set(failed) if email in claimed]
+                if released:
+                    session.execute(
+                        update(User)
+                        .where(User.id.in_(released), User.digest_sent_on == today)
+                        .values(digest_sent_on=None)
+                    )
+                    session.commit()
+
+        while True:
+            users = session.exec(
+                select(User.id, User.name, User.email)
+                .where(User.id > last_user_id)
+                .order_by(User.id)
+                .limit(batch_size)
+            ).all()
+
+            if not users:
+                break
+
+            last_user_id = users[-1].id
+            user_ids = [user.id for user in users]
+
+            stats = self.get_digest_stats(session, user_ids, now)
+            top_tasks = self.get_digest_top_tasks(session, user_ids)
+
+            # Claim this batch's users; another replica may already have
+            claimed_ids = set(session.execute(
+                update(User)
+                .where(
+                    User.id.in_([user_id for user_id in user_ids if user_id in stats]),
+                    or_(User.digest_sent_on.is_(None), User.digest_sent_on != today),
+                )
+                .values(digest_sent_on=today)
+                .returning(User.id)
+            ).scalars().all()) if stats else set()
+            session.commit()
+
+            recipients = []
+            claimed: Dict[str, str] = {}
+            for user in users:
+                if user.id not in stats:
+                    continue
+                if user.id not in claimed_ids:
+                    summary["skipped"] += 1
+                    continue
+
+                claimed[user.email] = user.id
+                user_stats = stats[user.id]
+                recipients.append((user.email, {
+                    "-user_name-": user.name,
+                    "-total-": str(user_stats["total"]),
+                    "-due_today-": str(user_stats["due_today"]),
+                    "-overdue-": str(user_stats["overdue"]),
+                    "-tasks_html-": self.get_digest_tasks_html(top_tasks.get(user.id, [])),
+                }))
+
+            if recipients:
+                drain(EMAIL_SEND_WORKERS - 1)
+                failed: List[str] = []
+                in_flight.append((self._outbox.submit(self.send_batch, subject, html_template, recipients, failed), claimed, failed))
+
+            summary["users"] += len(users)
+
+        drain(0)
+
+        print(f"Daily digest: {summary['users']} users scanned, {summary['sent']} sent, {summary['failed']} failed, "
+              f"{summary['skipped']} already sent today")
+        return summary
+
+    def get_reminder_type(self, kind: str, task: Task, fire_at: datetime, now: datetime) -> str:
+        """Map a task_reminders kind onto an email template type"""
+        if fire_at > now:
+            # Claimed ahead of time, alongside the user's due reminders
+            return "overdue" if task.due_date and task.due_date < now else "due_soon"
+        if kind == "overdue" or (kind == "custom" and task.due_date and task.due_date < now):
+            return "overdue"
+        if kind == "due" or (kind == "custom" and fire_at <= now):
+            return "due_now"
+        return "due_soon"
+
+    def check_and_send_reminders(self, session: Session):
+        """
+        Claim due reminders from task_reminders and send emails
+
+        Reminders whose fire time has passed are claimed in batches through
+        the partial index on unsent rows. Reminders are then grouped per
+        user: a user with several reminders gets one combined
+        "overdue / due now / due soon" email, while a lone reminder still
+        gets the single-task email. Both kinds go out as batched sends.
+
+        Only rows whose fire time has passed start an email. For each user
+        in a batch, the rest of their due rows are claimed with it (so a
+        user gets one email however the batches fall), together with their
+        reminders firing within REMINDER_COALESCE_WINDOW_MINUTES, which go
+        out early as "due soon" instead of as a separate email later. A
+        user's reminders are released again if their email is not
+        accepted, and the sweep stops there; they are retried by the next
+        run.
+        """
+        now = datetime.utcnow()
+        horizon = now + timedelta(minutes=REMINDER_COALESCE_WINDOW_MINUTES)
+        totals = {"reminders": 0, "users": 0, "combined": 0, "released": 0}
+
+        while True:
+            claimed = claim_due_reminders(session, now)
+            session.commit()
+
+            if not claimed:
+                break
+            batch_full = len(claimed) == REMINDER_CLAIM_BATCH_SIZE
+
+            # Load claimed tasks by primary key, then take the rest of
+            # these users' due and soon-due reminders into the same emails
+            task_ids = {reminder.task_id for reminder in claimed}
+            tasks = {
+                task.id: task
+                for task in session.exec(select(Task).where(Task.id.in_(task_ids))).all()
+            }
+            user_ids = {task.user_id for task in tasks.values()}
+
+            extra = claim_user_reminders(session, list(user_ids), now, horizon, list(task_ids))
+            session.commit()
+            new_task_ids = {reminder.task_id for reminder in extra} - task_ids
+            if new_task_ids:
+                tasks.update(
+                    (task.id, task)
+                    for task in session.exec(select(Task).where(Task.id.in_(new_task_ids))).all()
+                )
+            claimed.extend(extra)
+            users = {
+                user.id: user
+                for user in session.exec(select(User).where(User.id.in_(user_ids))).all()
+            } if user_ids else {}
+
+            # Coalesce per user; a task claimed twice keeps its most urgent type
+            pending: Dict[str, Dict[int, str]] = {}
+            claimed_for: Dict[str, List[int]] = {}
+
+            for reminder in claimed:
+                task = tasks.get(reminder.task_id)
+                if not task or task.completed or task.user_id not in users:
+                    continue
+
+                claimed_for.setdefault(task.user_id, []).append(reminder.id)
+                reminder_type = self.get_reminder_type(reminder.kind, task, reminder.fire_at, now)
+                user_tasks = pending.setdefault(task.user_id, {})
+                current = user_tasks.get(task.id)
+                if current is None or COALESCED_SECTION_ORDER.index(reminder_type) < COALESCED_SECTION_ORDER.index(current):
+                    user_tasks[task.id] = reminder_type
+
+            # Lone reminders are batched per type; multi-reminder users share one template
+            single_batches: Dict[str, List[Tuple[str, Dict[str, str]]]] = {}
+            coalesced: List[Tuple[str, Dict[str, str]]] = []
+
+            for user_id, user_tasks in pending.items():
+                user = users[user_id]
+                reminders = [(tasks[task_id], reminder_type) for task_id, reminder_type in user_tasks.items()]
+                if len(reminders) == 1:
+                    task, reminder_type = reminders[0]
+                    single_batches.setdefault(reminder_type, []).append(
+                        (user.email, self.get_task_reminder_substitutions(task, user.name))
+                    )
+                else:
+                    coalesced.append((user.email, self.get_coalesced_reminder_substitutions(reminders, user.name)))
+
+            failed: List[str] = []
+            for reminder_type, recipients in single_batches.items():
+                self.send_batch("⏰ Reminder: -task_title-", self.get_task_reminder_template(reminder_type), recipients, failed)
+
+            if coalesced:
+                self.send_batch("⏰ -task_count- tasks need your attention", self.get_coalesced_reminder_template(), coalesced, failed)
+
+            if failed:
+                failed_emails = set(failed)
+                released = [
+                    reminder_id
+                    for user_id, reminder_ids in claimed_for.items()
+                    if users[user_id].email in failed_emails
+                    for reminder_id in reminder_ids
+                ]
+                release_reminders(session, released)
+                session.commit()
+                totals["released"] += len(released)
+
+            totals["reminders"] += len(claimed)
+            totals["users"] += len(pending)
+            totals["combined"] += len(coalesced)
+
+            # After a failure, leave the released rows to the next sweep
+            if failed or not batch_full:
+                break
+
+        print(f"Checked reminders: {totals['reminders']} reminders claimed, "
+              f"{totals['users']} users notified ({totals['combined']} combined emails), "
+              f"{totals['released']} released after failed sends")
 
     def send_permission_request_email(self, admin_email: str, user_name: str, user_email: str):
         """Send email to admin when user requests file upload permission"""
@@ -0,0 +1,319 @@
+"""
+Email transports
+Pluggable delivery backends for EmailService, selected with EMAIL_TRANSPORT:
+
+- sendgrid: SendGrid v3 API (default), batches with personalizations
+- smtp:     any SMTP server (e.g. a local MailHog/smtp4dev sink)
+- memory:   in-process capture, for tests and load benchmarks
+- mbox:     append to a local mbox file
+- maildir:  write to a local Maildir directory
+"""
+
+import mailbox
+import os
+import smtplib
+import threading
+import time
+from dataclasses import dataclass
+from email.message import EmailMessage
+from email.utils import formataddr, formatdate, make_msgid
+from typing import Dict, List, Optional, Tuple
+
+from sendgrid import SendGridAPIClient
+from sendgrid.helpers.mail import Mail, Email, To, Content
+
+from app.metrics import LatencyStats
+
+# SendGrid accepts up to 1000 personalizations per request and 10000 bytes of
+# substitutions per personalization
+SENDGRID_MAX_PERSONALIZATIONS = 1000
+SENDGRID_MAX_SUBSTITUTION_BYTES = 10000
+
+
+@dataclass
+class OutgoingEmail:
+    """A fully rendered email ready for delivery"""
+    to_email: str
+    subject: str
+    html_content: str
+    from_email: str
+    from_name: str
+
+
+def apply_substitutions(text: str, substitutions: Dict[str, str]) -> str:
+    """Fill SendGrid-style substitution keys locally (used when not batching)"""
+    for key, value in substitutions.items():
+        text = text.replace(key, value)
+    return text
+
+
+def to_mime(message: OutgoingEmail) -> EmailMessage:
+    """Build a MIME message for SMTP and local mailbox transports"""
+    mime = EmailMessage()
+    mime["From"] = formataddr((message.from_name, message.from_email))
+    mime["To"] = message.to_email
+    mime["Subject"] = message.subject
+    mime["Date"] = formatdate(localtime=False)
+    mime["Message-ID"] = make_msgid(domain=message.from_email.split("@")[-1])
+    mime.set_content("This message requires an HTML-capable email client.")
+    mime.add_alternative(message.html_content, subtype="html")
+    return mime
+
+
+class EmailTransport:
+    """
+    Base transport
+
+    Subclasses implement _send(). send_batch() falls back to rendering each
+    recipient locally; transports with native batching override it.
+    Every call is timed into self.stats.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.stats = LatencyStats()
+
+    @property
+    def configured(self) -> bool:
+        return True
+
+    def _send(self, message: OutgoingEmail):
+        raise NotImplementedError
+
+    def send(self, message: OutgoingEmail) -> bool:
+        """Deliver one message; returns False on failure"""
+        start = time.perf_counter()
+        try:
+            self._send(message)
+            self.stats.record(time.perf_counter() - start)
+            return True
+        except Exception as e:
+            self.stats.record(time.perf_counter() - start, ok=False)
+            print(f"❌ Failed to send email via {self.name}: {type(e).__name__}: {str(e)}")
+            return False
+
+    def send_batch(
+        self,
+        subject: str,
+        html_template: str,
+        recipients: List[Tuple[str, Dict[str, str]]],
+        from_email: str,
+        from_name: str,
+        failed: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Deliver one templated message to many recipients; returns the number accepted
+
+        Addresses that were not accepted are appended to `failed`, if given.
+        """
+        accepted = 0
+        for to_email, substitutions in recipients:
+            message = OutgoingEmail(
+                to_email=to_email,
+                subject=apply_substitutions(subject, substitutions),
+                html_content=apply_substitutions(html_template, substitutions),
+                from_email=from_email,
+                from_name=from_name,
+            )
+            if self.send(message):
+                accepted += 1
+            elif failed is not None:
+                failed.append(to_email)
+        return accepted
+
+
+class SendGridTransport(EmailTransport):
+    """SendGrid v3 API transport with personalization batching"""
+
+    name = "sendgrid"
+
+    def __init__(self, api_key: str, host: str = "https://api.sendgrid.com"):
+        super().__init__()
+        self.api_key = api_key
+        # One client for the process; host can point at a local stand-in
+        self.client = SendGridAPIClient(api_key, host=host) if api_key else None
+
+    @property
+    def configured(self) -> bool:
+        return self.client is not None
+
+    def _send(self, message: OutgoingEmail):
+        if not self.client:
+            raise RuntimeError("SendGrid API key not configured")
+
+        mail = Mail(
+            from_email=Email(message.from_email, message.from_name),
+            to_emails=To(message.to_email),
+            subject=message.subject,
+            html_content=Content("text/html", message.html_content)
+        )
+        self.client.send(mail)
+
+    def send_batch(
+        self,
+        subject: str,
+        html_template: str,
+        recipients: List[Tuple[str, Dict[str, str]]],
+        from_email: str,
+        from_name: str,
+        failed: Optional[List[str]] = None,
+    ) -> int:
+        """
+        Send using SendGrid personalizations
+
+        The subject and HTML are sent once per request; each recipient gets a
+        personalization whose substitutions are filled in by SendGrid.
+        Recipients are split into requests of SENDGRID_MAX_PERSONALIZATIONS.
+        """
+        if not self.client:
+            print("SendGrid API key not configured")
+            if failed is not None:
+                failed.extend(to_email for to_email, _ in recipients)
+            return 0
+
+        accepted = 0
+        personalizations = []
+
+        for to_email, substitutions in recipients:
+            # Oversized substitutions can't ride in a personalization; render locally instead
+            if sum(len(k) + len(v.encode("utf-8")) for k, v in substitutions.items()) > SENDGRID_MAX_SUBSTITUTION_BYTES:
+                accepted += super().send_batch(subject, html_template, [(to_email, substitutions)], from_email, from_name, failed)
+                continue
+
+            personalizations.append({"to": [{"email": to_email}], "substitutions": substitutions})
+
+        for start in range(0, len(personalizations), SENDGRID_MAX_PERSONALIZATIONS):
+            chunk = personalizations[start:start + SENDGRID_MAX_PERSONALIZATIONS]
+            request_body = {
+                "personalizations": chunk,
+                "from": {"email": from_email, "name": from_name},
+                "subject": subject,
+                "content": [{"type": "text/html", "value": html_template}],
+            }
+
+            started = time.perf_counter()
+            try:
+                response = self.client.send(request_body)
+                self.stats.record(time.perf_counter() - started, items=len(chunk))
+                accepted += len(chunk)
+                print(f"✅ Batch of {len(chunk)} emails accepted! Status code: {response.status_code}")
+            except Exception as e:
+                self.stats.record(time.perf_counter() - started, items=len(chunk), ok=False)
+                print(f"❌ Failed to send batch of {len(chunk)} emails: {type(e).__name__}: {str(e)}")
+                if failed is not None:
+                    failed.extend(personalization["to"][0]["email"] for personalization in chunk)
+
+        return accepted
+
+
+class SMTPTransport(EmailTransport):
+    """SMTP transport; keeps one connection per sending thread"""
+
+    name = "smtp"
+
+    def __init__(self, host: str, port: int = 25, username: str = "", password: str = "", use_tls: bool = False):
+        super().__init__()
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.use_tls = use_tls
+        self._local = threading.local()
+
+    def _connection(self) -> smtplib.SMTP:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = smtplib.SMTP(self.host, self.port, timeout=30)
+            if self.use_tls:
+                conn.starttls()
+            if self.username:
+                conn.login(self.username, self.password)
+            self._local.conn = conn
+        return conn
+
+    def _send(self, message: OutgoingEmail):
+        mime = to_mime(message)
+        try:
+            self._connection().send_message(mime)
+        except smtplib.SMTPServerDisconnected:
+            # Connection went stale between sends; reconnect once
+            self._local.conn = None
+            self._connection().send_message(mime)
+
+
+class MemoryTransport(EmailTransport):
+    """Captures messages in memory (bounded) instead of delivering them"""
+
+    name = "memory"
+
+    def __init__(self, max_messages: int = 10000):
+        super().__init__()
+        self.max_messages = max_messages
+        self.messages: List[OutgoingEmail] = []
+        self._lock = threading.Lock()
+
+    def _send(self, message: OutgoingEmail):
+        with self._lock:
+            self.messages.append(message)
+            if len(self.messages) > self.max_messages:
+                del self.messages[:len(self.messages) - self.max_messages]
+
+    def clear(self):
+        with self._lock:
+            self.messages.clear()
+
+
+class MailboxTransport(EmailTransport):
+    """Writes messages to a local mbox file or Maildir directory"""
+
+    def __init__(self, path: str, format: str = "mbox"):
+        super().__init__()
+        self.name = format
+        self.path = path
+        self._lock = threading.Lock()
+
+        if format == "maildir":
+            self.box = mailbox.Maildir(path, create=True)
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self.box = mailbox.mbox(path, create=True)
+
+    def _send(self, message: OutgoingEmail):
+        mime = to_mime(message)
+        with self._lock:
+            if isinstance(self.box, mailbox.mbox):
+                self.box.lock()
+                try:
+                    self.box.add(mime)
+                    self.box.flush()
+                finally:
+                    self.box.unlock()
+            else:
+                self.box.add(mime)
+
+
+def get_transport() -> EmailTransport:
+    """Create the transport selected by EMAIL_TRANSPORT (default: sendgrid)"""
+    transport = os.getenv("EMAIL_TRANSPORT", "sendgrid").lower()
+
+    if transport == "smtp":
+        return SMTPTransport(
+            host=os.getenv("SMTP_HOST", "localhost"),
+            port=int(os.getenv("SMTP_PORT", "25")),
+            username=os.getenv("SMTP_USERNAME", ""),
+            password=os.getenv("SMTP_PASSWORD", ""),
+            use_tls=os.getenv("SMTP_USE_TLS", "false").lower() == "true",
+        )
+    if transport == "memory":
+        return MemoryTransport()
+    if transport in ("mbox", "maildir"):
+        default_path = "mail/outbox.mbox" if transport == "mbox" else "mail/outbox"
+        return MailboxTransport(os.getenv("EMAIL_SINK_PATH", default_path), format=transport)
+    if transport != "sendgrid":
+        raise ValueError(f"Unknown EMAIL_TRANSPORT: {transport}")
+
+    return SendGridTransport(
+        api_key=os.getenv("SENDGRID_API_KEY", ""),
+        host=os.getenv("SENDGRID_API_HOST", "https://api.sendgrid.com"),
+    )
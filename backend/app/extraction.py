@@ -0,0 +1,435 @@
+"""
+Background text extraction
+Runs CPU-bound PDF/DOCX parsing in sandboxed child processes so upload
+requests never block the event loop on document parsing.
+"""
+
+import asyncio
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.document_index import index_blob
+from app.metrics import LatencyStats
+from app.models.file import FileBlob, FilePage, FileUpload
+from app.sandbox import SandboxResult, kill_running_extractions, run_sandboxed_extraction
+from app.storage import get_storage
+from app.vector_index import sync_blob_users
+
+# Concurrency and queue sizing
+EXTRACTION_WORKERS = int(os.getenv("EXTRACTION_WORKERS", "2"))
+EXTRACTION_QUEUE_SIZE = int(os.getenv("EXTRACTION_QUEUE_SIZE", "100"))
+
+# Background extraction stops after this many characters (0 = whole document);
+# later pages are extracted on demand
+EXTRACTION_MAX_CHARS = int(os.getenv("EXTRACTION_MAX_CHARS", "500000"))
+
+# Pages buffered per database write (the first page is always written at once)
+EXTRACTION_PAGE_BATCH = int(os.getenv("EXTRACTION_PAGE_BATCH", "25"))
+
+# A job is owned by the replica running it while its lease (claimed_at,
+# renewed with every page write) is younger than this; after that it is
+# presumed dead and requeued. Must exceed the sandbox wall-clock timeout.
+EXTRACTION_LEASE_SECONDS = int(os.getenv("EXTRACTION_LEASE_SECONDS", "600"))
+
+
+class ExtractionQueue:
+    """
+    Bounded extraction job queue
+
+    Jobs are blob content hashes, so identical uploads are extracted once
+    for everyone. EXTRACTION_WORKERS consumer tasks pull from an asyncio
+    queue and run each job in its own rlimited child process (see
+    app.sandbox), recording the outcome on the FileBlob row
+    (extraction_status: pending -> processing -> done/failed).
+    A document that hangs, loops or exhausts memory only kills its child.
+
+    Pages are persisted to file_pages as they stream in, so the first page
+    is readable long before a large document finishes, and a job that is
+    interrupted resumes after the last stored page.
+
+    When the queue is full, blobs simply stay "pending" and are picked up
+    again once the queue drains (and on every startup).
+
+    Jobs are leased: a replica that dies mid-job stops renewing claimed_at,
+    and once the lease expires any replica puts the blob back to pending
+    (checked at startup and every EXTRACTION_LEASE_SECONDS). Jobs other
+    replicas are still running are left alone.
+    """
+
+    def __init__(self):
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: Set[asyncio.Task] = set()
+        self._reaper: Optional[asyncio.Task] = None
+        self._overflowed = False
+        # Time per job; items are pages, so items_per_second is pages/sec
+        self.stats = LatencyStats()
+        self.failure_reasons: Counter = Counter()
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def start(self):
+        """Start the consumers, then requeue pending and interrupted blobs"""
+        if self.running:
+            return
+
+        self._queue = asyncio.Queue(maxsize=EXTRACTION_QUEUE_SIZE)
+        self._workers = {asyncio.create_task(self._worker()) for _ in range(EXTRACTION_WORKERS)}
+
+        await self._requeue_expired()
+        await self.requeue_pending()
+        self._reaper = asyncio.create_task(self._reap_expired())
+
+    async def stop(self):
+        """Stop consumers and kill in-flight children (their blobs are requeued once their leases expire)"""
+        if self._reaper:
+            self._reaper.cancel()
+            self._reaper = None
+        for worker in self._workers:
+            worker.cancel()
+        kill_running_extractions()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers.clear()
+
+    async def _requeue_expired(self) -> int:
+        reset = await asyncio.to_thread(_reset_interrupted_jobs)
+        if reset:
+            print(f"Requeued {reset} extraction jobs whose lease expired")
+        return reset
+
+    async def _reap_expired(self):
+        """Periodically requeue jobs of replicas that died mid-extraction"""
+        while True:
+            await asyncio.sleep(EXTRACTION_LEASE_SECONDS)
+            try:
+                if await self._requeue_expired():
+                    await self.requeue_pending()
+            except Exception as e:
+                print(f"Requeueing expired extraction jobs failed: {e}")
+
+    def submit(self, content_hash: str) -> bool:
+        """Queue a blob for extraction; returns False if the queue is full"""
+        if not self.running:
+            self._overflowed = True
+            return False
+
+        try:
+            self._queue.put_nowait(content_hash)
+            return True
+        except asyncio.QueueFull:
+            self._overflowed = True
+            print(f"Extraction queue full, blob {content_hash[:12]} left pending")
+            return False
+
+    async def requeue_pending(self):
+        """Queue pending blobs up to the free queue capacity"""
+        self._overflowed = False
+        free = self._queue.maxsize - self._queue.qsize()
+        if free <= 0:
+            self._overflowed = True
+            return
+
+        hashes = await asyncio.to_thread(_pending_blob_hashes, free)
+        for content_hash in hashes:
+            self.submit(content_hash)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Extraction timing, pages/sec, failure reasons and queue depth"""
+        return {
+            **self.stats.snapshot(),
+            "failure_reasons": dict(self.failure_reasons),
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+    async def _worker(self):
+        while True:
+            if self._overflowed and self._queue.empty():
+                await self.requeue_pending()
+
+            content_hash = await self._queue.get()
+            try:
+                job = await asyncio.to_thread(_claim_job, content_hash)
+                if job is None:
+                    continue
+
+                result = await asyncio.to_thread(_extract_job, content_hash, *job)
+
+                self.stats.record(result.seconds, items=result.pages, ok=result.ok)
+                if not result.ok:
+                    self.failure_reasons[_failure_reason(result.error)] += 1
+
+                await asyncio.to_thread(_finish_job, content_hash, result.error)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"Extraction worker error for blob {content_hash[:12]}: {e}")
+                try:
+                    await asyncio.to_thread(_finish_job, content_hash, f"Internal error: {type(e).__name__}")
+                except Exception:
+                    pass
+            finally:
+                self._queue.task_done()
+
+
+def _failure_reason(error: str) -> str:
+    """Bucket an error message for the failure counters"""
+    lowered = error.lower()
+    for reason in ("timed out", "memory", "cpu", "killed", "signal"):
+        if reason in lowered:
+            return reason.replace(" ", "_")
+    return "parse_error"
+
+
+def _lease_expired():
+    """Filter for 'processing' blobs whose lease ran out (or predates leases)"""
+    cutoff = datetime.utcnow() - timedelta(seconds=EXTRACTION_LEASE_SECONDS)
+    return and_(
+        FileBlob.extraction_status == "processing",
+        or_(FileBlob.claimed_at.is_(None), FileBlob.claimed_at < cutoff),
+    )
+
+
+def _reset_interrupted_jobs() -> int:
+    """Put blobs whose 'processing' lease expired (their replica died) back to 'pending'"""
+    with Session(engine) as session:
+        result = session.execute(
+            update(FileBlob)
+            .where(_lease_expired())
+            .values(extraction_status="pending", claimed_at=None)
+        )
+        session.commit()
+        return result.rowcount
+
+
+def _pending_blob_hashes(limit: int) -> list[str]:
+    with Session(engine) as session:
+        return list(session.exec(
+            select(FileBlob.content_hash)
+            .where(FileBlob.extraction_status == "pending", FileBlob.ref_count > 0)
+            .order_by(FileBlob.created_at)
+            .limit(limit)
+        ).all())
+
+
+class PageWriter:
+    """
+    Persists streamed pages for one blob
+
+    The first page is written immediately (time to first usable text);
+    after that pages are written in batches of EXTRACTION_PAGE_BATCH.
+    """
+
+    def __init__(self, content_hash: str):
+        self.content_hash = content_hash
+        self.page_count: Optional[int] = None
+        self._buffer: List[Tuple[int, str]] = []
+        self._written = 0
+
+    def add(self, page_number: int, text: str, page_count: Optional[int]):
+        self.page_count = page_count
+        self._buffer.append((page_number, text))
+        if self._written == 0 or len(self._buffer) >= EXTRACTION_PAGE_BATCH:
+            self.flush()
+
+    def flush(self):
+        """Write buffered pages and advance pages_extracted"""
+        with Session(engine) as session:
+            for page_number, text in self._buffer:
+                session.add(FilePage(content_hash=self.content_hash, page_number=page_number, content=text))
+
+            # Each write renews the job's lease
+            values = {"claimed_at": datetime.utcnow()}
+            if self.page_count is not None:
+                values["page_count"] = self.page_count
+            if self._buffer:
+                values["pages_extracted"] = self._buffer[-1][0] + 1
+            session.execute(update(FileBlob).where(FileBlob.content_hash == self.content_hash).values(**values))
+            session.commit()
+
+        self._written += len(self._buffer)
+        self._buffer.clear()
+
+
+def _extract_job(content_hash: str, backend: str, key: str, file_type: str, start_page: int) -> SandboxResult:
+    """Run one background extraction, persisting pages as they arrive"""
+    writer = PageWriter(content_hash)
+    with get_storage(backend).local_copy(key) as file_path:
+        result = run_sandboxed_extraction(
+            file_path,
+            file_type,
+            on_page=writer.add,
+            start_page=start_page,
+            max_chars=EXTRACTION_MAX_CHARS or None,
+        )
+    writer.page_count = result.page_count
+    writer.flush()
+    return result
+
+
+def _claim_job(content_hash: str) -> Optional[Tuple[str, str, str, int]]:
+    """
+    Atomically move a referenced blob from pending to processing
+
+    Returns:
+        (storage backend, storage key, file_type, first page still to extract),
+        or None if another worker has it or no upload references it any more
+    """
+    with Session(engine) as session:
+        row = session.execute(
+            update(FileBlob)
+            .where(
+                FileBlob.content_hash == content_hash,
+                FileBlob.extraction_status == "pending",
+                FileBlob.ref_count > 0,
+            )
+            .values(extraction_status="processing", claimed_at=datetime.utcnow())
+            .returning(FileBlob.storage_backend, FileBlob.storage_key, FileBlob.file_type, FileBlob.pages_extracted)
+        ).first()
+        session.commit()
+        return tuple(row) if row else None
+
+
+def _finish_job(content_hash: str, error: Optional[str]):
+    """Record an extraction outcome on the blob and every upload of it"""
+    with Session(engine) as session:
+        blob = session.get(FileBlob, content_hash)
+        if not blob:
+            return  # Deleted while extracting
+
+        has_text = session.exec(
+            select(FilePage.id).where(FilePage.content_hash == content_hash, FilePage.content != "").limit(1)
+        ).first() is not None
+        if not has_text and not error:
+            error = "No text could be extracted"
+
+        blob.extraction_status = "failed" if error else "done"
+        blob.claimed_at = None
+        blob.extraction_error = error[:500] if error else None
+        blob.processed_at = datetime.utcnow()
+        session.add(blob)
+        session.execute(
+            update(FileUpload).where(FileUpload.content_hash == content_hash).values(processed=has_text)
+        )
+        session.commit()
+
+    if error:
+        print(f"Extraction failed for blob {content_hash[:12]}: {error}")
+
+    # Whatever pages were extracted (even by a failed job) become searchable
+    _index_quietly(content_hash)
+
+
+def _index_quietly(content_hash: str):
+    """Index a blob's new pages; failures are left for index_pending_blobs()"""
+    try:
+        if index_blob(content_hash):
+            # Embed the new chunks now rather than in the user's next chat request
+            sync_blob_users(content_hash)
+    except Exception as e:
+        print(f"Indexing failed for blob {content_hash[:12]}: {e}")
+
+
+def read_file_text(session: Session, content_hash: str, max_chars: Optional[int] = None) -> Tuple[str, bool]:
+    """
+    Read a blob's extracted text page by page, stopping at a character budget
+
+    Pages are streamed from file_pages in order, so a preview never loads
+    the rest of the document. Works while extraction is still running.
+
+    Args:
+        session: Database session
+        content_hash: Blob to read
+        max_chars: Character budget (None for everything extracted so far)
+
+    Returns:
+        (text, truncated) - truncated is True if more text exists or remains unextracted
+    """
+    statement = (
+        select(FilePage.content)
+        .where(FilePage.content_hash == content_hash)
+        .order_by(FilePage.page_number)
+        .execution_options(yield_per=8)
+    )
+
+    parts: List[str] = []
+    chars = 0
+    for content in session.exec(statement):
+        if not content:
+            continue
+        if max_chars is not None and chars + len(content) > max_chars:
+            parts.append(content[:max_chars - chars])
+            return "\n\n".join(parts), True
+        parts.append(content)
+        chars += len(content) + 2
+
+    blob = session.get(FileBlob, content_hash)
+    # A page count of None means the end of the document hasn't been reached
+    unextracted = bool(blob) and (blob.page_count is None or blob.pages_extracted < blob.page_count)
+    return "\n\n".join(parts), unextracted
+
+
+def extract_pages_on_demand(content_hash: str, through_page: int) -> Optional[str]:
+    """
+    Extract pages beyond the background budget, up to (not including) through_page
+
+    Blocking; runs in the sandbox. Only blobs whose background extraction is
+    done are extended, and the status is held at 'processing' (under a
+    lease, like background jobs) meanwhile so concurrent requests never
+    parse the same page twice.
+
+    Returns:
+        Error message, or None if the pages are available (or nothing was needed)
+    """
+    with Session(engine) as session:
+        row = session.execute(
+            update(FileBlob)
+            .where(
+                FileBlob.content_hash == content_hash,
+                FileBlob.extraction_status == "done",
+                # A page count of None means the end hasn't been reached yet (DOCX)
+                or_(FileBlob.page_count.is_(None), FileBlob.pages_extracted < FileBlob.page_count),
+                FileBlob.pages_extracted < through_page,
+            )
+            .values(extraction_status="processing", claimed_at=datetime.utcnow())
+            .returning(FileBlob.storage_backend, FileBlob.storage_key, FileBlob.file_type, FileBlob.pages_extracted)
+        ).first()
+        session.commit()
+
+    if row is None:
+        return None
+
+    writer = PageWriter(content_hash)
+    try:
+        with get_storage(row.storage_backend).local_copy(row.storage_key) as file_path:
+            result = run_sandboxed_extraction(
+                file_path,
+                row.file_type,
+                on_page=writer.add,
+                start_page=row.pages_extracted,
+                max_pages=through_page - row.pages_extracted,
+            )
+        writer.page_count = result.page_count
+        writer.flush()
+        extraction_queue.stats.record(result.seconds, items=result.pages, ok=result.ok)
+        _index_quietly(content_hash)
+        return result.error
+    finally:
+        # Background extraction already succeeded; an on-demand failure doesn't change that
+        with Session(engine) as session:
+            session.execute(
+                update(FileBlob)
+                .where(FileBlob.content_hash == content_hash)
+                .values(extraction_status="done", claimed_at=None)
+            )
+            session.commit()
+
+
+# Global instance
+extraction_queue = ExtractionQueue()
@@ -3,31 +3,385 @@ File processing utilities for PDF and DOCX extraction
 """
 
 import os
+import re
+import uuid
+import hashlib
+import zipfile
+import xml.etree.ElementTree as ET
+import anyio
 import PyPDF2
-import docx
-from typing import Optional
+from fastapi import UploadFile
+from typing import AsyncIterator, Iterator, Optional, Sequence, Tuple
 
+# Read/write granularity for streamed uploads
+UPLOAD_CHUNK_SIZE = 256 * 1024
 
-def extract_text_from_pdf(file_path: str) -> Optional[str]:
+# DOCX has no fixed pages; text is grouped into pages of about this many characters
+DOCX_PAGE_CHARS = 3000
+
+WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DOCX_HEADER_FOOTER = re.compile(r"^word/(header|footer)\d*\.xml$")
+
+
+class FileTooLargeError(Exception):
+    """Raised when an upload exceeds the allowed size while streaming"""
+
+    def __init__(self, max_bytes: int):
+        super().__init__(f"File exceeds {max_bytes} bytes")
+        self.max_bytes = max_bytes
+
+
+async def save_upload_to_temp(upload: UploadFile, dest_dir: str, max_bytes: int) -> Tuple[str, int, str]:
+    """
+    Stream an upload to a temp file in dest_dir without holding it in memory
+
+    Copies UPLOAD_CHUNK_SIZE chunks through non-blocking file I/O, hashes
+    while streaming, and aborts as soon as max_bytes is exceeded. The temp
+    file lives in dest_dir so the caller can os.replace() it into place
+    atomically.
+
+    Args:
+        upload: Incoming upload
+        dest_dir: Directory for the temp file (same filesystem as the final path)
+        max_bytes: Maximum allowed size
+
+    Returns:
+        (temp_path, size_in_bytes, sha256_hex)
+
+    Raises:
+        FileTooLargeError: if the upload is larger than max_bytes (temp file removed)
+    """
+    # Starlette already knows the spooled size; reject before copying anything
+    if upload.size is not None and upload.size > max_bytes:
+        raise FileTooLargeError(max_bytes)
+
+    temp_path = os.path.join(dest_dir, f".upload-{uuid.uuid4().hex}.part")
+    sha256 = hashlib.sha256()
+    size = 0
+
+    try:
+        async with await anyio.open_file(temp_path, "wb") as out:
+            while chunk := await upload.read(UPLOAD_CHUNK_SIZE):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileTooLargeError(max_bytes)
+                sha256.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        await anyio.to_thread.run_sync(remove_file_quietly, temp_path)
+        raise
+
+    return temp_path, size, sha256.hexdigest()
+
+
+async def save_stream_to_temp(stream: AsyncIterator[bytes], dest_dir: str, max_bytes: int, hashers: Sequence = ()) -> Tuple[str, int]:
+    """
+    Stream raw request body chunks to a temp file in dest_dir
+
+    Like save_upload_to_temp(), for bodies that aren't multipart forms
+    (resumable upload chunks).
+
+    Args:
+        stream: Async iterator of body chunks (e.g. Request.stream())
+        dest_dir: Directory for the temp file
+        max_bytes: Maximum allowed size
+        hashers: hashlib objects updated with every byte written
+
+    Returns:
+        (temp_path, size_in_bytes)
+
+    Raises:
+        FileTooLargeError: if the body is larger than max_bytes (temp file removed)
+    """
+    temp_path = os.path.join(dest_dir, f".chunk-{uuid.uuid4().hex}.part")
+    size = 0
+
+    try:
+        async with await anyio.open_file(temp_path, "wb") as out:
+            async for chunk in stream:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise FileTooLargeError(max_bytes)
+                for hasher in hashers:
+                    hasher.update(chunk)
+                await out.write(chunk)
+    except BaseException:
+        await anyio.to_thread.run_sync(remove_file_quietly, temp_path)
+        raise
+
+    return temp_path, size
+
+
+def remove_file_quietly(file_path: str):
+    """Delete a file if it exists, ignoring errors"""
+    try:
+        os.remove(file_path)
+    except OSError:
+        pass
+
+
+def open_pdf_pages(file_path: str, start_page: int = 0) -> Tuple[int, Iterator[Tuple[int, str]]]:
+    """
+    Open a PDF for page-by-page extraction
+
+    Only the cross-reference table is parsed up front; each page's text is
+    extracted when the iterator reaches it, so callers that stop early
+    never pay for the rest of the document.
+
+    Args:
+        file_path: Path to PDF file
+        start_page: First page to extract (0-based)
+
+    Returns:
+        (total page count, iterator of (page_number, text))
+    """
+    file = open(file_path, 'rb')
+    try:
+        pdf_reader = PyPDF2.PdfReader(file)
+        page_count = len(pdf_reader.pages)
+    except BaseException:
+        file.close()
+        raise
+
+    def pages() -> Iterator[Tuple[int, str]]:
+        with file:
+            for page_number in range(start_page, page_count):
+                yield page_number, pdf_reader.pages[page_number].extract_text() or ""
+
+    return page_count, pages()
+
+
+def _iter_wordml_blocks(xml_file) -> Iterator[str]:
+    """
+    Stream text blocks out of a WordprocessingML part
+
+    Paragraphs outside tables become one block each; each table row becomes
+    one block with its cells joined by " | ". Finished elements are cleared
+    (and dropped from their container) as parsing goes, so memory stays
+    flat regardless of document size.
+    """
+    paragraph, table_row, table_cell, table = (
+        WORD_NS + "p", WORD_NS + "tr", WORD_NS + "tc", WORD_NS + "tbl"
+    )
+    text_tag, tab_tag, break_tags = WORD_NS + "t", WORD_NS + "tab", (WORD_NS + "br", WORD_NS + "cr")
+
+    def paragraph_text(elem) -> str:
+        parts = []
+        for node in elem.iter():
+            if node.tag == text_tag:
+                parts.append(node.text or "")
+            elif node.tag == tab_tag:
+                parts.append("\t")
+            elif node.tag in break_tags:
+                parts.append("\n")
+        return "".join(parts)
+
+    containers = []  # open body/table-cell elements whose finished children can be dropped
+    table_depth = 0
+
+    for event, elem in ET.iterparse(xml_file, events=("start", "end")):
+        tag = elem.tag
+        if event == "start":
+            if tag == table:
+                table_depth += 1
+            elif tag in (WORD_NS + "body", WORD_NS + "hdr", WORD_NS + "ftr"):
+                containers.append(elem)
+            continue
+
+        if tag == paragraph and table_depth == 0:
+            text = paragraph_text(elem)
+            if text.strip():
+                yield text
+            # Clear in place too: text-box paragraphs nest inside an outer paragraph
+            elem.clear()
+            if containers:
+                containers[-1].clear()
+        elif tag == table_row:
+            cells = []
+            for cell in elem.iter(table_cell):
+                cell_text = "\n".join(
+                    t for t in (paragraph_text(p) for p in cell.iter(paragraph)) if t.strip()
+                )
+                cells.append(cell_text)
+            if any(cells):
+                yield " | ".join(cells)
+            elem.clear()
+        elif tag == table:
+            table_depth -= 1
+            if table_depth == 0 and containers:
+                containers[-1].clear()
+
+
+def iter_docx_blocks(file_path: str) -> Iterator[str]:
+    """
+    Stream text out of a DOCX without building the python-docx object model
+
+    Reads word/document.xml straight from the zip with iterparse, yielding
+    body paragraphs and table rows in document order, followed by distinct
+    header and footer text.
+
+    Args:
+        file_path: Path to DOCX file
+
+    Raises:
+        zipfile.BadZipFile, KeyError, ET.ParseError: if the file is not a valid DOCX
+    """
+    with zipfile.ZipFile(file_path) as archive:
+        with archive.open("word/document.xml") as xml_file:
+            yield from _iter_wordml_blocks(xml_file)
+
+        seen = set()
+        parts = [n for n in archive.namelist() if DOCX_HEADER_FOOTER.match(n)]
+        for name in sorted(parts, key=lambda n: ("footer" in n, n)):
+            with archive.open(name) as xml_file:
+                for block in _iter_wordml_blocks(xml_file):
+                    if block not in seen:
+                        seen.add(block)
+                        yield block
+
+
+def open_docx_pages(file_path: str, start_page: int = 0) -> Tuple[Optional[int], Iterator[Tuple[int, str]]]:
+    """
+    Open a DOCX for page-by-page extraction
+
+    Blocks from iter_docx_blocks() are grouped into pages of about
+    DOCX_PAGE_CHARS characters. The page count is unknown until the whole
+    document has been read, so it is returned as None.
+
+    Args:
+        file_path: Path to DOCX file
+        start_page: First page to extract (0-based; earlier pages are parsed and skipped)
+
+    Returns:
+        (None, iterator of (page_number, text))
+    """
+    def pages() -> Iterator[Tuple[int, str]]:
+        page_number = 0
+        current = []
+        length = 0
+
+        for block in iter_docx_blocks(file_path):
+            current.append(block)
+            length += len(block) + 2
+            if length >= DOCX_PAGE_CHARS:
+                if page_number >= start_page:
+                    yield page_number, "\n\n".join(current)
+                page_number += 1
+                current = []
+                length = 0
+
+        if current and page_number >= start_page:
+            yield page_number, "\n\n".join(current)
+
+    return None, pages()
+
+
+def open_document_pages(file_path: str, file_type: str, start_page: int = 0) -> Tuple[Optional[int], Iterator[Tuple[int, str]]]:
+    """
+    Open a document for page-by-page extraction based on type
+
+    Args:
+        file_path: Path to file
+        file_type: File extension (pdf, docx, doc)
+        start_page: First page to extract (0-based)
+
+    Returns:
+        (total page count or None if not known up front, iterator of (page_number, text))
+
+    Raises:
+        ValueError: if the file type is not supported
+    """
+    file_type = file_type.lower().replace('.', '')
+
+    if file_type == 'pdf':
+        return open_pdf_pages(file_path, start_page)
+    elif file_type in ['docx', 'doc']:
+        return open_docx_pages(file_path, start_page)
+    else:
+        raise ValueError(f"Unsupported file type: {file_type}")
+
+
+def limit_pages(
+    pages: Iterator[Tuple[int, str]],
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None
+) -> Iterator[Tuple[int, str]]:
+    """
+    Stop a page iterator once a page or character budget is used up
+
+    The page that crosses max_chars is still yielded whole, so no page is
+    ever split.
+
+    Args:
+        pages: Iterator of (page_number, text)
+        max_pages: Maximum pages to yield (None for no limit)
+        max_chars: Stop after this many characters of text (None for no limit)
+    """
+    chars = 0
+    count = 0
+    # Check the budget before pulling the next page so it is never parsed needlessly
+    while (max_pages is None or count < max_pages) and (max_chars is None or chars < max_chars):
+        try:
+            page_number, text = next(pages)
+        except StopIteration:
+            return
+        count += 1
+        chars += len(text)
+        yield page_number, text
+
+
+def read_document_text(
+    file_path: str,
+    file_type: str,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None
+) -> Tuple[Optional[str], int]:
+    """
+    Extract text from a file based on type, raising on malformed input
+
+    Args:
+        file_path: Path to file
+        file_type: File extension (pdf, docx, doc)
+        max_pages: Optional page budget
+        max_chars: Optional character budget
+
+    Returns:
+        (extracted text or None, pages processed)
+
+    Raises:
+        ValueError: if the file type is not supported
+    """
+    _, pages = open_document_pages(file_path, file_type)
+    text = []
+    processed = 0
+
+    for _, page_text in limit_pages(pages, max_pages, max_chars):
+        processed += 1
+        if page_text:
+            text.append(page_text)
+
+    pages.close()
+    return ("\n\n".join(text) if text else None), processed
+
+
+def extract_text_from_pdf(
+    file_path: str,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None
+) -> Optional[str]:
     """
     Extract text from PDF file
 
     Args:
         file_path: Path to PDF file
+        max_pages: Stop after this many pages (None for all)
+        max_chars: Stop once this many characters are extracted (None for all)
 
     Returns:
         Extracted text or None if error
     """
     try:
-        text = []
-        with open(file_path, 'rb') as file:
-            pdf_reader = PyPDF2.PdfReader(file)
-            for page in pdf_reader.pages:
-                page_text = page.extract_text()
-                if page_text:
-                    text.append(page_text)
-
-        return "\n\n".join(text) if text else None
+        return read_document_text(file_path, 'pdf', max_pages, max_chars)[0]
     except Exception as e:
         print(f"Error extracting PDF text: {e}")
         return None
@@ -44,14 +398,7 @@ def extract_text_from_docx(file_path: str) -> Optional[str]:
         Extracted text or None if error
     """
     try:
-        doc = docx.Document(file_path)
-        text = []
-
-        for paragraph in doc.paragraphs:
-            if paragraph.text.strip():
-                text.append(paragraph.text)
-
-        return "\n\n".join(text) if text else None
+        return read_document_text(file_path, 'docx')[0]
     except Exception as e:
         print(f"Error extracting DOCX text: {e}")
         return None
@@ -78,10 +425,28 @@ def extract_text_from_file(file_path: str, file_type: str) -> Optional[str]:
         return None
 
 
+def _split_paragraph(para: str, max_chars: int) -> Iterator[str]:
+    """Split an over-long paragraph at the last line break or space before max_chars"""
+    while len(para) > max_chars:
+        cut = para.rfind("\n", 0, max_chars)
+        if cut <= 0:
+            cut = para.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield para[:cut]
+        para = para[cut:].lstrip()
+    if para:
+        yield para
+
+
 def chunk_text(text: str, max_tokens: int = 4000) -> list[str]:
     """
     Chunk text into smaller pieces for AI context
 
+    Chunks break at paragraph boundaries; a paragraph longer than a whole
+    chunk (e.g. a PDF page without blank lines) is split at line breaks or
+    spaces.
+
     Args:
         text: Full text content
         max_tokens: Max tokens per chunk (approximate by chars)
@@ -96,7 +461,11 @@ def chunk_text(text: str, max_tokens: int = 4000) -> list[str]:
         return [text]
 
     # Split into chunks at paragraph breaks
-    paragraphs = text.split('\n\n')
+    paragraphs = (
+        piece
+        for para in text.split('\n\n')
+        for piece in _split_paragraph(para, max_chars)
+    )
     chunks = []
     current_chunk = []
     current_length = 0
@@ -6,12 +6,17 @@ TaskFlow Backend - GIAIC Hackathon Phase II
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from contextlib import asynccontextmanager
+import asyncio
 import os
 from dotenv import load_dotenv
 
 from app.database import create_db_and_tables
 from app.routers import auth, tasks, chat, files, admin, notifications
 from app.scheduler import start_scheduler, stop_scheduler
+from app.extraction import extraction_queue
+from app.blob_store import backfill_blobs, relocate_blobs, restore_legacy_text
+from app.document_index import index_pending_blobs
+from app.storage import STORAGE_BACKEND
 
 load_dotenv()
 
@@ -26,16 +31,42 @@ async def lifespan(app: FastAPI):
     create_db_and_tables()
     print("Database tables created successfully!")
 
+    # Move uploads from before the content-addressed store into it
+    moved = await asyncio.to_thread(backfill_blobs)
+    if moved:
+        print(f"Moved {moved} legacy uploads into the blob store")
+
+    # Uploads whose file is gone keep the text extracted before the blob store
+    restored = await asyncio.to_thread(restore_legacy_text)
+    if restored:
+        print(f"Restored legacy extracted text for {restored} uploads")
+
+    # Move blobs to the configured storage backend and sharded key layout
+    relocated = await asyncio.to_thread(relocate_blobs)
+    if relocated:
+        print(f"Relocated {relocated} blobs to {STORAGE_BACKEND} storage")
+
+    # Index extracted text that isn't searchable by chat yet
+    indexed = await asyncio.to_thread(index_pending_blobs)
+    if indexed:
+        print(f"Indexed {indexed} document chunks")
+
     # Start email reminder scheduler
     print("Starting email reminder scheduler...")
     start_scheduler()
     print("Scheduler started - checking reminders every 10 minutes")
 
+    # Start background text extraction workers
+    print("Starting text extraction workers...")
+    await extraction_queue.start()
+
     yield
 
     # Shutdown
     print("Shutting down scheduler...")
     stop_scheduler()
+    print("Shutting down extraction workers...")
+    await extraction_queue.stop()
     print("Shutting down...")
 
 
@@ -0,0 +1,98 @@
+"""
+Lightweight in-process metrics
+Latency/throughput counters for background pipelines (email, extraction) and
+model prompt caching
+"""
+
+from collections import deque
+from threading import Lock
+from typing import Any, Dict
+
+
+class LatencyStats:
+    """
+    Thread-safe latency recorder
+
+    Keeps running totals plus a bounded window of recent samples for
+    percentiles, so memory stays constant no matter how many events are recorded.
+    """
+
+    def __init__(self, window: int = 1000):
+        self._lock = Lock()
+        self._samples = deque(maxlen=window)
+        self.calls = 0
+        self.items = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def record(self, seconds: float, items: int = 1, ok: bool = True):
+        """Record one operation that handled `items` units of work"""
+        with self._lock:
+            self.calls += 1
+            self.items += items
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+            self._samples.append(seconds)
+            if not ok:
+                self.failures += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return current totals and recent percentiles (milliseconds)"""
+        with self._lock:
+            samples = sorted(self._samples)
+            calls, items, failures = self.calls, self.items, self.failures
+            total, max_seconds = self.total_seconds, self.max_seconds
+
+        def percentile(p: float) -> float:
+            if not samples:
+                return 0.0
+            return round(samples[min(len(samples) - 1, int(p * len(samples)))] * 1000, 2)
+
+        return {
+            "calls": calls,
+            "items": items,
+            "failures": failures,
+            "total_seconds": round(total, 3),
+            "avg_ms": round(total / calls * 1000, 2) if calls else 0.0,
+            "p50_ms": percentile(0.50),
+            "p95_ms": percentile(0.95),
+            "max_ms": round(max_seconds * 1000, 2),
+            "items_per_second": round(items / total, 1) if total else 0.0,
+        }
+
+
+class PromptCacheStats:
+    """
+    Thread-safe provider prompt-cache counters
+
+    Prompt and cached input tokens reported by the model API, and call
+    latency split by whether any of the prompt was served from cache, to
+    check that a stable prompt prefix actually gets cache hits.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.cached = LatencyStats()
+        self.uncached = LatencyStats()
+
+    def record(self, prompt_tokens: int, cached_tokens: int, seconds: float):
+        """Record one model call; seconds is its latency (time to first token when streamed)"""
+        with self._lock:
+            self.prompt_tokens += prompt_tokens
+            self.cached_tokens += cached_tokens
+        (self.cached if cached_tokens else self.uncached).record(seconds)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return token totals, the cached ratio and latency with and without a cache hit"""
+        with self._lock:
+            prompt_tokens, cached_tokens = self.prompt_tokens, self.cached_tokens
+        return {
+            "prompt_tokens": prompt_tokens,
+            "cached_tokens": cached_tokens,
+            "cached_ratio": round(cached_tokens / prompt_tokens, 3) if prompt_tokens else 0.0,
+            "latency_cached": self.cached.snapshot(),
+            "latency_uncached": self.uncached.snapshot(),
+        }
@@ -4,12 +4,25 @@ Models package
 
 from .user import User, UserCreate, UserLogin, UserResponse
 from .task import Task, TaskCreate, TaskUpdate, TaskResponse
+from .reminder import TaskReminder
 from .file import (
     FileUpload,
+    FileBlob,
+    FilePage,
+    DocumentChunk,
+    DocumentChunkTerm,
+    UploadSession,
+    UploadChunk,
+    UserStorageUsage,
     FilePermission,
     PermissionRequest,
     FileUploadResponse,
+    FileStatusResponse,
+    FilePageResponse,
+    FilePagesResponse,
     FileListResponse,
+    UploadSessionCreate,
+    UploadSessionResponse,
     PermissionGrantRequest,
     PermissionResponse,
     PermissionRequestResponse,
@@ -33,11 +46,24 @@ __all__ = [
     "TaskCreate",
     "TaskUpdate",
     "TaskResponse",
+    "TaskReminder",
     "FileUpload",
+    "FileBlob",
+    "FilePage",
+    "DocumentChunk",
+    "DocumentChunkTerm",
+    "UploadSession",
+    "UploadChunk",
+    "UserStorageUsage",
     "FilePermission",
     "PermissionRequest",
     "FileUploadResponse",
+    "FileStatusResponse",
+    "FilePageResponse",
+    "FilePagesResponse",
     "FileListResponse",
+    "UploadSessionCreate",
+    "UploadSessionResponse",
     "PermissionGrantRequest",
     "PermissionResponse",
     "PermissionRequestResponse",
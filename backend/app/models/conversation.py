@@ -4,7 +4,7 @@ Phase III: AI Integration
 """
 
 from sqlmodel import SQLModel, Field, Column, Relationship
-from sqlalchemy import JSON, TEXT
+from sqlalchemy import JSON, TEXT, Index
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
@@ -19,6 +19,10 @@ class Conversation(SQLModel, table=True):
     title: Optional[str] = Field(default=None, max_length=200)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow, index=True)
+    # Rolling summary of the messages up to summary_through (a message id),
+    # sent in place of them (see app.chat_context)
+    summary: Optional[str] = Field(default=None, sa_column=Column(TEXT))
+    summary_through: Optional[int] = Field(default=None)
 
     # Relationship to messages
     messages: List["Message"] = Relationship(back_populates="conversation", cascade_delete=True)
@@ -28,12 +32,17 @@ class Message(SQLModel, table=True):
     """Message model - individual chat messages"""
 
     __tablename__ = "messages"
+    __table_args__ = (
+        # Chat history reads a conversation's latest messages
+        Index("ix_messages_conversation_created", "conversation_id", "created_at"),
+    )
 
     id: Optional[int] = Field(default=None, primary_key=True)
     conversation_id: int = Field(foreign_key="conversations.id", index=True)
     role: str = Field(max_length=20)  # "user" or "assistant"
     content: str = Field(sa_column=Column(TEXT))  # Message text
     tool_calls: Optional[Dict[str, Any]] = Field(default=None, sa_column=Column(JSON))  # Tool execution data
+    token_count: Optional[int] = Field(default=None)  # Estimated prompt tokens of content; None until counted
     created_at: datetime = Field(default_factory=datetime.utcnow, index=True)
 
     # Relationship to conversation
@@ -3,9 +3,10 @@ File upload and permission models
 """
 
 from sqlmodel import SQLModel, Field, Column
-from sqlalchemy import JSON
+from sqlalchemy import JSON, BigInteger, Index, UniqueConstraint
 from datetime import datetime
 from typing import Optional
+import uuid
 
 
 class FileUpload(SQLModel, table=True):
@@ -20,11 +21,138 @@ class FileUpload(SQLModel, table=True):
     file_path: str = Field(max_length=500)
     file_size: int  # Size in bytes
     file_type: str = Field(max_length=50)  # pdf, doc, docx
-    processed_content: Optional[str] = Field(default=None)  # Extracted text
+    content_hash: Optional[str] = Field(default=None, max_length=64, index=True)  # SHA-256 hex, key into file_blobs
     upload_date: datetime = Field(default_factory=datetime.utcnow)
     processed: bool = Field(default=False)
 
 
+class FileBlob(SQLModel, table=True):
+    """
+    Content-addressed file contents, shared by every upload with the same SHA-256
+
+    ref_count is the number of FileUpload rows pointing at the blob; the
+    stored object, extraction state and extracted pages belong to the blob,
+    so identical uploads are stored and extracted once.
+    """
+
+    __tablename__ = "file_blobs"
+
+    content_hash: str = Field(primary_key=True, max_length=64)  # SHA-256 hex
+    size: int  # Size in bytes
+    file_type: str = Field(max_length=50)  # pdf, doc, docx (from the first upload)
+    storage_backend: str = Field(default="local", max_length=20)  # app.storage backend name
+    storage_key: str = Field(max_length=500)  # ab/cd/<hash> within the backend
+    ref_count: int = Field(default=1)  # 0 = unreferenced, deleted by the blob collector
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    extraction_status: str = Field(default="pending", max_length=20, index=True)  # pending, processing, done, failed
+    claimed_at: Optional[datetime] = Field(default=None)  # Lease of the replica 'processing' it, renewed per page batch
+    extraction_error: Optional[str] = Field(default=None, max_length=500)
+    processed_at: Optional[datetime] = Field(default=None)
+    page_count: Optional[int] = Field(default=None)  # Total pages; None until the end has been reached
+    pages_extracted: int = Field(default=0)  # Pages 0..pages_extracted-1 are in file_pages
+    pages_indexed: int = Field(default=0)  # Pages 0..pages_indexed-1 are in document_chunks
+
+
+class FilePage(SQLModel, table=True):
+    """Extracted text of one page of a blob, so no page is ever parsed twice"""
+
+    __tablename__ = "file_pages"
+    __table_args__ = (
+        UniqueConstraint("content_hash", "page_number", name="uq_file_pages_hash_page"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    content_hash: str = Field(foreign_key="file_blobs.content_hash", ondelete="CASCADE", max_length=64)
+    page_number: int  # 0-based
+    content: str = Field(default="")
+
+
+class DocumentChunk(SQLModel, table=True):
+    """
+    A passage of a blob's extracted text, the unit of chat retrieval
+
+    Chunks never span pages, so a hit can be cited by page. The terms of
+    each chunk are in document_chunk_terms (see app.document_index).
+    """
+
+    __tablename__ = "document_chunks"
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    content_hash: str = Field(foreign_key="file_blobs.content_hash", ondelete="CASCADE", max_length=64, index=True)
+    page_number: int  # 0-based page the passage comes from
+    content: str
+    length: int  # Number of indexed terms, for BM25 length normalization
+
+
+class DocumentChunkTerm(SQLModel, table=True):
+    """Inverted index posting: how often a term occurs in a chunk"""
+
+    __tablename__ = "document_chunk_terms"
+    __table_args__ = (
+        Index("ix_document_chunk_terms_term", "term", "chunk_id"),
+    )
+
+    chunk_id: int = Field(foreign_key="document_chunks.id", ondelete="CASCADE", primary_key=True)
+    term: str = Field(max_length=64, primary_key=True)
+    tf: int  # Occurrences of term in the chunk
+
+
+class UploadSession(SQLModel, table=True):
+    """
+    Resumable (tus-style) upload in progress
+
+    offset is the number of bytes received so far; every chunk is stored
+    in the storage backend as it arrives (see UploadChunk), so any replica
+    can accept the next chunk. Sessions not completed by expires_at are
+    deleted with their chunks.
+    """
+
+    __tablename__ = "upload_sessions"
+
+    id: str = Field(default_factory=lambda: uuid.uuid4().hex, primary_key=True, max_length=32)
+    user_id: str = Field(foreign_key="users.id", index=True)
+    original_filename: str = Field(max_length=255)
+    file_type: str = Field(max_length=50)  # pdf, doc, docx
+    total_size: int  # Declared size in bytes
+    offset: int = Field(default=0)  # Bytes received and stored
+    sha256: Optional[str] = Field(default=None, max_length=64)  # Expected SHA-256 of the whole file, if given
+    storage_backend: str = Field(default="local", max_length=20)  # Where the chunks are stored
+    created_at: datetime = Field(default_factory=datetime.utcnow)
+    expires_at: datetime = Field(index=True)  # Pushed back by every chunk
+
+
+class UploadChunk(SQLModel, table=True):
+    """One stored chunk of a resumable upload"""
+
+    __tablename__ = "upload_chunks"
+    __table_args__ = (
+        UniqueConstraint("session_id", "offset", name="uq_upload_chunks_session_offset"),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    session_id: str = Field(foreign_key="upload_sessions.id", ondelete="CASCADE", max_length=32)
+    offset: int  # Position of the chunk's first byte in the file
+    size: int
+    sha256: str = Field(max_length=64)
+    storage_key: str = Field(max_length=500)
+
+
+class UserStorageUsage(SQLModel, table=True):
+    """
+    Running totals of a user's uploads, so quota checks read one row
+
+    Kept in step with file_uploads by conditional UPDATEs on upload and
+    delete; reconcile_storage_usage() corrects any drift.
+    """
+
+    __tablename__ = "user_storage_usage"
+
+    user_id: str = Field(foreign_key="users.id", primary_key=True)
+    file_count: int = Field(default=0)
+    total_bytes: int = Field(default=0, sa_type=BigInteger)
+    updated_at: datetime = Field(default_factory=datetime.utcnow)
+
+
 class FilePermission(SQLModel, table=True):
     """File upload permission model"""
 
@@ -67,12 +195,53 @@ class FileUploadResponse(SQLModel):
     processed: bool
 
 
+class FileStatusResponse(SQLModel):
+    """Response schema for text extraction status"""
+    id: int
+    processed: bool
+    extraction_status: str
+    extraction_error: Optional[str]
+    processed_at: Optional[datetime]
+    page_count: Optional[int]
+    pages_extracted: int
+
+
+class FilePageResponse(SQLModel):
+    """Response schema for one extracted page"""
+    page_number: int
+    content: str
+
+
+class FilePagesResponse(SQLModel):
+    """Response schema for a range of extracted pages"""
+    file_id: int
+    page_count: Optional[int]
+    pages_extracted: int
+    pages: list[FilePageResponse]
+
+
 class FileListResponse(SQLModel):
     """Response schema for file list"""
     files: list[FileUploadResponse]
     total: int
 
 
+class UploadSessionCreate(SQLModel):
+    """Schema for starting a resumable upload"""
+    filename: str = Field(max_length=255)
+    size: int = Field(ge=1)  # Total size in bytes
+    sha256: Optional[str] = Field(default=None, min_length=64, max_length=64)  # Verified on completion
+
+
+class UploadSessionResponse(SQLModel):
+    """Response schema for a resumable upload"""
+    id: str
+    filename: str
+    size: int
+    offset: int
+    expires_at: datetime
+
+
 class PermissionGrantRequest(SQLModel):
     """Schema for granting permission"""
     user_email: str
@@ -0,0 +1,30 @@
+"""
+Task reminder model - one row per scheduled reminder email
+"""
+
+from sqlmodel import SQLModel, Field
+from sqlalchemy import Index, UniqueConstraint, text
+from datetime import datetime
+from typing import Optional
+
+
+class TaskReminder(SQLModel, table=True):
+    """Scheduled reminder for a task (1 day before, 1 hour before, at due time, overdue, custom)"""
+
+    __tablename__ = "task_reminders"
+    __table_args__ = (
+        UniqueConstraint("task_id", "kind", name="uq_task_reminders_task_kind"),
+        # The sweep only ever looks at unsent rows ordered by fire time
+        Index(
+            "ix_task_reminders_unsent_fire_at",
+            "fire_at",
+            postgresql_where=text("sent_at IS NULL"),
+            sqlite_where=text("sent_at IS NULL"),
+        ),
+    )
+
+    id: Optional[int] = Field(default=None, primary_key=True)
+    task_id: int = Field(foreign_key="tasks.id", ondelete="CASCADE", index=True)
+    fire_at: datetime
+    kind: str = Field(max_length=20)  # before_1d, before_1h, due, overdue, custom
+    sent_at: Optional[datetime] = Field(default=None)
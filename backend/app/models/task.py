@@ -40,6 +40,7 @@ class Task(SQLModel, table=True):
     tags: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))
     due_date: Optional[datetime] = Field(default=None)
     reminder_date: Optional[datetime] = Field(default=None)
+    reminder_offsets: Optional[List[str]] = Field(default=None, sa_column=Column(JSON))  # e.g. ["1d", "1h", "due", "overdue"]
     is_recurring: bool = Field(default=False)
     recurrence_pattern: Optional[dict] = Field(default=None, sa_column=Column(JSON))
     parent_task_id: Optional[int] = Field(default=None)
@@ -57,6 +58,7 @@ class TaskCreate(SQLModel):
     tags: Optional[List[str]] = Field(default=None)
     due_date: Optional[datetime] = Field(default=None)
     reminder_date: Optional[datetime] = Field(default=None)
+    reminder_offsets: Optional[List[str]] = Field(default=None)
     is_recurring: Optional[bool] = Field(default=False)
     recurrence_pattern: Optional[dict] = Field(default=None)
 
@@ -70,6 +72,7 @@ class TaskUpdate(SQLModel):
     tags: Optional[List[str]] = None
     due_date: Optional[datetime] = None
     reminder_date: Optional[datetime] = None
+    reminder_offsets: Optional[List[str]] = None
     is_recurring: Optional[bool] = None
     recurrence_pattern: Optional[dict] = None
 
@@ -85,6 +88,7 @@ class TaskResponse(SQLModel):
     tags: Optional[List[str]]
     due_date: Optional[datetime]
     reminder_date: Optional[datetime]
+    reminder_offsets: Optional[List[str]] = None
     is_recurring: bool
     recurrence_pattern: Optional[dict]
     parent_task_id: Optional[int]
@@ -3,7 +3,7 @@ User model for authentication
 """
 
 from sqlmodel import SQLModel, Field
-from datetime import datetime
+from datetime import date, datetime
 from typing import Optional
 
 
@@ -19,6 +19,7 @@ class User(SQLModel, table=True):
     role: str = Field(default="user", max_length=20)  # "admin" or "user"
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
+    digest_sent_on: Optional[date] = Field(default=None)  # UTC day of the last daily digest
 
 
 class UserCreate(SQLModel):
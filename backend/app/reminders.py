@@ -0,0 +1,209 @@
+"""
+Task reminder scheduling
+Maintains task_reminders rows from each task's due date and offsets,
+and claims due reminders for the email sweep.
+"""
+
+from datetime import datetime, timedelta
+from typing import List, Optional, Tuple
+import os
+import re
+
+from sqlalchemy import and_, or_, update
+from sqlmodel import Session, select
+
+from app.models.reminder import TaskReminder
+from app.models.task import Task
+
+# "overdue" reminders fire this long after the due date
+REMINDER_OVERDUE_AFTER_MINUTES = int(os.getenv("REMINDER_OVERDUE_AFTER_MINUTES", "60"))
+
+# Rows claimed per sweep batch
+REMINDER_CLAIM_BATCH_SIZE = int(os.getenv("REMINDER_CLAIM_BATCH_SIZE", "1000"))
+
+OFFSET_PATTERN = re.compile(r"^(\d+)([mhd])$")
+OFFSET_UNITS = {"m": "minutes", "h": "hours", "d": "days"}
+
+
+def parse_offset(offset: str) -> Tuple[str, Optional[timedelta]]:
+    """
+    Parse a reminder offset
+
+    Accepts "due", "overdue" or a lead time such as "30m", "1h", "1d".
+
+    Returns:
+        (kind, lead time before the due date); lead time is None for "due"/"overdue"
+
+    Raises:
+        ValueError: if the offset is not recognised
+    """
+    offset = offset.strip().lower()
+    if offset in ("due", "overdue"):
+        return offset, None
+
+    match = OFFSET_PATTERN.match(offset)
+    if not match:
+        raise ValueError(f"Invalid reminder offset '{offset}'. Use e.g. '1d', '1h', '30m', 'due' or 'overdue'.")
+
+    amount, unit = match.groups()
+    return f"before_{amount}{unit}", timedelta(**{OFFSET_UNITS[unit]: int(amount)})
+
+
+def validate_offsets(offsets: Optional[List[str]]):
+    """Raise ValueError if any offset is invalid"""
+    for offset in offsets or []:
+        parse_offset(offset)
+
+
+def get_reminder_schedule(task: Task) -> List[Tuple[str, datetime]]:
+    """
+    Compute the (kind, fire_at) reminders a task should have
+
+    - Explicit reminder_offsets are applied relative to due_date
+    - reminder_date adds a one-off "custom" reminder
+    - A task with a reminder_date and a due_date also gets an "overdue" reminder
+
+    Completion doesn't clear the schedule: the sweep skips completed tasks,
+    and keeping the rows (with their sent_at) means reopening a task never
+    re-sends a reminder it already had.
+    """
+    schedule = {}
+
+    if task.due_date:
+        for offset in task.reminder_offsets or []:
+            kind, lead = parse_offset(offset)
+            if kind == "due":
+                schedule[kind] = task.due_date
+            elif kind == "overdue":
+                schedule[kind] = task.due_date + timedelta(minutes=REMINDER_OVERDUE_AFTER_MINUTES)
+            else:
+                schedule[kind] = task.due_date - lead
+
+        if task.reminder_date and "overdue" not in schedule:
+            schedule["overdue"] = task.due_date + timedelta(minutes=REMINDER_OVERDUE_AFTER_MINUTES)
+
+    if task.reminder_date:
+        schedule["custom"] = task.reminder_date
+
+    return sorted(schedule.items(), key=lambda item: item[1])
+
+
+def sync_task_reminders(session: Session, task: Task):
+    """
+    Bring a task's task_reminders rows in line with its current schedule
+
+    Rows whose kind and fire time still match the schedule are kept,
+    sent or not, so edits, completing and reopening never re-send them;
+    rows whose fire time changed are replaced, and kinds no longer
+    scheduled are deleted. New rows whose fire time has already passed are
+    skipped, except "custom" and "overdue" ones (a reminder date set in
+    the past, or moved there, still fires once). Caller commits.
+    """
+    now = datetime.utcnow()
+    desired = dict(get_reminder_schedule(task))
+
+    existing = session.exec(
+        select(TaskReminder).where(TaskReminder.task_id == task.id)
+    ).all()
+
+    for reminder in existing:
+        if desired.get(reminder.kind) == reminder.fire_at:
+            del desired[reminder.kind]
+        else:
+            session.delete(reminder)
+
+    # Deletes must reach the database before re-inserting the same (task_id, kind)
+    session.flush()
+
+    for kind, fire_at in desired.items():
+        if fire_at < now and kind not in ("overdue", "custom"):
+            continue
+        session.add(TaskReminder(task_id=task.id, fire_at=fire_at, kind=kind))
+
+
+def claim_due_reminders(session: Session, horizon: datetime, limit: int = REMINDER_CLAIM_BATCH_SIZE) -> List[TaskReminder]:
+    """
+    Atomically claim up to `limit` unsent reminders firing at or before `horizon`
+
+    Selects through the partial index on unsent rows (an index range scan on
+    fire_at), locks with SKIP LOCKED so concurrent sweeps on other replicas
+    never claim the same row, and marks the rows sent in the same statement.
+    Rows whose email then fails must be handed back with
+    release_reminders(). Caller commits.
+    """
+    claimable = (
+        select(TaskReminder.id)
+        .where(TaskReminder.sent_at.is_(None), TaskReminder.fire_at <= horizon)
+        .order_by(TaskReminder.fire_at)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    )
+
+    statement = (
+        update(TaskReminder)
+        .where(TaskReminder.id.in_(claimable.scalar_subquery()))
+        .values(sent_at=datetime.utcnow())
+        .returning(TaskReminder.id, TaskReminder.task_id, TaskReminder.kind, TaskReminder.fire_at)
+    )
+
+    return [
+        TaskReminder(id=row.id, task_id=row.task_id, kind=row.kind, fire_at=row.fire_at)
+        for row in session.execute(statement).all()
+    ]
+
+
+def claim_user_reminders(
+    session: Session,
+    user_ids: List[str],
+    now: datetime,
+    horizon: datetime,
+    exclude_task_ids: List[int],
+) -> List[TaskReminder]:
+    """
+    Claim the other unsent reminders of users who are getting an email now
+
+    Takes every reminder of these users that is due (fire_at <= now), so a
+    user's due reminders all go out in one email even when they span claim
+    batches, plus those firing by `horizon` (the coalescing window) for
+    tasks not already in the email. Locked with SKIP LOCKED like
+    claim_due_reminders(). Caller commits.
+    """
+    if not user_ids:
+        return []
+
+    claimable = (
+        select(TaskReminder.id)
+        .join(Task, Task.id == TaskReminder.task_id)
+        .where(
+            Task.user_id.in_(user_ids),
+            TaskReminder.sent_at.is_(None),
+            or_(
+                TaskReminder.fire_at <= now,
+                and_(TaskReminder.fire_at <= horizon, TaskReminder.task_id.not_in(exclude_task_ids or [-1])),
+            ),
+        )
+        .with_for_update(skip_locked=True, of=TaskReminder)
+    )
+
+    statement = (
+        update(TaskReminder)
+        .where(TaskReminder.id.in_(claimable.scalar_subquery()))
+        .values(sent_at=datetime.utcnow())
+        .returning(TaskReminder.id, TaskReminder.task_id, TaskReminder.kind, TaskReminder.fire_at)
+    )
+
+    return [
+        TaskReminder(id=row.id, task_id=row.task_id, kind=row.kind, fire_at=row.fire_at)
+        for row in session.execute(statement).all()
+    ]
+
+
+def release_reminders(session: Session, reminder_ids: List[int]):
+    """Return claimed reminders to the unsent pool, e.g. after their email failed. Caller commits."""
+    if not reminder_ids:
+        return
+    session.execute(
+        update(TaskReminder)
+        .where(TaskReminder.id.in_(reminder_ids))
+        .values(sent_at=None)
+    )
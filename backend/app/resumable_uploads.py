@@ -0,0 +1,215 @@
+"""
+Resumable uploads
+tus-style chunked uploads: a client creates an upload session, PATCHes
+chunks at explicit offsets (each with an optional checksum), can ask for
+the current offset after a dropped connection, and completes the upload
+once every byte has arrived.
+
+Chunks are stored in the storage backend as they arrive, so the next
+chunk can go to any replica. Completing an upload stitches the chunks
+into one file and stores it like a regular upload.
+"""
+
+import hashlib
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Tuple
+
+from sqlalchemy import delete
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.file_utils import UPLOAD_CHUNK_SIZE, remove_file_quietly
+from app.models.file import UploadChunk, UploadSession
+from app.storage import UPLOAD_DIR, get_storage
+
+# Sessions with no new chunk for this long are deleted with their chunks
+UPLOAD_SESSION_TTL_HOURS = int(os.getenv("UPLOAD_SESSION_TTL_HOURS", "24"))
+
+# Largest chunk accepted by one PATCH
+UPLOAD_MAX_CHUNK_MB = int(os.getenv("UPLOAD_MAX_CHUNK_MB", "32"))
+
+# Sessions expired per transaction
+UPLOAD_EXPIRY_BATCH_SIZE = int(os.getenv("UPLOAD_EXPIRY_BATCH_SIZE", "100"))
+
+
+class OffsetMismatchError(Exception):
+    """Raised when a chunk doesn't start at the session's current offset"""
+
+    def __init__(self, expected: int):
+        super().__init__(f"Upload offset is {expected}")
+        self.expected = expected
+
+
+def session_expiry() -> datetime:
+    """Expiry for a session that just received a chunk"""
+    return datetime.utcnow() + timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+
+
+def chunk_key(session_id: str, offset: int) -> str:
+    """Storage key for the chunk of a session starting at offset"""
+    return f"partial/{session_id}/{offset:012d}"
+
+
+def append_chunk(session: Session, session_id: str, offset: int, temp_path: str, size: int, sha256: str) -> int:
+    """
+    Store a received chunk and advance the session offset
+
+    The session row is locked first, so concurrent PATCHes for the same
+    upload (e.g. a client retrying on another replica) are applied one at
+    a time and only the one at the current offset wins. The temp file is
+    consumed either way. Blocking; commits.
+
+    Returns:
+        New offset
+
+    Raises:
+        OffsetMismatchError: if offset is not the session's current offset
+        LookupError: if the session no longer exists
+    """
+    try:
+        upload = session.exec(
+            select(UploadSession).where(UploadSession.id == session_id).with_for_update()
+        ).first()
+        if upload is None:
+            raise LookupError(session_id)
+        if offset != upload.offset:
+            raise OffsetMismatchError(upload.offset)
+        if size == 0:
+            session.rollback()
+            return upload.offset
+
+        key = chunk_key(upload.id, offset)
+        get_storage(upload.storage_backend).put(key, temp_path)
+        session.add(UploadChunk(session_id=upload.id, offset=offset, size=size, sha256=sha256, storage_key=key))
+        upload.offset = offset + size
+        upload.expires_at = session_expiry()
+        session.add(upload)
+        session.commit()
+        return upload.offset
+    except BaseException:
+        session.rollback()
+        raise
+    finally:
+        remove_file_quietly(temp_path)
+
+
+def assemble_upload(session: Session, upload: UploadSession) -> Tuple[str, int, str]:
+    """
+    Concatenate a complete upload's chunks into one temp file
+
+    Each chunk is re-hashed on the way through and checked against the
+    digest recorded when it arrived. Blocking.
+
+    Returns:
+        (temp_path, size_in_bytes, sha256_hex)
+
+    Raises:
+        ValueError: if a chunk is missing, out of place or corrupted
+    """
+    storage = get_storage(upload.storage_backend)
+    chunks = session.exec(
+        select(UploadChunk).where(UploadChunk.session_id == upload.id).order_by(UploadChunk.offset)
+    ).all()
+
+    temp_path = os.path.join(UPLOAD_DIR, f".upload-{uuid.uuid4().hex}.part")
+    sha256 = hashlib.sha256()
+    size = 0
+    try:
+        with open(temp_path, "wb") as out:
+            for chunk in chunks:
+                if chunk.offset != size:
+                    raise ValueError(f"Chunk at offset {chunk.offset} does not follow byte {size}")
+
+                chunk_hash = hashlib.sha256()
+                with storage.local_copy(chunk.storage_key) as path, open(path, "rb") as f:
+                    while data := f.read(UPLOAD_CHUNK_SIZE):
+                        chunk_hash.update(data)
+                        sha256.update(data)
+                        out.write(data)
+                        size += len(data)
+                if chunk_hash.hexdigest() != chunk.sha256:
+                    raise ValueError(f"Chunk at offset {chunk.offset} is corrupted")
+
+        if size != upload.total_size:
+            raise ValueError(f"Upload has {size} of {upload.total_size} bytes")
+    except BaseException:
+        remove_file_quietly(temp_path)
+        raise
+
+    return temp_path, size, sha256.hexdigest()
+
+
+def detach_upload(session: Session, upload: UploadSession) -> List[str]:
+    """
+    Delete a session's rows, leaving its stored chunks
+
+    Caller commits, then removes the returned keys with delete_chunk_objects().
+    """
+    keys = list(session.exec(select(UploadChunk.storage_key).where(UploadChunk.session_id == upload.id)).all())
+    session.execute(delete(UploadChunk).where(UploadChunk.session_id == upload.id))
+    session.delete(upload)
+    return keys
+
+
+def delete_chunk_objects(backend: str, keys: List[str]):
+    """Delete stored chunks, logging (not raising) failures"""
+    storage = get_storage(backend)
+    for key in keys:
+        try:
+            storage.delete(key)
+        except Exception as e:
+            print(f"Could not delete upload chunk {key}: {e}")
+
+
+def discard_upload(session: Session, upload: UploadSession):
+    """
+    Delete a session's stored chunks and its rows
+
+    Chunk objects are deleted before the rows, so a failure leaves
+    something for the expiry job to retry. Caller commits.
+    """
+    storage = get_storage(upload.storage_backend)
+    keys = session.exec(select(UploadChunk.storage_key).where(UploadChunk.session_id == upload.id)).all()
+    for key in keys:
+        storage.delete(key)
+
+    detach_upload(session, upload)
+
+
+def expire_upload_sessions(batch_size: int = UPLOAD_EXPIRY_BATCH_SIZE) -> int:
+    """
+    Delete abandoned uploads: sessions past expires_at and their chunks
+
+    Returns:
+        Number of sessions deleted
+    """
+    expired = 0
+    with Session(engine) as session:
+        while True:
+            uploads = session.exec(
+                select(UploadSession)
+                .where(UploadSession.expires_at < datetime.utcnow())
+                .order_by(UploadSession.expires_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not uploads:
+                break
+
+            failed = 0
+            for upload in uploads:
+                try:
+                    with session.begin_nested():
+                        discard_upload(session, upload)
+                    expired += 1
+                except Exception as e:
+                    failed += 1
+                    print(f"Could not expire upload session {upload.id}: {e}")
+            session.commit()
+
+            if failed:
+                break  # Storage is failing; try again next run
+
+    return expired
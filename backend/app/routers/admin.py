@@ -5,12 +5,19 @@ Admin endpoints for permission management
 from fastapi import APIRouter, Depends, HTTPException, status
 from sqlmodel import Session, select
 from app.database import get_session
+from app.blob_store import release_blob
+from app.resumable_uploads import discard_upload
+from app.vector_index import delete_user_index
+from app.extraction import extraction_queue
+from app.chat_context import prompt_cache_stats
 from app.auth import get_current_user_id
 from app.models.user import User
 from app.models.task import Task
 from app.models.conversation import Conversation, Message
 from app.models.file import (
     FileUpload,
+    UploadSession,
+    UserStorageUsage,
     FilePermission,
     PermissionRequest,
     PermissionGrantRequest,
@@ -264,6 +271,35 @@ def list_all_files(
     return results
 
 
+@router.get("/extraction-stats")
+def get_extraction_stats(
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """
+    Text extraction timing, pages/sec and failure counts (Admin only)
+    """
+    # Verify admin
+    verify_admin(user_id, session)
+
+    return extraction_queue.snapshot()
+
+
+@router.get("/chat-stats")
+def get_chat_stats(
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """
+    Chat prompt tokens served from the provider's prompt cache, and model
+    latency with and without a cache hit (Admin only)
+    """
+    # Verify admin
+    verify_admin(user_id, session)
+
+    return prompt_cache_stats.snapshot()
+
+
 @router.get("/users", response_model=List[dict])
 def list_all_users(
     user_id: str = Depends(get_current_user_id),
@@ -275,26 +311,24 @@ def list_all_users(
     # Verify admin
     verify_admin(user_id, session)
 
-    statement = select(User)
-    users = session.exec(statement).all()
+    # One query: usage totals and permission come along with each user
+    statement = select(User, FilePermission, UserStorageUsage).outerjoin(
+        FilePermission, FilePermission.user_id == User.id
+    ).outerjoin(
+        UserStorageUsage, UserStorageUsage.user_id == User.id
+    )
+    rows = session.exec(statement).all()
 
     results = []
-    for user in users:
-        # Get file count
-        file_statement = select(FileUpload).where(FileUpload.user_id == user.id)
-        file_count = len(session.exec(file_statement).all())
-
-        # Get permission
-        perm_statement = select(FilePermission).where(FilePermission.user_id == user.id)
-        permission = session.exec(perm_statement).first()
-
+    for user, permission, usage in rows:
         results.append({
             "id": user.id,
             "email": user.email,
             "name": user.name,
             "role": user.role,
             "created_at": user.created_at,
-            "file_count": file_count,
+            "file_count": usage.file_count if usage else 0,
+            "storage_used_bytes": usage.total_bytes if usage else 0,
             "has_permission": permission is not None,
             "permission_details": {
                 "max_files": permission.max_files if permission else None,
@@ -371,12 +405,21 @@ def delete_user(
     for task in tasks:
         session.delete(task)
 
-    # 3. Delete files
+    # 3. Delete files (stored content no one else references is garbage collected)
     file_statement = select(FileUpload).where(FileUpload.user_id == target_user.id)
     files = session.exec(file_statement).all()
     for file in files:
+        release_blob(session, file.content_hash)
         session.delete(file)
 
+    # Unfinished resumable uploads and the usage totals go too
+    uploads = session.exec(select(UploadSession).where(UploadSession.user_id == target_user.id)).all()
+    for upload in uploads:
+        discard_upload(session, upload)
+    usage = session.get(UserStorageUsage, target_user.id)
+    if usage:
+        session.delete(usage)
+
     # 4. Delete permissions
     perm_statement = select(FilePermission).where(FilePermission.user_id == target_user.id)
     permissions = session.exec(perm_statement).all()
@@ -393,4 +436,7 @@ def delete_user(
     session.delete(target_user)
     session.commit()
 
+    # The vector index is a local cache of their documents' chunks
+    delete_user_index(target_user.id)
+
     return {"message": f"User {user_email} and all related data deleted successfully"}
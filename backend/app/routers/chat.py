@@ -3,20 +3,30 @@ Chat API Router - Direct Database Access
 Handles AI chatbot interactions with OpenAI using direct database access
 """
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.responses import StreamingResponse
 from fastapi.security import HTTPAuthorizationCredentials
 from pydantic import BaseModel
-from typing import Optional, List
-from openai import OpenAI
+from typing import AsyncIterator, Dict, Optional, List, Tuple
+from openai import AsyncOpenAI, APITimeoutError
+from sqlalchemy import String, cast, func, or_, update
 from sqlmodel import Session, select
-from datetime import datetime
+from collections import OrderedDict
+from datetime import datetime, timezone
+from threading import Lock
+import anyio
 import os
 import json
+import time
 
 from app.auth import get_current_user_id, security
-from app.database import get_session
+from app.database import engine, get_session
 from app.models.task import Task, TaskCreate, TaskResponse
 from app.models.file import FileUpload
 from app.models.conversation import Conversation, Message
+from app.reminders import sync_task_reminders
+from app.chat_context import estimate_tokens, load_history, prompt_cache_stats, schedule_summary
+from app.document_index import DOCUMENT_CONTEXT_CHUNKS, fuse_rankings, load_chunk_hits, rank_chunks
+from app.vector_index import search_vectors
 
 router = APIRouter(prefix="/api/chat", tags=["Chat"])
 
@@ -44,55 +54,150 @@ class ChatRequest(BaseModel):
 class ChatResponse(BaseModel):
     conversation_id: int  # Return conversation ID for stateless persistence
     response: str
-    tool_used: Optional[str] = None
-    tool_result: Optional[dict] = None
+    tool_used: Optional[str] = None  # First tool called
+    tool_result: Optional[dict] = None  # Result of the last tool called
+    tool_calls: List[dict] = []  # Every tool call: round, name, arguments, result, duration_ms
 
 
 # Initialize OpenAI client
 openai_api_key = os.getenv("OPENAI_API_KEY")
 openai_model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+# Per-call deadline for model requests; retries (connection errors, 429, 5xx) each get their own
+OPENAI_TIMEOUT_SECONDS = float(os.getenv("OPENAI_TIMEOUT_SECONDS", "30"))
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+# Model calls that may request tools per message; the call after the last round gets no tools
+CHAT_MAX_TOOL_ROUNDS = int(os.getenv("CHAT_MAX_TOOL_ROUNDS", "5"))
+
+# list_tasks rows per call (default and cap) and title length, so the tool
+# result stays small however many tasks the user has
+TASK_LIST_LIMIT = 20
+TASK_LIST_MAX_LIMIT = 50
+TASK_TITLE_CHARS = 80
 
 if not openai_api_key:
     print("⚠️ Warning: OPENAI_API_KEY not set")
 
-client = OpenAI(api_key=openai_api_key) if openai_api_key else None
+# Async client: one shared connection pool, awaited without blocking the event loop
+client = AsyncOpenAI(
+    api_key=openai_api_key,
+    timeout=OPENAI_TIMEOUT_SECONDS,
+    max_retries=OPENAI_MAX_RETRIES
+) if openai_api_key else None
 
+# Memoized file list sections: user_id -> ((file_count, usage updated_at), section)
+FILE_LIST_CACHE_USERS = 1024
+_file_list_cache: "OrderedDict[str, Tuple[tuple, str]]" = OrderedDict()
+_file_list_lock = Lock()
 
-def get_user_file_context(user_id: str, session: Session) -> str:
+
+def get_user_file_list(user_id: str, session: Session) -> str:
     """
-    Get user's uploaded file context for AI
+    Prompt section naming the user's uploaded files
+
+    Only changes when files are uploaded or deleted, so it belongs in the
+    cacheable part of the prompt. Memoized per user, keyed on the count and
+    highest id of the user's file_uploads rows, read through the user_id
+    index. Every upload adds a row with a higher id and every delete lowers
+    the count, in the same transaction as the change, so an entry cached by
+    one worker process can never be served after a change made in another.
 
-    Returns formatted string of all user's processed file content
+    Returns:
+        The section, or "" if the user has no files
     """
-    statement = select(FileUpload).where(
-        FileUpload.user_id == user_id,
-        FileUpload.processed == True
+    version = tuple(session.exec(
+        select(func.count(FileUpload.id), func.max(FileUpload.id))
+        .where(FileUpload.user_id == user_id)
+    ).one())
+    if not version[0]:
+        return ""
+
+    with _file_list_lock:
+        cached = _file_list_cache.get(user_id)
+        if cached and cached[0] == version:
+            _file_list_cache.move_to_end(user_id)
+            return cached[1]
+
+    filenames = session.exec(
+        select(FileUpload.original_filename)
+        .where(FileUpload.user_id == user_id)
+        .order_by(FileUpload.upload_date, FileUpload.id)
+    ).all()
+    section = (
+        "📎 USER'S UPLOADED DOCUMENTS:\n"
+        "Files: " + ", ".join(filenames) + "\n\n"
+        "You can reference these documents when answering user questions. "
+        "Passages relevant to the user's latest message are provided right before it."
     )
-    files = session.exec(statement).all()
 
-    if not files:
-        return ""
+    with _file_list_lock:
+        _file_list_cache[user_id] = (version, section)
+        _file_list_cache.move_to_end(user_id)
+        while len(_file_list_cache) > FILE_LIST_CACHE_USERS:
+            _file_list_cache.popitem(last=False)
+    return section
 
-    context_parts = ["\n\n📎 USER'S UPLOADED DOCUMENTS:\n"]
 
-    for file in files:
-        if file.processed_content:
-            # Limit each file to 2000 chars to avoid token limits
-            content = file.processed_content[:2000]
-            if len(file.processed_content) > 2000:
-                content += "... (truncated)"
+def get_relevant_passages(user_id: str, query: str, session: Session) -> str:
+    """
+    Prompt section with the passages of the user's documents most relevant to the message
 
-            context_parts.append(f"\n📄 File: {file.original_filename}")
-            context_parts.append(f"Type: {file.file_type}")
-            context_parts.append(f"Content:\n{content}\n")
-            context_parts.append("-" * 80)
+    BM25 and vector search over the document index, fused, so the prompt
+    stays bounded however many or however long the documents are.
+    Different for every message, so it goes last in the prompt.
+    """
+    # Keyword and semantic rankings, fused; each retriever proposes extra candidates
+    candidates = 2 * DOCUMENT_CONTEXT_CHUNKS
+    ranked = fuse_rankings(
+        rank_chunks(session, user_id, query, candidates),
+        search_vectors(session, user_id, query, candidates),
+        limit=DOCUMENT_CONTEXT_CHUNKS,
+    )
+    hits = load_chunk_hits(session, user_id, ranked)
+    if not hits:
+        return "No passage of the user's documents matches their latest message."
 
-    context_parts.append("\nYou can reference these documents when answering user questions.")
-    context_parts.append("If the user asks about something in their documents, search the content above.\n")
+    context_parts = ["Passages from the user's documents most relevant to their latest message:"]
+    for hit in hits:
+        context_parts.append(f"\n📄 File: {hit.filename} (page {hit.page_number + 1})")
+        context_parts.append(f"Content:\n{hit.content}\n")
+        context_parts.append("-" * 80)
+    context_parts.append("\nIf the user asks about something in their documents, use the passages above.")
 
     return "\n".join(context_parts)
 
 
+# Assistant persona and instructions: the fixed start of every prompt
+SYSTEM_PROMPT = """You are a helpful and friendly AI assistant for TaskFlow, a task management application.
+
+Your personality:
+- Warm, enthusiastic, and encouraging
+- Use a conversational, human-like tone
+- Be concise but helpful
+- Use emojis occasionally to add warmth
+- Celebrate user accomplishments
+
+Your job is to help users manage their tasks through natural conversation. You can:
+- Create tasks when users ask
+- List their tasks
+- Update existing tasks
+- Delete tasks
+- Mark tasks as complete
+- Provide statistics about their tasks
+
+Always be encouraging and make task management feel easy and rewarding!
+
+Examples:
+- User: "Add a task to buy groceries" → Use create_task, then say something like "Got it! I've added 'Buy groceries' to your list 🛒"
+- User: "What are my tasks?" → Use list_tasks with status "active", then present them in a friendly way
+- User: "I finished the first task!" → Use mark_task_complete, celebrate their progress
+- User: "Delete the meeting task" → First use list_tasks with search "meeting" to find it, then delete_task
+- User: "Add milk and eggs, and show my stats" → Call create_task twice and get_task_stats together in one step
+
+When a request needs several independent actions, request all of those tool calls at once rather than one at a time.
+
+Remember: Be conversational and encouraging. Make task management feel like chatting with a helpful friend!"""
+
+
 # Define tools in OpenAI function calling format
 OPENAI_TOOLS = [
     {
@@ -120,7 +225,12 @@ OPENAI_TOOLS = [
         "type": "function",
         "function": {
             "name": "list_tasks",
-            "description": "List the user's tasks. Use this when the user asks about their tasks.",
+            "description": (
+                "List the user's tasks, filtered in the database. Returns a compact table "
+                "(id | title | status | priority | due | tags) and the total number of matching "
+                "tasks, which can be more than the rows shown. Use this when the user asks about "
+                "their tasks, and filter rather than listing everything when the request is specific."
+            ),
             "parameters": {
                 "type": "object",
                 "properties": {
@@ -128,6 +238,28 @@ OPENAI_TOOLS = [
                         "type": "string",
                         "enum": ["all", "active", "completed"],
                         "description": "Filter tasks by status (default: all)"
+                    },
+                    "search": {
+                        "type": "string",
+                        "description": "Text to look for in the title or description"
+                    },
+                    "priority": {
+                        "type": "string",
+                        "enum": ["high", "medium", "low"],
+                        "description": "Only tasks with this priority"
+                    },
+                    "due_before": {
+                        "type": "string",
+                        "description": "Only tasks due before this ISO date or datetime, e.g. 2025-06-30"
+                    },
+                    "tags": {
+                        "type": "array",
+                        "items": {"type": "string"},
+                        "description": "Only tasks that have all of these tags"
+                    },
+                    "limit": {
+                        "type": "integer",
+                        "description": f"Maximum rows to return (default {TASK_LIST_LIMIT}, at most {TASK_LIST_MAX_LIMIT})"
                     }
                 }
             }
@@ -210,353 +342,551 @@ OPENAI_TOOLS = [
 ]
 
 
-@router.post("/message", response_model=ChatResponse)
-async def send_message(
-    request: ChatRequest,
-    user_id: str = Depends(get_current_user_id),
-    session: Session = Depends(get_session)
-):
+def _like_contains(value: str) -> str:
+    """ILIKE pattern matching value anywhere, with LIKE wildcards in it taken literally (escape '\\')"""
+    escaped = value.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _task_table(tasks) -> str:
     """
-    Send a message to the AI chatbot with conversation persistence
+    Tasks as a compact text table for the model
 
-    Phase III Enhancement: Stateless server with database-stored conversation history.
-    The AI can use tools to manage tasks on behalf of the user.
+    One line per task, fields separated by " | ", long titles shortened:
+    a fraction of the tokens of full task JSON.
     """
-    if not client:
-        raise HTTPException(
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
-            detail="AI service not configured. Please set OPENAI_API_KEY."
-        )
+    lines = ["id | title | status | priority | due | tags"]
+    for task in tasks:
+        title = task.title.replace("|", "/").replace("\n", " ")
+        if len(title) > TASK_TITLE_CHARS:
+            title = title[:TASK_TITLE_CHARS - 1] + "…"
+        lines.append(" | ".join([
+            str(task.id),
+            title,
+            "done" if task.completed else "open",
+            task.priority,
+            task.due_date.strftime("%Y-%m-%d %H:%M") if task.due_date else "-",
+            ",".join(task.tags) if task.tags else "-",
+        ]))
+    return "\n".join(lines)
+
+
+def execute_tool(session: Session, user_id: str, function_name: str, function_args: dict) -> dict:
+    """
+    Run one tool call against the database on behalf of the user
 
-    # Step 1: Get or create conversation
-    if request.conversation_id:
-        conversation = session.get(Conversation, request.conversation_id)
-        if not conversation or conversation.user_id != user_id:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail="Conversation not found"
-            )
-    else:
-        # Create new conversation
-        conversation = Conversation(
+    Blocking. Changes are flushed, not committed: the caller commits, so
+    several calls can share one transaction.
+
+    Returns:
+        Tool result for the model
+    """
+    tool_result = {
+        "success": False,
+        "message": f"Unknown tool: {function_name}"
+    }
+
+    if function_name == "create_task":
+        # Create task directly in database
+        title = function_args.get("title", "").strip()
+        description = function_args.get("description", "").strip()
+
+        task = Task(
             user_id=user_id,
-            title=request.message[:50] + ("..." if len(request.message) > 50 else "")
+            title=title,
+            description=description if description else None,
+            completed=False
         )
-        session.add(conversation)
-        session.commit()
-        session.refresh(conversation)
+        session.add(task)
+        session.flush()
+        session.refresh(task)
+
+        tool_result = {
+            "success": True,
+            "task": TaskResponse.model_validate(task).model_dump(mode='json'),
+            "message": f"Created task: {title}"
+        }
 
-    # Step 2: Fetch conversation history from database
-    statement = select(Message).where(
-        Message.conversation_id == conversation.id
-    ).order_by(Message.created_at)
-    db_messages = session.exec(statement).all()
+    elif function_name == "list_tasks":
+        # Filter, count and limit in the database; return a compact table
+        filters = [Task.user_id == user_id]
+
+        status_filter = function_args.get("status", "all")
+        if status_filter == "active":
+            filters.append(Task.completed == False)
+        elif status_filter == "completed":
+            filters.append(Task.completed == True)
+
+        if function_args.get("priority"):
+            filters.append(Task.priority == function_args["priority"].lower())
+
+        if function_args.get("search"):
+            search_term = _like_contains(function_args["search"].strip())
+            filters.append(or_(
+                Task.title.ilike(search_term, escape="\\"),
+                Task.description.ilike(search_term, escape="\\")
+            ))
+
+        if function_args.get("due_before"):
+            due_before = datetime.fromisoformat(function_args["due_before"])
+            if due_before.tzinfo:
+                due_before = due_before.astimezone(timezone.utc).replace(tzinfo=None)  # Stored as naive UTC
+            filters.append(Task.due_date < due_before)
+
+        # tags is stored as a JSON array; match each tag as an element,
+        # encoded the way it was stored (non-ASCII as \\u escapes)
+        for tag in function_args.get("tags") or []:
+            filters.append(cast(Task.tags, String).ilike(_like_contains(json.dumps(tag.strip())), escape="\\"))
+
+        limit = min(max(int(function_args.get("limit") or TASK_LIST_LIMIT), 1), TASK_LIST_MAX_LIMIT)
+
+        total = session.exec(select(func.count(Task.id)).where(*filters)).one()
+        tasks = session.exec(
+            select(Task.id, Task.title, Task.completed, Task.priority, Task.due_date, Task.tags)
+            .where(*filters)
+            # Open tasks first, soonest due first, undated after dated
+            .order_by(Task.completed, Task.due_date.is_(None), Task.due_date, Task.created_at.desc())
+            .limit(limit)
+        ).all()
+
+        tool_result = {
+            "success": True,
+            "total": total,
+            "count": len(tasks),
+            "tasks": _task_table(tasks)
+        }
+        if total > len(tasks):
+            tool_result["message"] = (
+                f"Showing {len(tasks)} of {total} matching tasks. "
+                "Filter (search, priority, due_before, tags, status) or raise limit to see others."
+            )
 
-    # Get user's uploaded file context
-    file_context = get_user_file_context(user_id, session)
+    elif function_name == "update_task":
+        # Update task in database
+        task_id = int(function_args.get("task_id"))
+        statement = select(Task).where(Task.id == task_id, Task.user_id == user_id)
+        task = session.exec(statement).first()
+
+        if task:
+            if "title" in function_args and function_args["title"]:
+                task.title = function_args["title"].strip()
+            if "description" in function_args:
+                task.description = function_args["description"].strip() if function_args["description"] else None
+            if "completed" in function_args:
+                task.completed = function_args["completed"]
+                sync_task_reminders(session, task)
+
+            task.updated_at = datetime.utcnow()
+            session.add(task)
+            session.flush()
+            session.refresh(task)
+
+            tool_result = {
+                "success": True,
+                "task": TaskResponse.model_validate(task).model_dump(mode='json'),
+                "message": "Task updated successfully"
+            }
+        else:
+            tool_result = {
+                "success": False,
+                "task": None,
+                "message": "Task not found"
+            }
 
-    # Build system prompt
-    system_content = """You are a helpful and friendly AI assistant for TaskFlow, a task management application.
+    elif function_name == "delete_task":
+        # Delete task from database
+        task_id = int(function_args.get("task_id"))
+        statement = select(Task).where(Task.id == task_id, Task.user_id == user_id)
+        task = session.exec(statement).first()
+
+        if task:
+            session.delete(task)
+            session.flush()
+            tool_result = {
+                "success": True,
+                "message": "Task deleted successfully"
+            }
+        else:
+            tool_result = {
+                "success": False,
+                "message": "Task not found"
+            }
 
-Your personality:
-- Warm, enthusiastic, and encouraging
-- Use a conversational, human-like tone
-- Be concise but helpful
-- Use emojis occasionally to add warmth
-- Celebrate user accomplishments
+    elif function_name == "mark_task_complete":
+        # Mark task complete in database
+        task_id = int(function_args.get("task_id"))
+        completed = function_args.get("completed", True)
+        statement = select(Task).where(Task.id == task_id, Task.user_id == user_id)
+        task = session.exec(statement).first()
+
+        if task:
+            task.completed = completed
+            task.updated_at = datetime.utcnow()
+            session.add(task)
+            sync_task_reminders(session, task)
+            session.flush()
+            session.refresh(task)
+
+            tool_result = {
+                "success": True,
+                "task": TaskResponse.model_validate(task).model_dump(mode='json'),
+                "message": f"Task marked as {'complete' if completed else 'incomplete'}"
+            }
+        else:
+            tool_result = {
+                "success": False,
+                "task": None,
+                "message": "Task not found"
+            }
 
-Your job is to help users manage their tasks through natural conversation. You can:
-- Create tasks when users ask
-- List their tasks
-- Update existing tasks
-- Delete tasks
-- Mark tasks as complete
-- Provide statistics about their tasks
+    elif function_name == "get_task_stats":
+        # Get task statistics from database
+        statement = select(Task).where(Task.user_id == user_id)
+        tasks = session.exec(statement).all()
+
+        total = len(tasks)
+        completed = sum(1 for t in tasks if t.completed)
+        active = total - completed
+        completion_rate = round((completed / total * 100) if total > 0 else 0, 1)
+
+        tool_result = {
+            "success": True,
+            "stats": {
+                "total": total,
+                "active": active,
+                "completed": completed,
+                "completion_rate": completion_rate
+            }
+        }
 
-Always be encouraging and make task management feel easy and rewarding!
+    return tool_result
 
-Examples:
-- User: "Add a task to buy groceries" → Use create_task, then say something like "Got it! I've added 'Buy groceries' to your list 🛒"
-- User: "What are my tasks?" → Use list_tasks, then present them in a friendly way
-- User: "I finished the first task!" → Use mark_task_complete, celebrate their progress
-- User: "Delete the meeting task" → First use list_tasks to find it, then delete_task
 
-Remember: Be conversational and encouraging. Make task management feel like chatting with a helpful friend!"""
+# Tools that only read; calls to them in the same round run concurrently
+READ_ONLY_TOOLS = {"list_tasks", "get_task_stats"}
+
+
+def _call_tool(session: Session, user_id: str, call: dict, round_number: int) -> dict:
+    """
+    Execute one tool call in a savepoint and record it
 
-    # Add file context if available
-    if file_context:
-        system_content += file_context
+    A failing call rolls back only its own changes. Never raises: errors
+    become the call's result, so the model can report them.
 
-    # Build conversation history for OpenAI
-    messages = [
-        {
-            "role": "system",
-            "content": system_content
+    Returns:
+        Record of the call: round, id, name, arguments, result, duration_ms
+    """
+    started = time.perf_counter()
+    try:
+        function_args = json.loads(call["arguments"] or "{}")
+        with session.begin_nested():
+            result = execute_tool(session, user_id, call["name"], function_args)
+    except Exception as e:
+        print(f"Tool execution error ({call['name']}): {str(e)}")
+        result = {
+            "success": False,
+            "message": f"Error: {str(e)}"
         }
-    ]
 
-    # Add database messages (last 20 for context window management)
-    for msg in db_messages[-20:]:
-        messages.append({
-            "role": msg.role,
-            "content": msg.content
-        })
+    return {
+        "round": round_number,
+        "id": call["id"],
+        "name": call["name"],
+        "arguments": call["arguments"],
+        "result": json.loads(json.dumps(result, cls=DateTimeEncoder)),
+        "duration_ms": round((time.perf_counter() - started) * 1000, 1)
+    }
+
+
+def _run_read_tool(user_id: str, call: dict, round_number: int) -> dict:
+    """Execute a read-only tool call in its own session (blocking)"""
+    with Session(engine) as session:
+        return _call_tool(session, user_id, call, round_number)
+
+
+def _run_write_tools(user_id: str, calls: List[dict], round_number: int) -> List[dict]:
+    """
+    Execute tool calls that change data, in order, in a single transaction (blocking)
+
+    Returns:
+        Records of the calls; if the commit fails, every call reports the error
+    """
+    with Session(engine) as session:
+        records = [_call_tool(session, user_id, call, round_number) for call in calls]
+        try:
+            session.commit()
+        except Exception as e:
+            session.rollback()
+            print(f"Tool transaction error: {str(e)}")
+            for record in records:
+                record["result"] = {
+                    "success": False,
+                    "message": f"Error: {str(e)}"
+                }
+        return records
+
 
-    # Add current user message
+async def _run_tools(user_id: str, calls: List[dict], round_number: int) -> List[dict]:
+    """
+    Execute the tool calls of one model response
+
+    Calls that change data run first, in one transaction, in the order the
+    model gave; then the read-only calls run concurrently, each in its own
+    session. Reads therefore always see the round's writes (a list_tasks
+    next to an add_task includes the new task), whatever the timing.
+
+    Args:
+        user_id: User the tools act for
+        calls: {"id", "name", "arguments"} dicts, arguments as a JSON string
+        round_number: Tool round within the message, from 1
+
+    Returns:
+        Records of the calls, in the order of calls
+    """
+    records: List[Optional[dict]] = [None] * len(calls)
+    writes = [index for index, call in enumerate(calls) if call["name"] not in READ_ONLY_TOOLS]
+
+    async def read(index: int):
+        records[index] = await anyio.to_thread.run_sync(_run_read_tool, user_id, calls[index], round_number)
+
+    async def write():
+        results = await anyio.to_thread.run_sync(
+            _run_write_tools, user_id, [calls[index] for index in writes], round_number
+        )
+        for index, record in zip(writes, results):
+            records[index] = record
+
+    if writes:
+        await write()
+
+    async with anyio.create_task_group() as group:
+        for index, call in enumerate(calls):
+            if call["name"] in READ_ONLY_TOOLS:
+                group.start_soon(read, index)
+
+    return records
+
+
+def _append_tool_round(messages: List[dict], content: Optional[str], records: List[dict]):
+    """Add a tool-calling assistant turn and its tool results to the prompt"""
     messages.append({
-        "role": "user",
-        "content": request.message
+        "role": "assistant",
+        "content": content or None,
+        "tool_calls": [
+            {"id": record["id"], "type": "function", "function": {"name": record["name"], "arguments": record["arguments"]}}
+            for record in records
+        ]
     })
+    for record in records:
+        messages.append({
+            "role": "tool",
+            "tool_call_id": record["id"],
+            "name": record["name"],
+            "content": json.dumps(record["result"])
+        })
 
-    # Step 3: Store user message in database
-    user_message = Message(
-        conversation_id=conversation.id,
-        role="user",
-        content=request.message
-    )
-    session.add(user_message)
-    session.commit()
 
-    try:
-        # Call OpenAI API with function calling
-        response = client.chat.completions.create(
-            model=openai_model,
-            messages=messages,
-            tools=OPENAI_TOOLS,
-            tool_choice="auto"  # Let AI decide when to use tools
-        )
+def _tool_calls_data(records: List[dict]) -> Optional[dict]:
+    """
+    Message.tool_calls for a reply
 
-        response_message = response.choices[0].message
-        tool_calls = response_message.tool_calls
-
-        # Check if AI wants to use a tool
-        if tool_calls:
-            # Add assistant's response to messages
-            messages.append(response_message)
-
-            # Execute each tool call
-            for tool_call in tool_calls:
-                function_name = tool_call.function.name
-                function_args = json.loads(tool_call.function.arguments)
-
-                # Execute the tool with direct database access
-                tool_result = None
-
-                try:
-                    if function_name == "create_task":
-                        # Create task directly in database
-                        title = function_args.get("title", "").strip()
-                        description = function_args.get("description", "").strip()
-
-                        task = Task(
-                            user_id=user_id,
-                            title=title,
-                            description=description if description else None,
-                            completed=False
-                        )
-                        session.add(task)
-                        session.commit()
-                        session.refresh(task)
-
-                        tool_result = {
-                            "success": True,
-                            "task": TaskResponse.model_validate(task).model_dump(mode='json'),
-                            "message": f"Created task: {title}"
-                        }
-
-                    elif function_name == "list_tasks":
-                        # List tasks from database
-                        status_filter = function_args.get("status", "all")
-                        statement = select(Task).where(Task.user_id == user_id)
-
-                        if status_filter == "active":
-                            statement = statement.where(Task.completed == False)
-                        elif status_filter == "completed":
-                            statement = statement.where(Task.completed == True)
-
-                        statement = statement.order_by(Task.created_at.desc())
-                        tasks = session.exec(statement).all()
-
-                        tool_result = {
-                            "success": True,
-                            "tasks": [TaskResponse.model_validate(t).model_dump(mode='json') for t in tasks],
-                            "count": len(tasks)
-                        }
-
-                    elif function_name == "update_task":
-                        # Update task in database
-                        task_id = int(function_args.get("task_id"))
-                        statement = select(Task).where(Task.id == task_id, Task.user_id == user_id)
-                        task = session.exec(statement).first()
-
-                        if task:
-                            if "title" in function_args and function_args["title"]:
-                                task.title = function_args["title"].strip()
-                            if "description" in function_args:
-                                task.description = function_args["description"].strip() if function_args["description"] else None
-                            if "completed" in function_args:
-                                task.completed = function_args["completed"]
-
-                            task.updated_at = datetime.utcnow()
-                            session.add(task)
-                            session.commit()
-                            session.refresh(task)
-
-                            tool_result = {
-                                "success": True,
-                                "task": TaskResponse.model_validate(task).model_dump(mode='json'),
-                                "message": "Task updated successfully"
-                            }
-                        else:
-                            tool_result = {
-                                "success": False,
-                                "task": None,
-                                "message": "Task not found"
-                            }
-
-                    elif function_name == "delete_task":
-                        # Delete task from database
-                        task_id = int(function_args.get("task_id"))
-                        statement = select(Task).where(Task.id == task_id, Task.user_id == user_id)
-                        task = session.exec(statement).first()
-
-                        if task:
-                            session.delete(task)
-                            session.commit()
-                            tool_result = {
-                                "success": True,
-                                "message": "Task deleted successfully"
-                            }
-                        else:
-                            tool_result = {
-                                "success": False,
-                                "message": "Task not found"
-                            }
-
-                    elif function_name == "mark_task_complete":
-                        # Mark task complete in database
-                        task_id = int(function_args.get("task_id"))
-                        completed = function_args.get("completed", True)
-                        statement = select(Task).where(Task.id == task_id, Task.user_id == user_id)
-                        task = session.exec(statement).first()
-
-                        if task:
-                            task.completed = completed
-                            task.updated_at = datetime.utcnow()
-                            session.add(task)
-                            session.commit()
-                            session.refresh(task)
-
-                            tool_result = {
-                                "success": True,
-                                "task": TaskResponse.model_validate(task).model_dump(mode='json'),
-                                "message": f"Task marked as {'complete' if completed else 'incomplete'}"
-                            }
-                        else:
-                            tool_result = {
-                                "success": False,
-                                "task": None,
-                                "message": "Task not found"
-                            }
-
-                    elif function_name == "get_task_stats":
-                        # Get task statistics from database
-                        statement = select(Task).where(Task.user_id == user_id)
-                        tasks = session.exec(statement).all()
-
-                        total = len(tasks)
-                        completed = sum(1 for t in tasks if t.completed)
-                        active = total - completed
-                        completion_rate = round((completed / total * 100) if total > 0 else 0, 1)
-
-                        tool_result = {
-                            "success": True,
-                            "stats": {
-                                "total": total,
-                                "active": active,
-                                "completed": completed,
-                                "completion_rate": completion_rate
-                            }
-                        }
-
-                except Exception as e:
-                    print(f"Tool execution error: {str(e)}")
-                    tool_result = {
-                        "success": False,
-                        "message": f"Error: {str(e)}"
-                    }
+    "tool" and "result" (first tool, last result) keep the shape of replies
+    stored before multi-call turns; "calls" has every call.
+    """
+    if not records:
+        return None
+    return {
+        "tool": records[0]["name"],
+        "result": records[-1]["result"],
+        "calls": records
+    }
 
-                # Add tool result to messages
-                messages.append({
-                    "role": "tool",
-                    "tool_call_id": tool_call.id,
-                    "name": function_name,
-                    "content": json.dumps(tool_result, cls=DateTimeEncoder)
-                })
 
-            # Get final response from GPT with tool results
-            final_response = client.chat.completions.create(
-                model=openai_model,
-                messages=messages
-            )
+def _prepare_chat(user_id: str, request: ChatRequest) -> Tuple[int, List[dict]]:
+    """
+    Load or create the conversation, build the prompt and store the user message
 
-            final_message = final_response.choices[0].message.content
-
-            # Step 4: Store assistant response in database
-            # Serialize tool_result to handle datetime objects
-            tool_calls_data = None
-            if tool_calls:
-                tool_calls_data = json.loads(json.dumps({
-                    "tool": tool_calls[0].function.name,
-                    "result": tool_result
-                }, cls=DateTimeEncoder))
-
-            assistant_message = Message(
-                conversation_id=conversation.id,
-                role="assistant",
-                content=final_message,
-                tool_calls=tool_calls_data
-            )
-            session.add(assistant_message)
+    Blocking; run in the threadpool. The session is closed before any model
+    call, so no pooled connection is held while waiting on the AI service.
 
-            # Update conversation timestamp
-            conversation.updated_at = datetime.utcnow()
+    Returns:
+        (conversation_id, messages for the model)
+    """
+    with Session(engine) as session:
+        # Step 1: Get or create conversation
+        if request.conversation_id:
+            conversation = session.get(Conversation, request.conversation_id)
+            if not conversation or conversation.user_id != user_id:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail="Conversation not found"
+                )
+        else:
+            # Create new conversation
+            conversation = Conversation(
+                user_id=user_id,
+                title=request.message[:50] + ("..." if len(request.message) > 50 else "")
+            )
             session.add(conversation)
             session.commit()
+            session.refresh(conversation)
+
+        # Step 2: Summary of older messages and the latest ones that fit the
+        # token budget (a bounded index scan, whatever the conversation's length)
+        summary, db_messages = load_history(session, conversation)
+
+        # Most stable content first, so consecutive calls share the longest
+        # prefix for the provider's prompt cache: (tools and) the fixed
+        # instructions, the same for everyone; the user's file list, changed
+        # by uploads; the summary, changed every few turns; the history,
+        # append-only; and last this message's passages
+        messages = [
+            {
+                "role": "system",
+                "content": SYSTEM_PROMPT
+            }
+        ]
 
-            # Serialize tool_result for JSON response
-            serialized_tool_result = None
-            if tool_result:
-                serialized_tool_result = json.loads(json.dumps(tool_result, cls=DateTimeEncoder))
+        file_list = get_user_file_list(user_id, session)
+        if file_list:
+            messages.append({"role": "system", "content": file_list})
+        if summary:
+            messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
 
-            return ChatResponse(
-                conversation_id=conversation.id,
-                response=final_message,
-                tool_used=tool_calls[0].function.name if tool_calls else None,
-                tool_result=serialized_tool_result
-            )
+        for msg in db_messages:
+            messages.append({
+                "role": msg.role,
+                "content": msg.content
+            })
 
-        # No tool used, just return text response
-        # Step 4: Store assistant response in database
-        assistant_message = Message(
+        if file_list:
+            messages.append({
+                "role": "system",
+                "content": get_relevant_passages(user_id, request.message, session)
+            })
+
+        # Add current user message
+        messages.append({
+            "role": "user",
+            "content": request.message
+        })
+
+        # Step 3: Store user message in database
+        user_message = Message(
             conversation_id=conversation.id,
+            role="user",
+            content=request.message,
+            token_count=estimate_tokens(request.message)
+        )
+        session.add(user_message)
+        session.commit()
+
+        return conversation.id, messages
+
+
+def _save_reply(conversation_id: int, content: Optional[str], tool_calls_data: Optional[dict]):
+    """Store the assistant's reply and touch the conversation (blocking)"""
+    with Session(engine) as session:
+        assistant_message = Message(
+            conversation_id=conversation_id,
             role="assistant",
-            content=response_message.content
+            content=content,
+            tool_calls=tool_calls_data,
+            token_count=estimate_tokens(content)
         )
         session.add(assistant_message)
 
         # Update conversation timestamp
-        conversation.updated_at = datetime.utcnow()
-        session.add(conversation)
+        session.execute(
+            update(Conversation)
+            .where(Conversation.id == conversation_id)
+            .values(updated_at=datetime.utcnow())
+        )
         session.commit()
 
+
+def _record_usage(usage, seconds: float):
+    """Log a model call's prompt-cache hit and add it to prompt_cache_stats"""
+    if usage is None or not usage.prompt_tokens:
+        return
+    details = getattr(usage, "prompt_tokens_details", None)
+    cached = (details.cached_tokens or 0) if details else 0
+    prompt_cache_stats.record(usage.prompt_tokens, cached, seconds)
+    print(
+        f"Chat completion: {usage.prompt_tokens} prompt tokens, "
+        f"{cached} cached ({cached / usage.prompt_tokens:.0%}), {seconds:.2f}s"
+    )
+
+
+@router.post("/message", response_model=ChatResponse)
+async def send_message(
+    request: ChatRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Send a message to the AI chatbot with conversation persistence
+
+    Phase III Enhancement: Stateless server with database-stored conversation history.
+    The AI can use tools to manage tasks on behalf of the user.
+
+    Model calls are awaited on the async client and database work runs in
+    the threadpool, so a slow completion never blocks other requests.
+    """
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service not configured. Please set OPENAI_API_KEY."
+        )
+
+    conversation_id, messages = await anyio.to_thread.run_sync(_prepare_chat, user_id, request)
+
+    try:
+        # Tool loop: each round runs all the tools one response asked for;
+        # the call after the last round gets no tools, so the model must answer
+        records: List[dict] = []
+        for round_number in range(1, CHAT_MAX_TOOL_ROUNDS + 2):
+            options = {"tools": OPENAI_TOOLS, "tool_choice": "auto"} if round_number <= CHAT_MAX_TOOL_ROUNDS else {}
+            started = time.perf_counter()
+            response = await client.chat.completions.create(
+                model=openai_model,
+                messages=messages,
+                timeout=OPENAI_TIMEOUT_SECONDS,
+                **options
+            )
+            _record_usage(response.usage, time.perf_counter() - started)
+
+            response_message = response.choices[0].message
+            if not response_message.tool_calls:
+                break
+
+            calls = [
+                {"id": tool_call.id, "name": tool_call.function.name, "arguments": tool_call.function.arguments}
+                for tool_call in response_message.tool_calls
+            ]
+            round_records = await _run_tools(user_id, calls, round_number)
+            _append_tool_round(messages, response_message.content, round_records)
+            records.extend(round_records)
+
+        final_message = response_message.content or ""
+
+        # Step 4: Store assistant response in database
+        await anyio.to_thread.run_sync(_save_reply, conversation_id, final_message, _tool_calls_data(records))
+        schedule_summary(client, openai_model, conversation_id)
+
         return ChatResponse(
-            conversation_id=conversation.id,
-            response=response_message.content,
-            tool_used=None,
-            tool_result=None
+            conversation_id=conversation_id,
+            response=final_message,
+            tool_used=records[0]["name"] if records else None,
+            tool_result=records[-1]["result"] if records else None,
+            tool_calls=records
         )
 
+    except APITimeoutError:
+        print(f"Chat timeout after {OPENAI_TIMEOUT_SECONDS}s (conversation {conversation_id})")
+        raise HTTPException(
+            status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+            detail="AI service timed out, please try again"
+        )
     except Exception as e:
         import traceback
         print(f"Chat error: {str(e)}")
@@ -567,8 +897,160 @@ Remember: Be conversational and encouraging. Make task management feel like chat
         )
 
 
+def _sse(event: str, data: dict) -> str:
+    """Format one Server-Sent Event"""
+    return f"event: {event}\ndata: {json.dumps(data, cls=DateTimeEncoder)}\n\n"
+
+
+async def _stream_completion(messages: List[dict], tool_calls: Dict[int, dict], tools: bool = True) -> AsyncIterator[str]:
+    """
+    Stream a completion, yielding content tokens as they arrive
+
+    Tool call fragments are accumulated into tool_calls (by index), and
+    usage is recorded with the time to the first chunk. The timeout
+    applies between chunks. The upstream response is closed
+    however the iteration ends, so a cancelled stream stops generation
+    instead of reading it to the end.
+    """
+    options = {"tools": OPENAI_TOOLS, "tool_choice": "auto"} if tools else {}
+    started = time.perf_counter()
+    stream = await client.chat.completions.create(
+        model=openai_model,
+        messages=messages,
+        stream=True,
+        stream_options={"include_usage": True},  # Usage arrives in a final chunk
+        timeout=OPENAI_TIMEOUT_SECONDS,
+        **options
+    )
+    usage = None
+    first_token = None
+    try:
+        async for chunk in stream:
+            if chunk.usage:
+                usage = chunk.usage
+            if not chunk.choices:
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - started
+            delta = chunk.choices[0].delta
+            if delta.content:
+                yield delta.content
+            for call in delta.tool_calls or []:
+                entry = tool_calls.setdefault(call.index, {"id": "", "name": "", "arguments": ""})
+                if call.id:
+                    entry["id"] = call.id
+                if call.function and call.function.name:
+                    entry["name"] += call.function.name
+                if call.function and call.function.arguments:
+                    entry["arguments"] += call.function.arguments
+    finally:
+        await stream.close()
+
+    _record_usage(usage, first_token if first_token is not None else time.perf_counter() - started)
+
+
+async def _chat_events(user_id: str, conversation_id: int, messages: List[dict]) -> AsyncIterator[str]:
+    """
+    SSE events for one chat turn
+
+    conversation, then per round token* tool_call* tool_result*, then the
+    answer's token* and done (same fields as ChatResponse) or error. The reply is stored once the
+    stream completes; if the client disconnects, Starlette cancels this
+    generator and the upstream request with it.
+
+    done's response (and the stored reply) is all the text streamed as
+    token events, across every round, so a client re-rendering from done
+    shows what it already showed; text from separate rounds is joined by
+    a blank line, itself sent as a token.
+    """
+    completed = False
+    yield _sse("conversation", {"conversation_id": conversation_id})
+    try:
+        records: List[dict] = []
+        streamed: List[str] = []
+        for round_number in range(1, CHAT_MAX_TOOL_ROUNDS + 2):
+            parts: List[str] = []
+            tool_calls: Dict[int, dict] = {}
+            async for token in _stream_completion(messages, tool_calls, tools=round_number <= CHAT_MAX_TOOL_ROUNDS):
+                if not parts and streamed:
+                    streamed.append("\n\n")
+                    yield _sse("token", {"content": "\n\n"})
+                parts.append(token)
+                streamed.append(token)
+                yield _sse("token", {"content": token})
+
+            if not tool_calls:
+                break
+
+            calls = [tool_calls[index] for index in sorted(tool_calls)]
+            for call in calls:
+                yield _sse("tool_call", {"id": call["id"], "name": call["name"], "round": round_number})
+            round_records = await _run_tools(user_id, calls, round_number)
+            for record in round_records:
+                yield _sse("tool_result", record)
+
+            _append_tool_round(messages, "".join(parts), round_records)
+            records.extend(round_records)
+
+        response = "".join(streamed)
+        await anyio.to_thread.run_sync(_save_reply, conversation_id, response, _tool_calls_data(records))
+        schedule_summary(client, openai_model, conversation_id)
+
+        completed = True
+        yield _sse("done", {
+            "conversation_id": conversation_id,
+            "response": response,
+            "tool_used": records[0]["name"] if records else None,
+            "tool_result": records[-1]["result"] if records else None,
+            "tool_calls": records
+        })
+
+    except APITimeoutError:
+        completed = True
+        print(f"Chat stream timeout after {OPENAI_TIMEOUT_SECONDS}s (conversation {conversation_id})")
+        yield _sse("error", {"detail": "AI service timed out, please try again"})
+    except Exception as e:
+        completed = True
+        print(f"Chat stream error: {str(e)}")
+        yield _sse("error", {"detail": f"AI service error: {str(e)}"})
+    finally:
+        if not completed:
+            print(f"Chat stream cancelled by client (conversation {conversation_id})")
+
+
+@router.post("/message/stream")
+async def stream_message(
+    request: ChatRequest,
+    user_id: str = Depends(get_current_user_id)
+):
+    """
+    Send a message and stream the reply as Server-Sent Events
+
+    Tokens are sent as the model produces them, so the first words show up
+    after the first-token latency instead of the whole response time. Tool
+    calls are announced when they start and finish. See _chat_events for
+    the event sequence.
+    """
+    if not client:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="AI service not configured. Please set OPENAI_API_KEY."
+        )
+
+    conversation_id, messages = await anyio.to_thread.run_sync(_prepare_chat, user_id, request)
+
+    return StreamingResponse(
+        _chat_events(user_id, conversation_id, messages),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Accel-Buffering": "no"  # Don't let nginx buffer the stream
+        }
+    )
+
+
 @router.get("/conversations")
-async def list_conversations(
+def list_conversations(
     user_id: str = Depends(get_current_user_id),
     session: Session = Depends(get_session)
 ):
@@ -601,7 +1083,7 @@ async def list_conversations(
 
 
 @router.get("/conversations/{conversation_id}")
-async def get_conversation(
+def get_conversation(
     conversation_id: int,
     user_id: str = Depends(get_current_user_id),
     session: Session = Depends(get_session)
@@ -644,7 +1126,7 @@ async def get_conversation(
 
 
 @router.delete("/conversations/{conversation_id}")
-async def delete_conversation(
+def delete_conversation(
     conversation_id: int,
     user_id: str = Depends(get_current_user_id),
     session: Session = Depends(get_session)
@@ -2,41 +2,76 @@
 File upload and management endpoints
 """
 
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+import base64
+import binascii
+import hashlib
+import mimetypes
+import os
+from contextlib import contextmanager
+from email.utils import format_datetime, parsedate_to_datetime
+
+import anyio
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, status, UploadFile, File
+from fastapi.responses import FileResponse, RedirectResponse, Response
+from starlette.requests import ClientDisconnect
 from sqlmodel import Session, select
 from app.database import get_session
 from app.auth import get_current_user_id
 from app.models.user import User
 from app.email_service import email_service
+from app.blob_store import acquire_blob, release_blob
+from app.storage_usage import get_usage, release_upload, reserve_upload
+from app.storage import STORAGE_BACKEND, UPLOAD_DIR, LocalStorage, TextOnlyStorage, get_storage
+from app.resumable_uploads import (
+    UPLOAD_MAX_CHUNK_MB,
+    OffsetMismatchError,
+    append_chunk,
+    assemble_upload,
+    delete_chunk_objects,
+    detach_upload,
+    discard_upload,
+    session_expiry,
+)
+from app.extraction import extraction_queue, extract_pages_on_demand
 from app.models.file import (
     FileUpload,
+    FileBlob,
+    FilePage,
+    UploadSession,
     FilePermission,
     PermissionRequest,
     FileUploadResponse,
+    FileStatusResponse,
+    FilePageResponse,
+    FilePagesResponse,
     FileListResponse,
+    UploadSessionCreate,
+    UploadSessionResponse,
     PermissionGrantRequest,
     PermissionResponse,
     PermissionRequestResponse,
 )
 from app.file_utils import (
+    FileTooLargeError,
     validate_file_type,
     get_file_extension,
-    extract_text_from_file,
+    save_upload_to_temp,
+    save_stream_to_temp,
+    remove_file_quietly,
 )
-import os
-import uuid
-from datetime import datetime, timedelta
-from typing import Optional
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Tuple
 
 router = APIRouter(prefix="/api/files", tags=["Files"])
 
-# Upload directory
-UPLOAD_DIR = "uploads"
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-
 ADMIN_EMAIL = "asif.alimusharaf@gmail.com"
 MAX_FILE_SIZE = 100 * 1024 * 1024  # 100MB in bytes
 
+# Resumable uploads follow the tus 1.0 core protocol plus its checksum extension
+TUS_VERSION = "1.0.0"
+UPLOAD_CHECKSUM_ALGORITHMS = ("sha1", "sha256", "md5")
+UPLOAD_CHECKSUM_MISMATCH = 460  # tus "Checksum Mismatch"
+
 
 def get_user_permission(user_id: str, session: Session) -> Optional[FilePermission]:
     """Get user's file upload permission"""
@@ -53,9 +88,129 @@ def is_admin(user_id: str, session: Session) -> bool:
 
 def get_user_file_count(user_id: str, session: Session) -> int:
     """Get number of files uploaded by user"""
-    statement = select(FileUpload).where(FileUpload.user_id == user_id)
-    files = session.exec(statement).all()
-    return len(files)
+    file_count, _ = get_usage(session, user_id)
+    return file_count
+
+
+def check_upload_permission(user_id: str, session: Session) -> Tuple[int, Optional[int]]:
+    """
+    Check that a user may upload another file
+
+    Admin users have unlimited access; regular users need an unexpired
+    permission and must be under their file count limit. The count check
+    here only fails fast; reserve_upload() enforces it atomically.
+
+    Returns:
+        (maximum file size in bytes, maximum file count or None for unlimited)
+
+    Raises:
+        HTTPException: 403 if the user may not upload
+    """
+    if is_admin(user_id, session):
+        return MAX_FILE_SIZE, None
+
+    # Check permission
+    permission = get_user_permission(user_id, session)
+
+    if not permission or not permission.can_upload:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="You don't have permission to upload files. Please request permission from admin."
+        )
+
+    # Check expiry
+    if permission.expires_at and permission.expires_at < datetime.utcnow():
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Your file upload permission has expired."
+        )
+
+    # Check file count limit
+    file_count = get_user_file_count(user_id, session)
+    if file_count >= permission.max_files:
+        raise _file_limit_error(permission.max_files)
+
+    return permission.max_file_size_mb * 1024 * 1024, permission.max_files
+
+
+def _file_limit_error(max_files: int) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_403_FORBIDDEN,
+        detail=f"You have reached your file limit ({max_files} files)."
+    )
+
+
+@contextmanager
+def upload_quota(session: Session, user_id: str, file_size: int, max_files: Optional[int]):
+    """
+    Count an upload against the user's quota while it is being stored
+
+    The slot is reserved atomically up front (so concurrent uploads can't
+    overshoot max_files) and given back if the block raises. Enter it
+    before making other changes in the session: the reservation commits.
+
+    Raises:
+        HTTPException: 403 if the user is at their file limit
+    """
+    if not reserve_upload(session, user_id, file_size, max_files):
+        raise _file_limit_error(max_files)
+    try:
+        yield
+    except BaseException:
+        session.rollback()
+        release_upload(session, user_id, file_size)
+        session.commit()
+        raise
+
+
+async def store_uploaded_file(
+    session: Session,
+    user_id: str,
+    original_filename: str,
+    temp_path: str,
+    file_size: int,
+    content_hash: str
+) -> FileUpload:
+    """
+    Store a fully received upload and create its FileUpload record
+
+    The temp file is consumed. Content is stored once per hash (identical
+    uploads just take a reference) and new content is queued for text
+    extraction. Call inside upload_quota().
+    """
+    # Storing may be an S3 upload, so it runs off the event loop
+    file_ext = get_file_extension(original_filename)
+    try:
+        blob, created = await anyio.to_thread.run_sync(
+            acquire_blob, session, temp_path, content_hash, file_size, file_ext
+        )
+
+        # Create database record
+        db_file = FileUpload(
+            user_id=user_id,
+            filename=f"{content_hash}.{file_ext}",
+            original_filename=original_filename,
+            file_path=blob.storage_key,
+            file_size=file_size,
+            file_type=file_ext,
+            content_hash=content_hash,
+            # Identical content already extracted for someone is reused as-is
+            processed=blob.extraction_status == "done"
+        )
+
+        session.add(db_file)
+        session.commit()
+    except Exception:
+        remove_file_quietly(temp_path)
+        raise
+
+    session.refresh(db_file)
+
+    # Extract text in the background; clients poll /{file_id}/status
+    if created:
+        extraction_queue.submit(content_hash)
+
+    return db_file
 
 
 @router.post("/upload", response_model=FileUploadResponse)
@@ -69,96 +224,311 @@ async def upload_file(
 
     Admin users have unlimited access.
     Regular users need permission.
+    Text extraction runs in the background; the response has processed=False
+    and GET /api/files/{file_id}/status reports progress.
+    For large files on unreliable connections use the resumable
+    /api/files/uploads endpoints instead.
     """
-    # Check if admin
-    admin = is_admin(user_id, session)
+    max_size_bytes, max_files = check_upload_permission(user_id, session)
 
-    if not admin:
-        # Check permission
-        permission = get_user_permission(user_id, session)
+    # Validate file type
+    if not validate_file_type(file.filename):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file type. Only PDF, DOC, and DOCX files are allowed."
+        )
 
-        if not permission or not permission.can_upload:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="You don't have permission to upload files. Please request permission from admin."
-            )
+    # Stream to a temp file, enforcing the size limit and hashing as we go
+    try:
+        temp_path, file_size, content_hash = await save_upload_to_temp(file, UPLOAD_DIR, max_size_bytes)
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size exceeds limit ({max_size_bytes // (1024 * 1024)}MB)."
+        )
 
-        # Check expiry
-        if permission.expires_at and permission.expires_at < datetime.utcnow():
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail="Your file upload permission has expired."
-            )
+    try:
+        with upload_quota(session, user_id, file_size, max_files):
+            db_file = await store_uploaded_file(session, user_id, file.filename, temp_path, file_size, content_hash)
+    finally:
+        remove_file_quietly(temp_path)  # Already consumed unless the quota was full
 
-        # Check file count limit
-        file_count = get_user_file_count(user_id, session)
-        if file_count >= permission.max_files:
-            raise HTTPException(
-                status_code=status.HTTP_403_FORBIDDEN,
-                detail=f"You have reached your file limit ({permission.max_files} files)."
-            )
+    return FileUploadResponse(
+        id=db_file.id,
+        filename=db_file.original_filename,
+        file_size=db_file.file_size,
+        file_type=db_file.file_type,
+        upload_date=db_file.upload_date,
+        processed=db_file.processed
+    )
 
-    # Validate file type
-    if not validate_file_type(file.filename):
+
+def _upload_session_headers(upload: UploadSession) -> dict:
+    """tus response headers for an upload session"""
+    return {
+        "Tus-Resumable": TUS_VERSION,
+        "Upload-Offset": str(upload.offset),
+        "Upload-Length": str(upload.total_size),
+        "Upload-Expires": format_datetime(upload.expires_at.replace(tzinfo=timezone.utc), usegmt=True),
+        "Cache-Control": "no-store",
+    }
+
+
+def _upload_session_response(upload: UploadSession) -> UploadSessionResponse:
+    return UploadSessionResponse(
+        id=upload.id,
+        filename=upload.original_filename,
+        size=upload.total_size,
+        offset=upload.offset,
+        expires_at=upload.expires_at
+    )
+
+
+def _get_upload_session(upload_id: str, user_id: str, session: Session, for_update: bool = False) -> UploadSession:
+    statement = select(UploadSession).where(
+        UploadSession.id == upload_id,
+        UploadSession.user_id == user_id
+    )
+    if for_update:
+        statement = statement.with_for_update().execution_options(populate_existing=True)
+    upload = session.exec(statement).first()
+
+    if not upload:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+    return upload
+
+
+def _parse_upload_checksum(header: str):
+    """
+    Parse a tus Upload-Checksum header ("<algorithm> <base64 digest>")
+
+    Returns:
+        (hashlib object, expected digest bytes)
+    """
+    try:
+        algorithm, encoded = header.strip().split(" ", 1)
+        expected = base64.b64decode(encoded.strip(), validate=True)
+    except (ValueError, binascii.Error):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Invalid file type. Only PDF, DOC, and DOCX files are allowed."
+            detail="Upload-Checksum must be '<algorithm> <base64 digest>'"
         )
 
-    # Check file size
-    file_size = 0
-    content = await file.read()
-    file_size = len(content)
+    algorithm = algorithm.lower()
+    if algorithm not in UPLOAD_CHECKSUM_ALGORITHMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unsupported checksum algorithm. Use one of: {', '.join(UPLOAD_CHECKSUM_ALGORITHMS)}"
+        )
+    return hashlib.new(algorithm), expected
 
-    if not admin:
-        permission = get_user_permission(user_id, session)
-        max_size_bytes = permission.max_file_size_mb * 1024 * 1024
 
-        if file_size > max_size_bytes:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"File size exceeds limit ({permission.max_file_size_mb}MB)."
-            )
-    else:
-        if file_size > MAX_FILE_SIZE:
-            raise HTTPException(
-                status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
-                detail=f"File size exceeds maximum limit (100MB)."
-            )
+@router.post("/uploads", response_model=UploadSessionResponse, status_code=status.HTTP_201_CREATED)
+def create_upload_session(
+    request: UploadSessionCreate,
+    response: Response,
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """
+    Start a resumable upload
+
+    Send the bytes with PATCH /api/files/uploads/{id} (tus-style: one or
+    more chunks, each at its Upload-Offset), then finish with
+    POST /api/files/uploads/{id}/complete. After a dropped connection,
+    HEAD or GET the upload to learn how many bytes arrived and continue
+    from there. Uploads not finished within UPLOAD_SESSION_TTL_HOURS of
+    their last chunk are deleted.
+    """
+    max_size_bytes, _ = check_upload_permission(user_id, session)
 
-    # Generate unique filename
-    file_ext = get_file_extension(file.filename)
-    unique_filename = f"{uuid.uuid4()}.{file_ext}"
-    file_path = os.path.join(UPLOAD_DIR, unique_filename)
+    if not validate_file_type(request.filename):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid file type. Only PDF, DOC, and DOCX files are allowed."
+        )
 
-    # Save file
-    with open(file_path, 'wb') as f:
-        f.write(content)
+    if request.size > max_size_bytes:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"File size exceeds limit ({max_size_bytes // (1024 * 1024)}MB)."
+        )
 
-    # Create database record
-    db_file = FileUpload(
+    upload = UploadSession(
         user_id=user_id,
-        filename=unique_filename,
-        original_filename=file.filename,
-        file_path=file_path,
-        file_size=file_size,
-        file_type=file_ext,
-        processed=False
+        original_filename=request.filename,
+        file_type=get_file_extension(request.filename),
+        total_size=request.size,
+        sha256=request.sha256.lower() if request.sha256 else None,
+        storage_backend=STORAGE_BACKEND,
+        expires_at=session_expiry()
     )
-
-    session.add(db_file)
+    session.add(upload)
     session.commit()
-    session.refresh(db_file)
+    session.refresh(upload)
 
-    # Extract text in background (async processing)
-    # For now, we'll do it synchronously
-    extracted_text = extract_text_from_file(file_path, file_ext)
-    if extracted_text:
-        db_file.processed_content = extracted_text
-        db_file.processed = True
-        session.add(db_file)
-        session.commit()
-        session.refresh(db_file)
+    response.headers.update(_upload_session_headers(upload))
+    response.headers["Location"] = f"{router.prefix}/uploads/{upload.id}"
+    return _upload_session_response(upload)
+
+
+@router.api_route("/uploads/{upload_id}", methods=["GET", "HEAD"], response_model=UploadSessionResponse)
+def get_upload_session(
+    upload_id: str,
+    response: Response,
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """Get a resumable upload's current offset (also in the Upload-Offset header)"""
+    upload = _get_upload_session(upload_id, user_id, session)
+    response.headers.update(_upload_session_headers(upload))
+    return _upload_session_response(upload)
+
+
+@router.patch("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def upload_chunk(
+    upload_id: str,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """
+    Append a chunk to a resumable upload
+
+    Headers:
+        Content-Type: application/offset+octet-stream
+        Upload-Offset: byte offset of the chunk (must equal the current offset)
+        Upload-Checksum: optional "<algorithm> <base64 digest>" of the chunk;
+            on mismatch the chunk is discarded and 460 is returned
+
+    The chunk is stored before the offset advances, so a chunk cut off by
+    a dropped connection is simply sent again from the returned offset.
+    """
+    upload = _get_upload_session(upload_id, user_id, session)
+
+    if request.headers.get("content-type", "").split(";")[0].strip() != "application/offset+octet-stream":
+        raise HTTPException(
+            status_code=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            detail="Content-Type must be application/offset+octet-stream"
+        )
+
+    try:
+        offset = int(request.headers["upload-offset"])
+    except (KeyError, ValueError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Upload-Offset header is required"
+        )
+
+    if offset != upload.offset:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload offset is {upload.offset}",
+            headers=_upload_session_headers(upload)
+        )
+
+    checksum = request.headers.get("upload-checksum")
+    client_hash, expected_digest = _parse_upload_checksum(checksum) if checksum else (None, None)
+
+    # Stream the body to disk; the chunk may not run past the declared size
+    max_bytes = min(upload.total_size - upload.offset, UPLOAD_MAX_CHUNK_MB * 1024 * 1024)
+    sha256 = hashlib.sha256()
+    hashers = [sha256, client_hash] if client_hash is not None else [sha256]
+
+    try:
+        temp_path, size = await save_stream_to_temp(request.stream(), UPLOAD_DIR, max_bytes, hashers)
+    except FileTooLargeError:
+        raise HTTPException(
+            status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+            detail=f"Chunk exceeds the remaining size or the {UPLOAD_MAX_CHUNK_MB}MB chunk limit ({max_bytes} bytes)"
+        )
+    except ClientDisconnect:
+        # Nothing stored; the client resumes from the unchanged offset
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Client disconnected")
+
+    if client_hash is not None and client_hash.digest() != expected_digest:
+        remove_file_quietly(temp_path)
+        raise HTTPException(
+            status_code=UPLOAD_CHECKSUM_MISMATCH,
+            detail="Checksum mismatch; chunk discarded",
+            headers=_upload_session_headers(upload)
+        )
+
+    try:
+        await anyio.to_thread.run_sync(
+            append_chunk, session, upload.id, offset, temp_path, size, sha256.hexdigest()
+        )
+    except OffsetMismatchError as e:
+        # A concurrent request for the same upload stored this range first
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload offset is {e.expected}",
+            headers={"Tus-Resumable": TUS_VERSION, "Upload-Offset": str(e.expected)}
+        )
+    except LookupError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Upload not found"
+        )
+
+    session.refresh(upload)
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers=_upload_session_headers(upload))
+
+
+@router.post("/uploads/{upload_id}/complete", response_model=FileUploadResponse)
+async def complete_upload(
+    upload_id: str,
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """
+    Finish a resumable upload once every byte has arrived
+
+    The chunks are joined and verified (per-chunk digests, and the whole
+    file's SHA-256 if one was given at creation), then stored exactly like
+    a regular upload. Returns the new file.
+    """
+    upload = _get_upload_session(upload_id, user_id, session)
+
+    if upload.offset != upload.total_size:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Upload is incomplete ({upload.offset} of {upload.total_size} bytes)",
+            headers=_upload_session_headers(upload)
+        )
+
+    # Permission may have changed (or the file limit been reached) since the upload started
+    _, max_files = check_upload_permission(user_id, session)
+
+    with upload_quota(session, user_id, upload.total_size, max_files):
+        # Locked until the file is created, so a repeated request can't complete it twice
+        upload = _get_upload_session(upload_id, user_id, session, for_update=True)
+
+        try:
+            temp_path, file_size, content_hash = await anyio.to_thread.run_sync(assemble_upload, session, upload)
+        except ValueError as e:
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail=f"Upload could not be assembled: {e}"
+            )
+
+        if upload.sha256 and upload.sha256 != content_hash:
+            remove_file_quietly(temp_path)
+            raise HTTPException(
+                status_code=UPLOAD_CHECKSUM_MISMATCH,
+                detail="File checksum does not match the SHA-256 given when the upload was created"
+            )
+
+        # The session goes in the same commit as the new file; its chunk objects after it
+        original_filename = upload.original_filename
+        backend = upload.storage_backend
+        chunk_keys = detach_upload(session, upload)
+        db_file = await store_uploaded_file(session, user_id, original_filename, temp_path, file_size, content_hash)
+
+    await anyio.to_thread.run_sync(delete_chunk_objects, backend, chunk_keys)
 
     return FileUploadResponse(
         id=db_file.id,
@@ -170,6 +540,19 @@ async def upload_file(
     )
 
 
+@router.delete("/uploads/{upload_id}", status_code=status.HTTP_204_NO_CONTENT)
+def cancel_upload(
+    upload_id: str,
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """Abandon a resumable upload and delete its chunks"""
+    upload = _get_upload_session(upload_id, user_id, session)
+    discard_upload(session, upload)
+    session.commit()
+    return Response(status_code=status.HTTP_204_NO_CONTENT, headers={"Tus-Resumable": TUS_VERSION})
+
+
 @router.get("", response_model=FileListResponse)
 def get_my_files(
     user_id: str = Depends(get_current_user_id),
@@ -194,6 +577,52 @@ def get_my_files(
     return FileListResponse(files=file_responses, total=len(file_responses))
 
 
+# Declared before the /{file_id} routes, which would otherwise match it
+@router.get("/permission/status")
+def get_permission_status(
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """Get current user's permission status"""
+    # Check if admin
+    file_count, total_bytes = get_usage(session, user_id)
+
+    if is_admin(user_id, session):
+        return {
+            "has_permission": True,
+            "is_admin": True,
+            "max_files": "unlimited",
+            "max_file_size_mb": 100,
+            "current_file_count": file_count,
+            "storage_used_bytes": total_bytes
+        }
+
+    # Check permission
+    statement = select(FilePermission).where(FilePermission.user_id == user_id)
+    permission = session.exec(statement).first()
+
+    if not permission:
+        return {
+            "has_permission": False,
+            "is_admin": False,
+            "message": "No upload permission. Please request permission."
+        }
+
+    # Check expiry
+    expired = permission.expires_at and permission.expires_at < datetime.utcnow()
+
+    return {
+        "has_permission": permission.can_upload and not expired,
+        "is_admin": False,
+        "max_files": permission.max_files,
+        "max_file_size_mb": permission.max_file_size_mb,
+        "current_file_count": file_count,
+        "storage_used_bytes": total_bytes,
+        "expires_at": permission.expires_at,
+        "expired": expired
+    }
+
+
 @router.get("/{file_id}", response_model=FileUploadResponse)
 def get_file(
     file_id: int,
@@ -223,6 +652,209 @@ def get_file(
     )
 
 
+@router.get("/{file_id}/status", response_model=FileStatusResponse)
+def get_file_status(
+    file_id: int,
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """Get text extraction status for a file"""
+    statement = select(
+        FileUpload.id,
+        FileUpload.processed,
+        FileBlob.extraction_status,
+        FileBlob.extraction_error,
+        FileBlob.processed_at,
+        FileBlob.page_count,
+        FileBlob.pages_extracted
+    ).outerjoin(
+        FileBlob, FileBlob.content_hash == FileUpload.content_hash
+    ).where(
+        FileUpload.id == file_id,
+        FileUpload.user_id == user_id
+    )
+    file = session.exec(statement).first()
+
+    if not file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+
+    return FileStatusResponse(
+        id=file.id,
+        processed=file.processed,
+        # Legacy uploads whose file was lost before the blob store have no blob
+        extraction_status=file.extraction_status or ("done" if file.processed else "failed"),
+        extraction_error=file.extraction_error,
+        processed_at=file.processed_at,
+        page_count=file.page_count,
+        pages_extracted=file.pages_extracted or 0
+    )
+
+
+@router.get("/{file_id}/pages", response_model=FilePagesResponse)
+def get_file_pages(
+    file_id: int,
+    start: int = Query(default=0, ge=0),
+    limit: int = Query(default=10, ge=1, le=50),
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """
+    Get extracted text for a range of pages
+
+    Pages already extracted are served from the database; pages past the
+    background extraction budget are extracted on demand (once) first.
+    """
+    statement = select(FileUpload.id, FileUpload.content_hash).where(
+        FileUpload.id == file_id,
+        FileUpload.user_id == user_id
+    )
+    file = session.exec(statement).first()
+    if not file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+
+    content_hash = file.content_hash or ""
+    if content_hash:
+        error = extract_pages_on_demand(content_hash, start + limit)
+        if error:
+            print(f"On-demand extraction failed for file {file_id}: {error}")
+
+    blob = session.get(FileBlob, content_hash, populate_existing=True) if content_hash else None
+    pages = session.exec(
+        select(FilePage.page_number, FilePage.content)
+        .where(
+            FilePage.content_hash == content_hash,
+            FilePage.page_number >= start,
+            FilePage.page_number < start + limit
+        )
+        .order_by(FilePage.page_number)
+    ).all()
+
+    return FilePagesResponse(
+        file_id=file_id,
+        page_count=blob.page_count if blob else None,
+        pages_extracted=blob.pages_extracted if blob else 0,
+        pages=[FilePageResponse(page_number=p.page_number, content=p.content) for p in pages]
+    )
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match comparison (weak, per RFC 9110: W/ prefixes are ignored)"""
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return etag in (tag[2:] if tag.startswith("W/") else tag for tag in candidates)
+
+
+def _not_modified(request: Request, etag: str, last_modified: datetime) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since when there is no If-None-Match"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        if since.tzinfo is not None:
+            since = since.astimezone(timezone.utc).replace(tzinfo=None)
+        # HTTP dates have one-second resolution
+        return last_modified.replace(microsecond=0) <= since
+    return False
+
+
+@router.get("/{file_id}/content")
+def download_file(
+    file_id: int,
+    request: Request,
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """
+    Download a file's original bytes
+
+    Local storage is served with FileResponse (sendfile where the server
+    supports it), including Range/If-Range requests; object storage
+    redirects to a short-lived presigned URL. Either way the bytes never
+    pass through Python memory. The ETag is the content hash, so it is
+    strong and identical for every copy of the same content. Uploads
+    whose original file was lost before the blob store existed only have
+    their extracted text left; they answer 410 Gone.
+    """
+    statement = select(
+        FileUpload.original_filename,
+        FileBlob.content_hash,
+        FileBlob.created_at,
+        FileBlob.storage_backend,
+        FileBlob.storage_key
+    ).join(
+        FileBlob, FileBlob.content_hash == FileUpload.content_hash
+    ).where(
+        FileUpload.id == file_id,
+        FileUpload.user_id == user_id
+    )
+    file = session.exec(statement).first()
+
+    if not file:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File not found"
+        )
+
+    if file.storage_backend == TextOnlyStorage.name:
+        raise HTTPException(
+            status_code=status.HTTP_410_GONE,
+            detail="The original file is no longer available; only its extracted text was kept"
+        )
+
+    etag = f'"{file.content_hash}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": format_datetime(file.created_at.replace(tzinfo=timezone.utc), usegmt=True),
+        # Private to the owner; clients revalidate cheaply with the ETag
+        "Cache-Control": "private, no-cache",
+    }
+    if _not_modified(request, etag, file.created_at):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    media_type = mimetypes.guess_type(file.original_filename)[0] or "application/octet-stream"
+    storage = get_storage(file.storage_backend)
+
+    url = storage.presigned_url(file.storage_key, file.original_filename, media_type)
+    if url:
+        return RedirectResponse(url, status_code=status.HTTP_307_TEMPORARY_REDIRECT, headers=headers)
+
+    if not isinstance(storage, LocalStorage):
+        raise HTTPException(
+            status_code=status.HTTP_501_NOT_IMPLEMENTED,
+            detail="Downloads are not supported by this storage backend"
+        )
+
+    path = storage.path(file.storage_key)
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="File content not available"
+        )
+
+    return FileResponse(
+        path,
+        headers=headers,
+        media_type=media_type,
+        filename=file.original_filename,
+        stat_result=stat_result,
+    )
+
+
 @router.delete("/{file_id}")
 def delete_file(
     file_id: int,
@@ -242,11 +874,9 @@ def delete_file(
             detail="File not found"
         )
 
-    # Delete physical file
-    if os.path.exists(file.file_path):
-        os.remove(file.file_path)
-
-    # Delete database record
+    # Drop this upload's reference; unreferenced content is garbage collected
+    release_blob(session, file.content_hash)
+    release_upload(session, user_id, file.file_size)
     session.delete(file)
     session.commit()
 
@@ -310,43 +940,3 @@ def request_permission(
         )
 
     return {"message": "Permission request sent to admin"}
-
-
-@router.get("/permission/status")
-def get_permission_status(
-    user_id: str = Depends(get_current_user_id),
-    session: Session = Depends(get_session)
-):
-    """Get current user's permission status"""
-    # Check if admin
-    if is_admin(user_id, session):
-        return {
-            "has_permission": True,
-            "is_admin": True,
-            "max_files": "unlimited",
-            "max_file_size_mb": 100
-        }
-
-    # Check permission
-    statement = select(FilePermission).where(FilePermission.user_id == user_id)
-    permission = session.exec(statement).first()
-
-    if not permission:
-        return {
-            "has_permission": False,
-            "is_admin": False,
-            "message": "No upload permission. Please request permission."
-        }
-
-    # Check expiry
-    expired = permission.expires_at and permission.expires_at < datetime.utcnow()
-
-    return {
-        "has_permission": permission.can_upload and not expired,
-        "is_admin": False,
-        "max_files": permission.max_files,
-        "max_file_size_mb": permission.max_file_size_mb,
-        "current_file_count": get_user_file_count(user_id, session),
-        "expires_at": permission.expires_at,
-        "expired": expired
-    }
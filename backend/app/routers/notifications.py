@@ -107,6 +107,31 @@ def send_test_email(
     }
 
 
+@router.get("/transport-stats")
+def get_transport_stats(
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """
+    Email transport send latency and throughput (Admin only)
+    """
+    # Verify admin
+    statement = select(User).where(User.id == user_id)
+    user = session.exec(statement).first()
+
+    if not user or user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    return {
+        "transport": email_service.transport.name,
+        "configured": email_service.transport.configured,
+        "stats": email_service.transport.stats.snapshot()
+    }
+
+
 @router.post("/trigger-reminders")
 def trigger_reminder_check(
     user_id: str = Depends(get_current_user_id),
@@ -132,3 +157,31 @@ def trigger_reminder_check(
         "message": "Reminder check triggered successfully",
         "status": "success"
     }
+
+
+@router.post("/trigger-digest")
+def trigger_daily_digest(
+    user_id: str = Depends(get_current_user_id),
+    session: Session = Depends(get_session)
+):
+    """
+    Manually trigger the daily digest (for testing)
+    """
+    # Verify admin
+    statement = select(User).where(User.id == user_id)
+    user = session.exec(statement).first()
+
+    if not user or user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required"
+        )
+
+    # Run digest
+    summary = email_service.send_daily_digests(session)
+
+    return {
+        "message": "Daily digest triggered successfully",
+        "status": "success",
+        "summary": summary
+    }
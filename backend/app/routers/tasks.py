@@ -10,6 +10,7 @@ from datetime import datetime
 from app.database import get_session
 from app.models.task import Task, TaskCreate, TaskUpdate, TaskResponse
 from app.auth import get_current_user_id
+from app.reminders import sync_task_reminders, validate_offsets
 
 router = APIRouter(prefix="/api/tasks", tags=["Tasks"])
 
@@ -131,9 +132,17 @@ def create_task(
     - Priority levels (high, medium, low)
     - Tags (array of strings)
     - Due dates
-    - Reminder dates
+    - Reminder dates and reminder offsets (e.g. ["1d", "1h", "due", "overdue"])
     - Recurring patterns
     """
+    try:
+        validate_offsets(task_data.reminder_offsets)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
     task = Task(
         user_id=user_id,
         title=task_data.title.strip(),
@@ -144,11 +153,14 @@ def create_task(
         tags=task_data.tags or [],
         due_date=task_data.due_date,
         reminder_date=task_data.reminder_date,
+        reminder_offsets=task_data.reminder_offsets,
         is_recurring=task_data.is_recurring or False,
         recurrence_pattern=task_data.recurrence_pattern
     )
 
     session.add(task)
+    session.flush()
+    sync_task_reminders(session, task)
     session.commit()
     session.refresh(task)
 
@@ -212,6 +224,14 @@ def update_task(
             detail="Not authorized to modify this task"
         )
 
+    try:
+        validate_offsets(task_data.reminder_offsets)
+    except ValueError as e:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(e)
+        )
+
     # Update fields
     if task_data.title is not None:
         task.title = task_data.title.strip()
@@ -220,9 +240,20 @@ def update_task(
     if task_data.completed is not None:
         task.completed = task_data.completed
 
+    # Reminder schedule fields
+    fields_set = task_data.model_fields_set
+    if "due_date" in fields_set:
+        task.due_date = task_data.due_date
+    if "reminder_date" in fields_set:
+        task.reminder_date = task_data.reminder_date
+    if "reminder_offsets" in fields_set:
+        task.reminder_offsets = task_data.reminder_offsets
+
     task.updated_at = datetime.utcnow()
 
     session.add(task)
+    if fields_set & {"completed", "due_date", "reminder_date", "reminder_offsets"}:
+        sync_task_reminders(session, task)
     session.commit()
     session.refresh(task)
 
@@ -260,6 +291,7 @@ def toggle_complete(
     task.updated_at = datetime.utcnow()
 
     session.add(task)
+    sync_task_reminders(session, task)
     session.commit()
     session.refresh(task)
 
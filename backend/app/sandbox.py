@@ -0,0 +1,235 @@
+"""
+Sandboxed document extraction
+Runs one extraction per child process under address-space and CPU-time
+rlimits with a wall-clock timeout, so a pathological document can only
+ever take down its own child.
+"""
+
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+try:
+    import resource
+except ImportError:  # Windows: no rlimits, the wall-clock timeout still applies
+    resource = None
+
+from app.file_utils import limit_pages, open_document_pages
+
+# Per-job limits
+EXTRACTION_MAX_MEMORY_MB = int(os.getenv("EXTRACTION_MAX_MEMORY_MB", "1024"))
+EXTRACTION_CPU_SECONDS = int(os.getenv("EXTRACTION_CPU_SECONDS", "60"))
+EXTRACTION_TIMEOUT_SECONDS = float(os.getenv("EXTRACTION_TIMEOUT_SECONDS", "120"))
+
+# Don't fork the server process (it has live threads); children come from a
+# clean forkserver that has the parsers preloaded, or a fresh interpreter
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _context = multiprocessing.get_context("forkserver")
+    _context.set_forkserver_preload(["app.sandbox"])
+else:
+    _context = multiprocessing.get_context("spawn")
+
+# Children currently running, so shutdown can kill them
+_live_processes = set()
+_live_lock = threading.Lock()
+
+
+@dataclass
+class SandboxResult:
+    """Outcome of one sandboxed extraction"""
+    text: Optional[str]
+    pages: int  # Pages extracted by this run
+    seconds: float
+    error: Optional[str] = None
+    page_count: Optional[int] = None  # Total pages in the document, if it could be opened
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _apply_limits(max_memory_bytes: int, cpu_seconds: int):
+    if resource is None:
+        return
+
+    if max_memory_bytes > 0:
+        resource.setrlimit(resource.RLIMIT_AS, (max_memory_bytes, max_memory_bytes))
+    if cpu_seconds > 0:
+        # SIGXCPU at the soft limit, SIGKILL one second later if it's ignored
+        resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds + 1))
+
+
+def _child_main(
+    conn,
+    file_path: str,
+    file_type: str,
+    start_page: int,
+    max_pages: Optional[int],
+    max_chars: Optional[int],
+    max_memory_bytes: int,
+    cpu_seconds: int,
+):
+    """
+    Child process entry point
+
+    Streams ("meta", page_count), then ("page", page_number, text) per page,
+    then ("ok", page_count) - or ("error", message) at any point. The final
+    page count is filled in once the document has been read to the end
+    (formats like DOCX can't tell it up front); it is None if a budget
+    stopped extraction first.
+    """
+    try:
+        _apply_limits(max_memory_bytes, cpu_seconds)
+        page_count, pages = open_document_pages(file_path, file_type, start_page)
+        conn.send(("meta", page_count))
+
+        sent = 0
+        chars = 0
+        for page_number, text in limit_pages(pages, max_pages, max_chars):
+            conn.send(("page", page_number, text))
+            sent += 1
+            chars += len(text)
+
+        budget_hit = (max_pages is not None and sent >= max_pages) or (max_chars is not None and chars >= max_chars)
+        if page_count is None and not budget_hit:
+            page_count = start_page + sent
+        conn.send(("ok", page_count))
+    except MemoryError:
+        conn.send(("error", f"Memory limit exceeded ({max_memory_bytes // (1024 * 1024)}MB)"))
+    except Exception as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"[:500]))
+    finally:
+        conn.close()
+
+
+def _describe_exit(exitcode: Optional[int], cpu_seconds: int) -> str:
+    if exitcode is not None and exitcode < 0:
+        signum = -exitcode
+        if hasattr(signal, "SIGXCPU") and signum == signal.SIGXCPU:
+            return f"CPU time limit exceeded ({cpu_seconds}s)"
+        if signum == signal.SIGKILL:
+            return "Extraction process was killed (CPU or memory limit)"
+        return f"Extraction process died with signal {signal.Signals(signum).name}"
+    return f"Extraction process exited unexpectedly (code {exitcode})"
+
+
+def run_sandboxed_extraction(
+    file_path: str,
+    file_type: str,
+    on_page: Optional[Callable[[int, str, Optional[int]], None]] = None,
+    start_page: int = 0,
+    max_pages: Optional[int] = None,
+    max_chars: Optional[int] = None,
+    timeout: float = EXTRACTION_TIMEOUT_SECONDS,
+    max_memory_mb: int = EXTRACTION_MAX_MEMORY_MB,
+    cpu_seconds: int = EXTRACTION_CPU_SECONDS,
+) -> SandboxResult:
+    """
+    Extract text from a document in a resource-limited child process
+
+    Blocking; call from a worker thread. Pages stream back as they are
+    parsed and are handed to on_page(page_number, text, page_count) in this
+    thread, so callers can persist them before the document is finished.
+    The child is killed if it has not finished within `timeout` seconds.
+    Never raises for problems with the document itself - they come back as
+    SandboxResult.error (pages already delivered stay delivered).
+
+    Args:
+        file_path: Path to the document
+        file_type: File extension (pdf, docx, doc)
+        on_page: Optional callback per extracted page
+        start_page: First page to extract (0-based)
+        max_pages: Stop after this many pages (None for no limit)
+        max_chars: Stop once this many characters are extracted (None for no limit)
+        timeout: Wall-clock limit in seconds
+        max_memory_mb: Address-space limit for the child (0 disables)
+        cpu_seconds: CPU-time limit for the child (0 disables)
+
+    Returns:
+        SandboxResult with text and page counts, or an error message
+    """
+    start = time.perf_counter()
+    deadline = start + timeout
+    receiver, sender = _context.Pipe(duplex=False)
+    process = _context.Process(
+        target=_child_main,
+        args=(sender, file_path, file_type, start_page, max_pages, max_chars,
+              max_memory_mb * 1024 * 1024, cpu_seconds),
+        daemon=True,
+    )
+
+    texts: List[str] = []
+    pages = 0
+    page_count = None
+    error = None
+    finished = False
+    try:
+        process.start()
+        with _live_lock:
+            _live_processes.add(process)
+        # Only the child writes; closing our copy lets recv() see EOF if it dies
+        sender.close()
+
+        while not finished and error is None:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not receiver.poll(remaining):
+                error = f"Extraction timed out after {timeout:g}s"
+                break
+
+            try:
+                message = receiver.recv()
+            except (EOFError, OSError):
+                break
+
+            kind = message[0]
+            if kind == "meta":
+                page_count = message[1]
+            elif kind == "page":
+                _, page_number, text = message
+                pages += 1
+                if text:
+                    texts.append(text)
+                if on_page:
+                    on_page(page_number, text, page_count)
+            elif kind == "ok":
+                page_count = message[1] if message[1] is not None else page_count
+                finished = True
+            else:
+                error = message[1]
+    finally:
+        with _live_lock:
+            _live_processes.discard(process)
+        receiver.close()
+        if process.is_alive():
+            process.join(1 if finished else 0)
+        if process.is_alive():
+            process.kill()
+            process.join()
+        exitcode = process.exitcode
+        process.close()
+
+    if not finished and error is None:
+        error = _describe_exit(exitcode, cpu_seconds)
+
+    text = "\n\n".join(texts) if texts else None
+    return SandboxResult(text, pages, time.perf_counter() - start, error, page_count)
+
+
+def kill_running_extractions() -> int:
+    """Kill every running extraction child (used on shutdown); returns how many"""
+    with _live_lock:
+        processes = list(_live_processes)
+
+    killed = 0
+    for process in processes:
+        try:
+            if process.is_alive():
+                process.kill()
+                killed += 1
+        except ValueError:
+            pass  # already closed by its worker thread
+    return killed
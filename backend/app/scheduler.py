@@ -3,16 +3,28 @@ Background scheduler for task reminders
 """
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
+from sqlmodel import Session
 from app.email_service import email_service
-from app.database import get_session
+from app.database import get_session, engine
+from app.blob_store import collect_unreferenced_blobs
+from app.resumable_uploads import expire_upload_sessions
+from app.storage_usage import reconcile_storage_usage
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
 # Global scheduler instance
 scheduler = BackgroundScheduler()
 
+# Hour of day (UTC) at which the daily digest goes out
+DIGEST_HOUR_UTC = int(os.getenv("DIGEST_HOUR_UTC", "8"))
+
+# How often stored files no upload references any more are deleted
+BLOB_GC_INTERVAL_MINUTES = int(os.getenv("BLOB_GC_INTERVAL_MINUTES", "15"))
+
 
 def check_reminders_job():
     """Background job to check and send task reminders"""
@@ -25,6 +37,47 @@ def check_reminders_job():
         logger.error(f"Error in reminder check job: {str(e)}")
 
 
+def daily_digest_job():
+    """Background job to send the daily task digest to all users"""
+    try:
+        logger.info("Running daily digest job...")
+        with Session(engine) as session:
+            summary = email_service.send_daily_digests(session)
+        logger.info(f"Daily digest completed: {summary}")
+    except Exception as e:
+        logger.error(f"Error in daily digest job: {str(e)}")
+
+
+def blob_gc_job():
+    """Background job to delete stored files whose last upload was deleted"""
+    try:
+        deleted = collect_unreferenced_blobs()
+        if deleted:
+            logger.info(f"Blob collection deleted {deleted} unreferenced blobs")
+    except Exception as e:
+        logger.error(f"Error in blob collection job: {str(e)}")
+
+
+def upload_expiry_job():
+    """Background job to delete abandoned resumable uploads"""
+    try:
+        expired = expire_upload_sessions()
+        if expired:
+            logger.info(f"Expired {expired} abandoned resumable uploads")
+    except Exception as e:
+        logger.error(f"Error in upload expiry job: {str(e)}")
+
+
+def usage_reconcile_job():
+    """Background job to correct drift in per-user storage usage totals"""
+    try:
+        fixed = reconcile_storage_usage()
+        if fixed:
+            logger.info(f"Storage usage reconciliation corrected {fixed} users")
+    except Exception as e:
+        logger.error(f"Error in storage usage reconciliation job: {str(e)}")
+
+
 def start_scheduler():
     """Start the background scheduler"""
     if not scheduler.running:
@@ -37,8 +90,52 @@ def start_scheduler():
             replace_existing=True
         )
 
+        # Send the daily digest once a day
+        scheduler.add_job(
+            daily_digest_job,
+            trigger=CronTrigger(hour=DIGEST_HOUR_UTC, minute=0, timezone="UTC"),
+            id="daily_digest",
+            name=f"Send daily digest at {DIGEST_HOUR_UTC:02d}:00 UTC",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
+
+        # Delete unreferenced blobs
+        scheduler.add_job(
+            blob_gc_job,
+            trigger=IntervalTrigger(minutes=BLOB_GC_INTERVAL_MINUTES),
+            id="blob_gc",
+            name=f"Collect unreferenced blobs every {BLOB_GC_INTERVAL_MINUTES} minutes",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
+
+        # Delete abandoned resumable uploads
+        scheduler.add_job(
+            upload_expiry_job,
+            trigger=IntervalTrigger(hours=1),
+            id="upload_expiry",
+            name="Expire abandoned resumable uploads every hour",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
+
+        # Recount per-user storage usage
+        scheduler.add_job(
+            usage_reconcile_job,
+            trigger=IntervalTrigger(hours=1),
+            id="usage_reconcile",
+            name="Reconcile storage usage every hour",
+            replace_existing=True,
+            coalesce=True,
+            max_instances=1
+        )
+
         scheduler.start()
-        logger.info("Scheduler started - checking reminders every 10 minutes")
+        logger.info("Scheduler started - checking reminders every 10 minutes, daily digest at %02d:00 UTC", DIGEST_HOUR_UTC)
 
 
 def stop_scheduler():
@@ -0,0 +1,281 @@
+"""
+Blob storage backends
+Where content-addressed upload bytes live, selected with STORAGE_BACKEND:
+
+- local: a directory on local disk (default), sharded by hash prefix
+- s3:    any S3-compatible object store (AWS S3, MinIO, moto for tests)
+
+Blobs whose file was lost and that only have extracted text use the
+"none" backend (TextOnlyStorage), which stores nothing.
+
+Both store a blob under the key ab/cd/<sha256>. Only the s3 backend is
+shared between replicas; local storage needs a single instance or a
+shared volume. boto3 is only imported (and only needs to be installed)
+when the s3 backend is used.
+"""
+
+import os
+import shutil
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+from urllib.parse import quote
+
+from app.file_utils import remove_file_quietly
+
+# Upload root; temp files are written here too so moves into local storage are atomic renames
+UPLOAD_DIR = os.getenv("UPLOAD_DIR", "uploads")
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "local").lower()
+LOCAL_STORAGE_DIR = os.getenv("LOCAL_STORAGE_DIR", os.path.join(UPLOAD_DIR, "blobs"))
+
+# S3-compatible object storage (S3_ENDPOINT_URL points at MinIO or a moto server)
+S3_BUCKET = os.getenv("S3_BUCKET", "")
+S3_PREFIX = os.getenv("S3_PREFIX", "blobs/")
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+S3_REGION = os.getenv("S3_REGION", "us-east-1")
+# Connections kept open per process; shared by request threads and multipart parts
+S3_MAX_POOL_CONNECTIONS = int(os.getenv("S3_MAX_POOL_CONNECTIONS", "32"))
+# Objects at least this large are uploaded in parallel parts of S3_MULTIPART_CHUNK_MB
+S3_MULTIPART_THRESHOLD_MB = int(os.getenv("S3_MULTIPART_THRESHOLD_MB", "16"))
+S3_MULTIPART_CHUNK_MB = int(os.getenv("S3_MULTIPART_CHUNK_MB", "8"))
+S3_MULTIPART_CONCURRENCY = int(os.getenv("S3_MULTIPART_CONCURRENCY", "4"))
+# Lifetime of presigned download URLs
+S3_PRESIGN_EXPIRES_SECONDS = int(os.getenv("S3_PRESIGN_EXPIRES_SECONDS", "300"))
+
+os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+
+def storage_key(content_hash: str) -> str:
+    """Storage key for a content hash: two levels of hash-prefix shards"""
+    return f"{content_hash[:2]}/{content_hash[2:4]}/{content_hash}"
+
+
+class StorageBackend:
+    """
+    Base backend
+
+    Keys are relative, slash-separated paths. put() consumes the source
+    file; local_copy() gives a path on local disk for the duration of a
+    with-block (the sandboxed parsers need a real file).
+    """
+
+    name = "base"
+
+    def put(self, key: str, source_path: str):
+        raise NotImplementedError
+
+    def delete(self, key: str):
+        """Delete an object; deleting a missing key is not an error"""
+        raise NotImplementedError
+
+    def exists(self, key: str) -> bool:
+        raise NotImplementedError
+
+    def local_copy(self, key: str):
+        """Context manager yielding a local file path with the object's bytes"""
+        raise NotImplementedError
+
+    def presigned_url(self, key: str, filename: str, media_type: str) -> Optional[str]:
+        """Time-limited URL clients can download the object from directly, if supported"""
+        return None
+
+
+class LocalStorage(StorageBackend):
+    """Files under a root directory, e.g. uploads/blobs/ab/cd/<hash>"""
+
+    name = "local"
+
+    def __init__(self, root: str):
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def put(self, key: str, source_path: str):
+        path = self.path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    def delete(self, key: str):
+        path = self.path(key)
+        remove_file_quietly(path)
+
+        # Prune directories left empty (e.g. a finished upload's chunk directory)
+        parent = os.path.dirname(path)
+        while os.path.abspath(parent) != os.path.abspath(self.root):
+            try:
+                os.rmdir(parent)
+            except OSError:
+                break
+            parent = os.path.dirname(parent)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self.path(key))
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        yield self.path(key)
+
+
+class S3Storage(StorageBackend):
+    """
+    Objects in an S3-compatible bucket
+
+    One boto3 client per process (clients are thread-safe) with a
+    connection pool of S3_MAX_POOL_CONNECTIONS, so request threads and
+    multipart transfers reuse connections instead of opening new ones.
+    Large uploads go up as parallel multipart parts.
+    """
+
+    name = "s3"
+
+    def __init__(
+        self,
+        bucket: str,
+        prefix: str = "",
+        endpoint_url: Optional[str] = None,
+        region: str = "us-east-1",
+        max_pool_connections: int = 32,
+    ):
+        if not bucket:
+            raise ValueError("S3_BUCKET must be set when STORAGE_BACKEND=s3")
+
+        import boto3
+        from boto3.s3.transfer import TransferConfig
+        from botocore.config import Config
+
+        self.bucket = bucket
+        self.prefix = prefix
+        self.client = boto3.client(
+            "s3",
+            endpoint_url=endpoint_url,
+            region_name=region,
+            config=Config(
+                max_pool_connections=max_pool_connections,
+                retries={"max_attempts": 5, "mode": "standard"},
+                # Path-style addressing works with MinIO and moto without DNS tricks
+                s3={"addressing_style": "path"} if endpoint_url else None,
+            ),
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=S3_MULTIPART_THRESHOLD_MB * 1024 * 1024,
+            multipart_chunksize=S3_MULTIPART_CHUNK_MB * 1024 * 1024,
+            max_concurrency=min(S3_MULTIPART_CONCURRENCY, max_pool_connections),
+        )
+
+    def object_key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    def put(self, key: str, source_path: str):
+        self.client.upload_file(source_path, self.bucket, self.object_key(key), Config=self.transfer_config)
+        remove_file_quietly(source_path)
+
+    def delete(self, key: str):
+        self.client.delete_object(Bucket=self.bucket, Key=self.object_key(key))
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.object_key(key))
+            return True
+        except ClientError as e:
+            if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+                return False
+            raise
+
+    def presigned_url(self, key: str, filename: str, media_type: str) -> Optional[str]:
+        return self.client.generate_presigned_url(
+            "get_object",
+            Params={
+                "Bucket": self.bucket,
+                "Key": self.object_key(key),
+                "ResponseContentType": media_type,
+                "ResponseContentDisposition": f"attachment; filename*=utf-8''{quote(filename)}",
+            },
+            ExpiresIn=S3_PRESIGN_EXPIRES_SECONDS,
+        )
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        fd, path = tempfile.mkstemp(prefix="s3-", dir=UPLOAD_DIR)
+        os.close(fd)
+        try:
+            self.client.download_file(self.bucket, self.object_key(key), path, Config=self.transfer_config)
+            yield path
+        finally:
+            remove_file_quietly(path)
+
+
+class TextOnlyStorage(StorageBackend):
+    """
+    No stored object at all
+
+    For blobs that only hold extracted text: legacy uploads whose file was
+    already gone when they were moved into the blob store (see
+    blob_store.restore_legacy_text). Downloads report the file as gone.
+    """
+
+    name = "none"
+
+    def put(self, key: str, source_path: str):
+        raise ValueError("Text-only blobs have no stored object")
+
+    def delete(self, key: str):
+        pass
+
+    def exists(self, key: str) -> bool:
+        return False
+
+    @contextmanager
+    def local_copy(self, key: str) -> Iterator[str]:
+        raise FileNotFoundError(f"Blob {key} has no stored file, only extracted text")
+        yield
+
+
+_backends: Dict[str, StorageBackend] = {}
+_backends_lock = threading.Lock()
+
+
+def get_storage(name: Optional[str] = None) -> StorageBackend:
+    """
+    Return the backend called `name` (default: STORAGE_BACKEND)
+
+    Backends are created once per process and shared, so the S3 client
+    and its connection pool are reused by every caller.
+    """
+    name = (name or STORAGE_BACKEND).lower()
+    with _backends_lock:
+        backend = _backends.get(name)
+        if backend is None:
+            if name == "local":
+                backend = LocalStorage(LOCAL_STORAGE_DIR)
+            elif name == TextOnlyStorage.name:
+                backend = TextOnlyStorage()
+            elif name == "s3":
+                backend = S3Storage(
+                    bucket=S3_BUCKET,
+                    prefix=S3_PREFIX,
+                    endpoint_url=S3_ENDPOINT_URL,
+                    region=S3_REGION,
+                    max_pool_connections=S3_MAX_POOL_CONNECTIONS,
+                )
+            else:
+                raise ValueError(f"Unknown STORAGE_BACKEND: {name}")
+            _backends[name] = backend
+        return backend
+
+
+def copy_between(source: StorageBackend, source_key: str, target: StorageBackend, target_key: str):
+    """Copy an object to another backend/key; the source object is left in place"""
+    with source.local_copy(source_key) as path:
+        fd, temp_path = tempfile.mkstemp(prefix="copy-", dir=UPLOAD_DIR)
+        os.close(fd)
+        try:
+            shutil.copyfile(path, temp_path)
+            target.put(target_key, temp_path)
+        finally:
+            remove_file_quietly(temp_path)
@@ -0,0 +1,162 @@
+"""
+Per-user storage usage
+File count and bytes per user in user_storage_usage, so quota checks are a
+single-row read and enforcement is a single conditional UPDATE instead of
+loading every FileUpload row.
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from sqlalchemy import func, update
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.models.file import FileUpload, UserStorageUsage
+
+# Rows changed more recently than this are left alone by reconciliation, so
+# it never "corrects" a reservation whose upload is still being stored
+USAGE_RECONCILE_GRACE_MINUTES = int(os.getenv("USAGE_RECONCILE_GRACE_MINUTES", "15"))
+
+
+def get_usage(session: Session, user_id: str) -> Tuple[int, int]:
+    """
+    Return (file_count, total_bytes) for a user
+
+    Users without a usage row yet have no files.
+    """
+    row = session.exec(
+        select(UserStorageUsage.file_count, UserStorageUsage.total_bytes)
+        .where(UserStorageUsage.user_id == user_id)
+    ).first()
+    return (row.file_count, row.total_bytes) if row else (0, 0)
+
+
+def _ensure_usage_row(session: Session, user_id: str):
+    """Create a user's zeroed usage row if it doesn't exist yet"""
+    if session.get(UserStorageUsage, user_id) is not None:
+        return
+    try:
+        with session.begin_nested():
+            session.add(UserStorageUsage(user_id=user_id))
+    except IntegrityError:
+        pass  # Created concurrently
+
+
+def reserve_upload(session: Session, user_id: str, size: int, max_files: Optional[int]) -> bool:
+    """
+    Count a new upload against a user's quota, if it fits
+
+    A single conditional UPDATE both checks and increments, so concurrent
+    uploads can never take a user past max_files. The reservation is
+    committed immediately (it must not hold the row lock while the file is
+    stored); if storing then fails, undo it with release_upload().
+
+    Args:
+        session: Database session (committed)
+        user_id: Uploading user
+        size: File size in bytes
+        max_files: File limit, or None for unlimited (admins)
+
+    Returns:
+        False if the user is already at max_files
+    """
+    _ensure_usage_row(session, user_id)
+
+    statement = (
+        update(UserStorageUsage)
+        .where(UserStorageUsage.user_id == user_id)
+        .values(
+            file_count=UserStorageUsage.file_count + 1,
+            total_bytes=UserStorageUsage.total_bytes + size,
+            updated_at=datetime.utcnow(),
+        )
+    )
+    if max_files is not None:
+        statement = statement.where(UserStorageUsage.file_count < max_files)
+
+    reserved = session.execute(statement).rowcount == 1
+    session.commit()
+    return reserved
+
+
+def release_upload(session: Session, user_id: str, size: int):
+    """
+    Remove one file of `size` bytes from a user's usage
+
+    Used when a file is deleted (caller commits, in the same transaction as
+    the delete) and to undo a reservation whose upload failed.
+    """
+    session.execute(
+        update(UserStorageUsage)
+        .where(UserStorageUsage.user_id == user_id)
+        .values(
+            file_count=UserStorageUsage.file_count - 1,
+            total_bytes=UserStorageUsage.total_bytes - size,
+            updated_at=datetime.utcnow(),
+        )
+    )
+
+
+def reconcile_storage_usage() -> int:
+    """
+    Recompute every user's usage from file_uploads and fix rows that drifted
+
+    Drift comes from reservations whose upload died with its process, or
+    from files deleted outside the API. Recently changed rows are skipped
+    (see USAGE_RECONCILE_GRACE_MINUTES) and picked up by the next run.
+
+    Returns:
+        Number of usage rows corrected or created
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=USAGE_RECONCILE_GRACE_MINUTES)
+    fixed = 0
+
+    with Session(engine) as session:
+        actual = {
+            row.user_id: (row.file_count, row.total_bytes)
+            for row in session.exec(
+                select(
+                    FileUpload.user_id,
+                    func.count().label("file_count"),
+                    func.coalesce(func.sum(FileUpload.file_size), 0).label("total_bytes"),
+                ).group_by(FileUpload.user_id)
+            )
+        }
+        stored = {usage.user_id: usage for usage in session.exec(select(UserStorageUsage)).all()}
+
+        for user_id in actual.keys() | stored.keys():
+            file_count, total_bytes = actual.get(user_id, (0, 0))
+            usage = stored.get(user_id)
+
+            if usage is None:
+                session.add(UserStorageUsage(user_id=user_id, file_count=file_count, total_bytes=total_bytes))
+                fixed += 1
+                continue
+
+            recorded = (usage.file_count, usage.total_bytes)
+            if recorded == (file_count, total_bytes):
+                continue
+
+            # Re-check under the row's own timestamp so a concurrent upload wins
+            corrected = session.execute(
+                update(UserStorageUsage)
+                .where(UserStorageUsage.user_id == user_id, UserStorageUsage.updated_at < cutoff)
+                .values(file_count=file_count, total_bytes=total_bytes, updated_at=datetime.utcnow())
+            ).rowcount
+            if corrected:
+                print(
+                    f"Storage usage for user {user_id} corrected: "
+                    f"{recorded[0]} files/{recorded[1]} bytes -> {file_count}/{total_bytes}"
+                )
+                fixed += 1
+
+        try:
+            session.commit()
+        except IntegrityError:
+            # A user's first upload created the row meanwhile; the next run checks it
+            session.rollback()
+
+    return fixed
@@ -0,0 +1,458 @@
+"""
+Local vector index over document chunks
+Semantic recall for chat retrieval without an external embedding service.
+Chunks are embedded by a pluggable Embedder (VECTOR_EMBEDDER; a local
+feature-hashing vectorizer by default) into a per-user float32 matrix kept
+in memory-mapped .npy files, and a query is one matrix-vector product.
+
+The files are a per-replica cache of document_chunks. Before a search the
+index is compared with the user's chunks in the database and only the
+difference is embedded or dropped, so uploads and deletes update it
+incrementally and a missing or stale index rebuilds itself.
+"""
+
+import hashlib
+import importlib
+import json
+import math
+import os
+import uuid
+import zlib
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+from typing import Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+    msvcrt = None
+except ImportError:  # Windows: byte-range locks on the lock file instead of flock
+    fcntl = None
+    import msvcrt
+
+import numpy as np
+from numpy.lib.format import open_memmap
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.database import engine
+from app.document_index import tokenize, user_chunks
+from app.models.file import DocumentChunk, FileUpload
+from app.storage import UPLOAD_DIR
+
+# Embedding function: hashing (default), none (vector search off), or
+# module:factory for a custom Embedder taking the dimension count
+VECTOR_EMBEDDER = os.getenv("VECTOR_EMBEDDER", "hashing")
+VECTOR_DIMENSIONS = int(os.getenv("VECTOR_DIMENSIONS", "256"))
+VECTOR_INDEX_DIR = os.getenv("VECTOR_INDEX_DIR", os.path.join(UPLOAD_DIR, "vectors"))
+# Hits less similar than this are noise (hash collisions), not recall
+VECTOR_MIN_SIMILARITY = float(os.getenv("VECTOR_MIN_SIMILARITY", "0.1"))
+
+# Chunks embedded per batch when syncing an index
+VECTOR_EMBED_BATCH = 256
+
+# Most chunks a chat message embeds into a stale index before searching;
+# a cold index fills up over the next messages (and the extraction
+# worker syncs each new document in full)
+VECTOR_SYNC_MAX_CHUNKS = int(os.getenv("VECTOR_SYNC_MAX_CHUNKS", "2048"))
+
+# Rows allocated for a new index file; files grow by doubling
+VECTOR_MIN_CAPACITY = 1024
+
+# Rows copied per step when an index file is rewritten
+VECTOR_COPY_BLOCK = 65536
+
+
+class Embedder:
+    """
+    Maps texts to L2-normalized float32 vectors, so cosine similarity is a dot product
+
+    name identifies the vector space: an index built by another embedder
+    (or with another dimension count) is rebuilt, never mixed.
+    """
+
+    name = "base"
+
+    def __init__(self, dimensions: int):
+        self.dimensions = dimensions
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Return a (len(texts), dimensions) float32 array"""
+        raise NotImplementedError
+
+
+class HashingEmbedder(Embedder):
+    """
+    Feature hashing of terms and their character trigrams
+
+    Each feature is hashed (crc32, stable across processes) to a signed
+    bucket with a log-scaled count. Trigrams let related word forms
+    ("invoice", "invoices", "invoicing") land near each other, which plain
+    keyword search misses. No model, no network, no training.
+    """
+
+    name = "hashing"
+
+    # Weight of a trigram relative to the whole term
+    TRIGRAM_WEIGHT = 0.5
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            buckets, weights = [], []
+            for term, count in Counter(tokenize(text)).items():
+                weight = 1 + math.log(count)
+                term_buckets, term_signs = _feature_buckets(term, self.dimensions)
+                buckets.extend(term_buckets)
+                weights.extend(weight * sign for sign in term_signs)
+            if buckets:
+                vectors[row] = np.bincount(buckets, weights=weights, minlength=self.dimensions)
+
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.maximum(norms, 1e-12)
+
+
+@lru_cache(maxsize=100_000)
+def _feature_buckets(term: str, dimensions: int) -> Tuple[Tuple[int, ...], Tuple[float, ...]]:
+    """Signed buckets of a term and its trigrams (cached: vocabularies repeat)"""
+    padded = f"#{term}#"
+    features = [(term, 1.0)] + [(padded[i:i + 3], HashingEmbedder.TRIGRAM_WEIGHT) for i in range(len(padded) - 2)]
+    buckets, signs = [], []
+    for feature, weight in features:
+        digest = zlib.crc32(feature.encode())
+        buckets.append(digest % dimensions)
+        signs.append(weight if digest & 0x80000000 else -weight)
+    return tuple(buckets), tuple(signs)
+
+
+_embedder: Optional[Embedder] = None
+
+
+def get_embedder() -> Optional[Embedder]:
+    """The embedder selected by VECTOR_EMBEDDER, or None if vector search is off"""
+    global _embedder
+    if VECTOR_EMBEDDER == "none":
+        return None
+    if _embedder is None:
+        if VECTOR_EMBEDDER == "hashing":
+            _embedder = HashingEmbedder(VECTOR_DIMENSIONS)
+        elif ":" in VECTOR_EMBEDDER:
+            module, factory = VECTOR_EMBEDDER.split(":", 1)
+            _embedder = getattr(importlib.import_module(module), factory)(VECTOR_DIMENSIONS)
+        else:
+            raise ValueError(f"Unknown VECTOR_EMBEDDER: {VECTOR_EMBEDDER}")
+    return _embedder
+
+
+def top_k(vectors: np.ndarray, ids: np.ndarray, query: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+    """
+    Best rows by cosine similarity to a normalized query, skipping removed rows (id -1)
+
+    Returns:
+        (id, similarity) pairs, best first; rows with no similarity are dropped
+    """
+    k = min(limit, len(ids))
+    if k <= 0:
+        return []
+
+    scores = vectors @ query
+    scores[ids < 0] = -np.inf
+    best = np.argpartition(scores, -k)[-k:]
+    best = best[np.argsort(scores[best])[::-1]]
+    return [(int(ids[i]), float(scores[i])) for i in best if scores[i] > 0]
+
+
+class VectorStore:
+    """
+    A matrix of vectors and their ids in memory-mapped .npy files
+
+    The files (<name>-<generation>.vectors.npy / .ids.npy) are allocated
+    with spare rows, so appends write in place; removed rows are marked
+    with id -1 and reclaimed when the files are rewritten (to grow, or once
+    half the rows are dead). <name>.json names the live generation and row
+    count and is replaced atomically, so a reader sees the old or the new
+    state, never a half-written one. Writers hold lock().
+    """
+
+    def __init__(self, directory: str, name: str, space: str, dimensions: int):
+        self.directory = directory
+        self.name = name
+        self.space = space
+        self.dimensions = dimensions
+        self.meta_path = os.path.join(directory, f"{name}.json")
+
+    @contextmanager
+    def lock(self) -> Iterator[None]:
+        """Exclusive write lock, shared by every process on this host"""
+        os.makedirs(self.directory, exist_ok=True)
+        with open(os.path.join(self.directory, f"{self.name}.lock"), "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            else:
+                lock_file.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(lock_file.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        continue  # LK_LOCK gives up after about 10 seconds; keep waiting
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+                else:
+                    lock_file.seek(0)
+                    msvcrt.locking(lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+
+    def read_meta(self) -> Optional[dict]:
+        """Current state, or None if there is no index for this vector space"""
+        try:
+            with open(self.meta_path) as f:
+                meta = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        if meta.get("space") != self.space or meta.get("dimensions") != self.dimensions:
+            return None
+        return meta
+
+    def _paths(self, generation: int) -> Tuple[str, str]:
+        base = os.path.join(self.directory, f"{self.name}-{generation}")
+        return f"{base}.vectors.npy", f"{base}.ids.npy"
+
+    def _open(self, meta: dict, mode: str) -> Tuple[np.ndarray, np.ndarray]:
+        vectors_path, ids_path = self._paths(meta["generation"])
+        return np.load(vectors_path, mmap_mode=mode), np.load(ids_path, mmap_mode=mode)
+
+    def _commit(self, meta: dict, old_generation: Optional[int] = None):
+        """
+        Publish new state, then delete a replaced generation
+
+        Open maps of the old files keep working. Windows refuses to delete
+        a mapped file; those are left for the next clear().
+        """
+        temp_path = f"{self.meta_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "w") as f:
+            json.dump(meta, f)
+        os.replace(temp_path, self.meta_path)
+
+        if old_generation is not None and old_generation != meta["generation"]:
+            for path in self._paths(old_generation):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def _rewrite(self, meta: dict, extra: int) -> dict:
+        """Copy the live rows into a new generation with room for `extra` more"""
+        capacity = max(VECTOR_MIN_CAPACITY, 2 * (meta["live"] + extra))
+        generation = meta["generation"] + 1
+        vectors_path, ids_path = self._paths(generation)
+        vectors = open_memmap(vectors_path, mode="w+", dtype=np.float32, shape=(capacity, self.dimensions))
+        ids = open_memmap(ids_path, mode="w+", dtype=np.int64, shape=(capacity,))
+        ids[:] = -1
+
+        if meta["size"]:
+            old_vectors, old_ids = self._open(meta, "r")
+            keep = np.flatnonzero(old_ids[:meta["size"]] >= 0)
+            for start in range(0, len(keep), VECTOR_COPY_BLOCK):
+                rows = keep[start:start + VECTOR_COPY_BLOCK]
+                vectors[start:start + len(rows)] = old_vectors[rows]
+                ids[start:start + len(rows)] = old_ids[rows]
+
+        vectors.flush()
+        ids.flush()
+        return {**meta, "generation": generation, "capacity": capacity, "size": meta["live"]}
+
+    def live_ids(self) -> np.ndarray:
+        meta = self.read_meta()
+        if meta is None or not meta["size"]:
+            return np.empty(0, dtype=np.int64)
+        _, ids = self._open(meta, "r")
+        ids = np.asarray(ids[:meta["size"]])
+        return ids[ids >= 0]
+
+    def append(self, ids: np.ndarray, vectors: np.ndarray):
+        """Add rows (hold lock())"""
+        if not len(ids):
+            return
+
+        meta = self.read_meta() or {
+            "space": self.space, "dimensions": self.dimensions,
+            "generation": 0, "capacity": 0, "size": 0, "live": 0, "id_sum": 0,
+        }
+        old_generation = meta["generation"] if meta["capacity"] else None
+        if meta["size"] + len(ids) > meta["capacity"]:
+            meta = self._rewrite(meta, extra=len(ids))
+
+        stored_vectors, stored_ids = self._open(meta, "r+")
+        size = meta["size"]
+        stored_vectors[size:size + len(ids)] = vectors
+        stored_ids[size:size + len(ids)] = ids
+        stored_vectors.flush()
+        stored_ids.flush()
+
+        meta.update(size=size + len(ids), live=meta["live"] + len(ids), id_sum=meta["id_sum"] + int(ids.sum()))
+        self._commit(meta, old_generation)
+
+    def remove(self, ids: np.ndarray):
+        """Drop rows by id (hold lock())"""
+        meta = self.read_meta()
+        if meta is None or not len(ids):
+            return
+
+        stored_vectors, stored_ids = self._open(meta, "r+")
+        rows = np.flatnonzero(np.isin(stored_ids[:meta["size"]], ids))
+        if not len(rows):
+            return
+        removed_sum = int(stored_ids[rows].sum())
+        stored_ids[rows] = -1
+        stored_vectors[rows] = 0
+        stored_vectors.flush()
+        stored_ids.flush()
+
+        meta.update(live=meta["live"] - len(rows), id_sum=meta["id_sum"] - removed_sum)
+        old_generation = meta["generation"]
+        if meta["size"] > VECTOR_MIN_CAPACITY and meta["live"] * 2 < meta["size"]:
+            meta = self._rewrite(meta, extra=0)
+        self._commit(meta, old_generation)
+
+    def search(self, query: np.ndarray, limit: int) -> List[Tuple[int, float]]:
+        for _ in range(2):
+            meta = self.read_meta()
+            if meta is None or not meta["live"]:
+                return []
+            try:
+                vectors, ids = self._open(meta, "r")
+            except FileNotFoundError:
+                continue  # Rewritten between reading the state and opening the files
+            return top_k(vectors[:meta["size"]], ids[:meta["size"]], query, limit)
+        return []
+
+    def clear(self):
+        """Delete the index files of every vector space and generation (hold lock())"""
+        if not os.path.isdir(self.directory):
+            return
+        for entry in os.listdir(self.directory):
+            if entry.startswith(f"{self.name}-") or entry.startswith(f"{self.name}.json"):
+                try:
+                    os.remove(os.path.join(self.directory, entry))
+                except FileNotFoundError:
+                    pass
+
+    def destroy(self):
+        """Delete the index and its lock file"""
+        with self.lock():
+            self.clear()
+        try:
+            os.remove(os.path.join(self.directory, f"{self.name}.lock"))
+        except FileNotFoundError:
+            pass
+
+
+def _user_store(user_id: str, embedder: Embedder) -> VectorStore:
+    # Hashed so any user id makes a safe file name
+    name = hashlib.sha256(user_id.encode()).hexdigest()[:32]
+    return VectorStore(VECTOR_INDEX_DIR, name, space=embedder.name, dimensions=embedder.dimensions)
+
+
+def sync_user_index(session: Session, user_id: str, max_chunks: Optional[int] = None) -> Tuple[int, int]:
+    """
+    Bring a user's vector index in line with the chunks of their documents
+
+    Chunks of new uploads are embedded and appended; chunks of deleted
+    uploads are dropped. Nothing else is re-embedded. Blocking.
+
+    Args:
+        session: Database session
+        user_id: Owner of the index
+        max_chunks: Embed at most this many chunks (oldest first) and leave
+            the rest for a later sync; None embeds all of them
+
+    Returns:
+        (chunks added, chunks removed)
+    """
+    embedder = get_embedder()
+    if embedder is None:
+        return 0, 0
+
+    store = _user_store(user_id, embedder)
+    with store.lock():
+        if store.read_meta() is None:
+            store.clear()  # Leftovers of another embedder or an interrupted build
+
+        current = set(session.exec(user_chunks(user_id)).all())
+        indexed = set(store.live_ids().tolist())
+
+        removed = indexed - current
+        if removed:
+            store.remove(np.fromiter(removed, dtype=np.int64, count=len(removed)))
+
+        added = sorted(current - indexed)
+        if max_chunks is not None:
+            added = added[:max_chunks]
+        for start in range(0, len(added), VECTOR_EMBED_BATCH):
+            rows = session.exec(
+                select(DocumentChunk.id, DocumentChunk.content)
+                .where(DocumentChunk.id.in_(added[start:start + VECTOR_EMBED_BATCH]))
+            ).all()
+            if rows:
+                store.append(
+                    np.array([row.id for row in rows], dtype=np.int64),
+                    embedder.embed([row.content for row in rows]),
+                )
+
+    return len(added), len(removed)
+
+
+def sync_blob_users(content_hash: str):
+    """Update the index of every user with an upload of a blob (e.g. once it is chunked)"""
+    if get_embedder() is None:
+        return
+
+    with Session(engine) as session:
+        user_ids = session.exec(
+            select(FileUpload.user_id).where(FileUpload.content_hash == content_hash).distinct()
+        ).all()
+        for user_id in user_ids:
+            sync_user_index(session, user_id)
+
+
+def search_vectors(session: Session, user_id: str, query: str, limit: int) -> List[Tuple[int, float]]:
+    """
+    Rank the passages of a user's documents by cosine similarity to a query
+
+    The index is synced first if it doesn't hold exactly the user's
+    current chunks (compared by count and id sum, one aggregate query).
+    A sync embeds at most VECTOR_SYNC_MAX_CHUNKS, so a cold index costs
+    one message a bounded delay; until it is complete, chunks not yet
+    embedded are found by keyword search only.
+
+    Returns:
+        (chunk_id, similarity) pairs, best first
+    """
+    embedder = get_embedder()
+    if embedder is None or not query.strip() or limit <= 0:
+        return []
+
+    chunk_ids = user_chunks(user_id).subquery()
+    count, id_sum = session.exec(
+        select(func.count(chunk_ids.c.id), func.coalesce(func.sum(chunk_ids.c.id), 0))
+    ).one()
+    if not count:
+        return []
+
+    store = _user_store(user_id, embedder)
+    meta = store.read_meta()
+    if meta is None or (meta["live"], meta["id_sum"]) != (count, id_sum):
+        sync_user_index(session, user_id, max_chunks=VECTOR_SYNC_MAX_CHUNKS)
+
+    hits = store.search(embedder.embed([query])[0], limit)
+    return [(chunk_id, score) for chunk_id, score in hits if score >= VECTOR_MIN_SIMILARITY]
+
+
+def delete_user_index(user_id: str):
+    """Remove a user's vector index files"""
+    embedder = get_embedder()
+    if embedder is not None:
+        _user_store(user_id, embedder).destroy()
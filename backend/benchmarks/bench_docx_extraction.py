@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+DOCX extraction benchmark: python-docx object model vs streaming iterparse
+
+Generates DOCX files of the requested on-disk sizes (paragraphs, tables and
+a header) and extracts each one in a fresh process with both methods,
+reporting wall time, peak RSS and characters extracted. The python-docx
+path is the previous implementation (paragraphs only, so it reports fewer
+characters: it skips tables and headers).
+
+Usage (from backend/):
+    python benchmarks/bench_docx_extraction.py --sizes 1,10,50
+"""
+
+import argparse
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import time
+import zipfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORDS = (
+    "task project deadline review meeting draft budget report client schedule "
+    "design release backlog estimate priority owner status update summary risk "
+    "invoice contract feature testing deploy migrate archive reminder follow"
+).split()
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/word/document.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>
+<Override PartName="/word/header1.xml" ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.header+xml"/>
+</Types>"""
+
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="word/document.xml"/>
+</Relationships>"""
+
+DOCUMENT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/header" Target="header1.xml"/>
+</Relationships>"""
+
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main" ' \
+    'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships"'
+
+HEADER = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:hdr {W}><w:p><w:r><w:t>TaskFlow benchmark document</w:t></w:r></w:p></w:hdr>"""
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def paragraph(text: str) -> str:
+    return f'<w:p><w:pPr><w:pStyle w:val="Normal"/></w:pPr><w:r><w:rPr><w:sz w:val="22"/></w:rPr><w:t xml:space="preserve">{text}</w:t></w:r></w:p>'
+
+
+def write_docx(path: str, target_mb: float, seed: int = 42):
+    """Write a DOCX whose compressed size is about target_mb"""
+    rng = random.Random(seed)
+    target = int(target_mb * 1024 * 1024)
+
+    with open(path, "wb") as raw, zipfile.ZipFile(raw, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("[Content_Types].xml", CONTENT_TYPES)
+        archive.writestr("_rels/.rels", ROOT_RELS)
+        archive.writestr("word/_rels/document.xml.rels", DOCUMENT_RELS)
+        archive.writestr("word/header1.xml", HEADER)
+
+        with archive.open("word/document.xml", "w") as doc:
+            doc.write(f'<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n<w:document {W}><w:body>'.encode())
+            n = 0
+            while raw.tell() < target:
+                chunk = []
+                for _ in range(200):
+                    n += 1
+                    if n % 50 == 0:
+                        rows = "".join(
+                            "<w:tr>" + "".join(
+                                f"<w:tc>{paragraph(sentence(rng, 3))}</w:tc>" for _ in range(3)
+                            ) + "</w:tr>"
+                            for _ in range(4)
+                        )
+                        chunk.append(f"<w:tbl>{rows}</w:tbl>")
+                    else:
+                        chunk.append(paragraph(sentence(rng, rng.randint(8, 40))))
+                doc.write("".join(chunk).encode())
+            doc.write(b'<w:sectPr><w:headerReference w:type="default" r:id="rId1"/></w:sectPr></w:body></w:document>')
+
+
+def run_python_docx(path: str):
+    import docx
+    doc = docx.Document(path)
+    text = "\n\n".join(p.text for p in doc.paragraphs if p.text.strip())
+    return len(text), None
+
+
+def run_streaming(path: str):
+    from app.file_utils import limit_pages, open_docx_pages, read_document_text
+
+    start = time.perf_counter()
+    _, pages = open_docx_pages(path)
+    preview = "".join(text for _, text in limit_pages(pages, max_chars=2000))
+    pages.close()
+    first = time.perf_counter() - start
+
+    text, _ = read_document_text(path, "docx")
+    return len(text or ""), (first, len(preview))
+
+
+def measure(method: str, path: str, queue):
+    import resource
+    runner = run_python_docx if method == "python-docx" else run_streaming
+    start = time.perf_counter()
+    chars, preview = runner(path)
+    elapsed = time.perf_counter() - start
+    peak_mb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    queue.put((elapsed, peak_mb, chars, preview))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1,10,50", help="Comma-separated DOCX sizes in MB")
+    args = parser.parse_args()
+
+    ctx = multiprocessing.get_context("spawn")
+    scratch = tempfile.mkdtemp(prefix="taskflow-bench-")
+
+    print(f"{'size':>6} {'method':>12} {'time':>9} {'peak RSS':>9} {'chars':>12}  first 2000 chars")
+    for size in (float(s) for s in args.sizes.split(",")):
+        path = os.path.join(scratch, f"bench-{size:g}mb.docx")
+        write_docx(path, size)
+        actual = os.path.getsize(path) / (1024 * 1024)
+
+        for method in ("python-docx", "streaming"):
+            queue = ctx.Queue()
+            process = ctx.Process(target=measure, args=(method, path, queue))
+            process.start()
+            elapsed, peak_mb, chars, preview = queue.get()
+            process.join()
+
+            first = f"{preview[0] * 1000:.1f} ms" if preview else "-"
+            print(f"{actual:5.1f}M {method:>12} {elapsed:8.2f}s {peak_mb:7.0f}MB {chars:12d}  {first}")
+
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
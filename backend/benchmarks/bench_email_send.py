@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Benchmark per-email sends against batched personalization sends
+
+Runs entirely offline against benchmarks/sendgrid_standin.py.
+
+Usage (from backend/):
+    python benchmarks/bench_email_send.py --emails 2000 --latency-ms 80
+"""
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from sendgrid_standin import start_standin
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--emails", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=80, help="Simulated provider latency per request")
+    parser.add_argument("--single-limit", type=int, default=200, help="Cap on emails for the slow per-email run")
+    args = parser.parse_args()
+
+    _, stats, url = start_standin(latency_ms=args.latency_ms)
+
+    os.environ["SENDGRID_API_KEY"] = "benchmark"
+    os.environ["SENDGRID_API_HOST"] = url
+    from app.email_service import EmailService
+
+    service = EmailService()
+    template = service.get_task_reminder_template("due_soon")
+    recipients = [
+        (f"user{i}@example.com", {
+            "-user_name-": f"User {i}",
+            "-task_title-": f"Task {i}",
+            "-task_priority-": "medium",
+            "-priority_color-": "#f59e0b",
+            "-description_html-": "",
+            "-tags_html-": "",
+            "-due_date-": "Not set",
+        })
+        for i in range(args.emails)
+    ]
+
+    # Per-email: one provider call per recipient, as the reminder job used to do
+    single = recipients[:args.single_limit]
+    start = time.perf_counter()
+    for email, subs in single:
+        service.send_email(email, f"⏰ Reminder: {subs['-task_title-']}", template)
+    single_elapsed = time.perf_counter() - start
+
+    # Batched: up to 1000 personalizations per provider call
+    start = time.perf_counter()
+    accepted = service.send_batch("⏰ Reminder: -task_title-", template, recipients)
+    batch_elapsed = time.perf_counter() - start
+
+    print()
+    print(f"{'mode':<10} {'emails':>8} {'seconds':>9} {'emails/s':>10}")
+    print(f"{'single':<10} {len(single):>8} {single_elapsed:>9.2f} {len(single) / single_elapsed:>10.1f}")
+    print(f"{'batched':<10} {accepted:>8} {batch_elapsed:>9.2f} {accepted / batch_elapsed:>10.1f}")
+    print(f"stand-in received: {stats.snapshot()}")
+
+
+if __name__ == "__main__":
+    main()
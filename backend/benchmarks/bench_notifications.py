@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+End-to-end reminder and digest throughput benchmark
+
+Seeds a scratch database with users and tasks, then runs the real
+reminder sweep and daily digest through a local email transport
+(memory, mbox, maildir or smtp), with no network access.
+
+Usage (from backend/):
+    python benchmarks/bench_notifications.py --users 5000 --tasks-per-user 20
+    python benchmarks/bench_notifications.py --transport mbox --sink /tmp/outbox.mbox
+    DATABASE_URL=postgresql://... python benchmarks/bench_notifications.py
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--tasks-per-user", type=int, default=20)
+    parser.add_argument("--transport", default="memory", choices=["memory", "mbox", "maildir", "smtp"])
+    parser.add_argument("--sink", default=None, help="mbox file / Maildir directory for file sinks")
+    args = parser.parse_args()
+
+    scratch = tempfile.mkdtemp(prefix="taskflow-bench-")
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(scratch, 'bench.db')}")
+    os.environ["EMAIL_TRANSPORT"] = args.transport
+    if args.sink:
+        os.environ["EMAIL_SINK_PATH"] = args.sink
+    elif args.transport in ("mbox", "maildir"):
+        os.environ["EMAIL_SINK_PATH"] = os.path.join(scratch, "outbox.mbox" if args.transport == "mbox" else "outbox")
+
+    from sqlmodel import Session, SQLModel
+    from app.database import engine
+    from app.email_service import EmailService
+    from app.models.task import Task
+    from app.models.user import User
+    from app.reminders import sync_task_reminders
+
+    engine.echo = False
+    SQLModel.metadata.create_all(engine)
+
+    # Seed
+    start = time.perf_counter()
+    now = datetime.utcnow()
+    run_id = int(time.time())
+    with Session(engine) as session:
+        for u in range(args.users):
+            user_id = f"bench-{run_id}-{u:07d}"
+            session.add(User(id=user_id, email=f"{user_id}@example.com", name=f"User {u}", hashed_password="x"))
+            for t in range(args.tasks_per_user):
+                offset = timedelta(minutes=random.randint(-600, 600))
+                task = Task(
+                    user_id=user_id,
+                    title=f"Task {t}",
+                    description="Benchmark task" if t % 2 else None,
+                    priority=random.choice(["high", "medium", "low"]),
+                    completed=t % 5 == 0,
+                    due_date=now + offset,
+                    reminder_date=now + offset if t % 3 == 0 else None,
+                )
+                session.add(task)
+                session.flush()
+                sync_task_reminders(session, task)
+            if u % 500 == 499:
+                session.commit()
+        session.commit()
+    print(f"Seeded {args.users} users x {args.tasks_per_user} tasks in {time.perf_counter() - start:.1f}s")
+
+    service = EmailService()
+
+    with Session(engine) as session:
+        start = time.perf_counter()
+        service.check_and_send_reminders(session)
+        reminder_elapsed = time.perf_counter() - start
+    reminder_stats = service.transport.stats.snapshot()
+
+    with Session(engine) as session:
+        start = time.perf_counter()
+        summary = service.send_daily_digests(session)
+        digest_elapsed = time.perf_counter() - start
+    total_stats = service.transport.stats.snapshot()
+
+    print()
+    print(f"transport: {service.transport.name}")
+    print(f"reminders: {reminder_stats['items']} emails in {reminder_elapsed:.2f}s "
+          f"({reminder_stats['items'] / reminder_elapsed:.0f} emails/s)")
+    digest_emails = total_stats["items"] - reminder_stats["items"]
+    print(f"digest:    {digest_emails} emails for {summary['users']} users in {digest_elapsed:.2f}s "
+          f"({digest_emails / digest_elapsed:.0f} emails/s)")
+    print(f"send latency: {total_stats}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+PDF extraction latency benchmark
+
+Generates a text-heavy PDF and compares full extraction with page-incremental
+extraction: time to the first page, time to a 2000-character preview (the
+chat context budget) and time for the whole document.
+
+Usage (from backend/):
+    python benchmarks/bench_pdf_extraction.py --pages 500
+    python benchmarks/bench_pdf_extraction.py --pdf /path/to/real.pdf
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LINES_PER_PAGE = 45
+LINE = "The quick brown fox jumps over the lazy dog while the task list grows longer. "
+
+
+def write_pdf(path: str, pages: int):
+    """Write a minimal uncompressed PDF with LINES_PER_PAGE lines of Helvetica per page"""
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        None,  # page tree, filled in below
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    ]
+    kids = []
+    for page in range(pages):
+        lines = [f"({LINE} Page {page + 1} line {n + 1}) Tj T*" for n in range(LINES_PER_PAGE)]
+        stream = ("BT /F1 9 Tf 11 TL 36 800 Td " + " ".join(lines) + " ET").encode()
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id
+        )
+        kids.append(len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        b" ".join(b"%d 0 R" % k for k in kids), pages
+    )
+
+    with open(path, "wb") as out:
+        out.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(out.tell())
+            out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+        xref = out.tell()
+        out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            out.write(b"%010d 00000 n \n" % offset)
+        out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def timed(fn):
+    start = time.perf_counter()
+    value = fn()
+    return time.perf_counter() - start, value
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--pdf", default=None, help="Benchmark an existing PDF instead of a generated one")
+    args = parser.parse_args()
+
+    from app.file_utils import limit_pages, open_pdf_pages, read_document_text
+
+    path = args.pdf
+    if not path:
+        path = os.path.join(tempfile.mkdtemp(prefix="taskflow-bench-"), "bench.pdf")
+        write_pdf(path, args.pages)
+    print(f"{path}: {os.path.getsize(path) / (1024 * 1024):.1f}MB")
+
+    def first_page():
+        page_count, pages = open_pdf_pages(path)
+        page_number, text = next(pages)
+        pages.close()
+        return page_count, len(text)
+
+    def preview():
+        _, pages = open_pdf_pages(path)
+        text = "".join(t for _, t in limit_pages(pages, max_chars=2000))
+        pages.close()
+        return len(text)
+
+    full_seconds, (full_text, page_count) = timed(lambda: read_document_text(path, "pdf"))
+    first_seconds, (total_pages, first_chars) = timed(first_page)
+    preview_seconds, preview_chars = timed(preview)
+
+    print(f"pages: {total_pages}, text: {len(full_text or '')} chars")
+    print(f"full document:     {full_seconds * 1000:9.1f} ms ({page_count / full_seconds:.0f} pages/s)")
+    print(f"first page:        {first_seconds * 1000:9.1f} ms ({first_chars} chars)")
+    print(f"2000-char preview: {preview_seconds * 1000:9.1f} ms ({preview_chars} chars)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Vector search latency benchmark
+
+Fills a VectorStore (the memory-mapped per-user index behind chat
+retrieval) with synthetic chunk vectors and times top-k queries: embedding
+the query, the brute-force cosine scan, and both together. Also reports
+the time to append a batch of chunks and the index size on disk.
+
+Vectors are random unit vectors; latency depends only on the row count
+and dimensions, not on what the vectors mean.
+
+Usage (from backend/):
+    python benchmarks/bench_vector_search.py
+    python benchmarks/bench_vector_search.py --sizes 10000 100000 --dimensions 384
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Appended per batch while filling, like a large document being indexed
+FILL_BATCH = 100_000
+
+QUERY = "When is the quarterly budget review for the marketing project due?"
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=50)
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp(prefix="taskflow-bench-vectors-")
+    # app.vector_index imports the database module, which needs a URL; nothing is stored there
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(directory, 'bench.db')}")
+    os.environ.setdefault("UPLOAD_DIR", directory)
+
+    import numpy as np
+
+    from app.vector_index import HashingEmbedder, VectorStore
+
+    embedder = HashingEmbedder(args.dimensions)
+    rng = np.random.default_rng(0)
+
+    embed_times = []
+    for _ in range(args.queries):
+        start = time.perf_counter()
+        query = embedder.embed([QUERY])[0]
+        embed_times.append(time.perf_counter() - start)
+    print(f"query embedding: p50 {statistics.median(embed_times) * 1000:.3f} ms ({args.dimensions} dims)")
+    print()
+    print(f"{'chunks':>10} {'disk MB':>8} {'append/s':>10} {'scan p50':>10} {'scan p95':>10} {'query p50':>10}")
+
+    try:
+        for size in args.sizes:
+            store = VectorStore(directory, f"bench-{size}", space=embedder.name, dimensions=args.dimensions)
+            append_seconds = 0.0
+            with store.lock():
+                for start in range(0, size, FILL_BATCH):
+                    count = min(FILL_BATCH, size - start)
+                    vectors = rng.standard_normal((count, args.dimensions), dtype=np.float32)
+                    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+                    ids = np.arange(start, start + count, dtype=np.int64)
+                    began = time.perf_counter()
+                    store.append(ids, vectors)
+                    append_seconds += time.perf_counter() - began
+
+            disk = sum(
+                os.path.getsize(os.path.join(directory, name))
+                for name in os.listdir(directory) if name.startswith(f"bench-{size}")
+            )
+
+            scan_times, query_times = [], []
+            store.search(query, args.top_k)  # Fault the pages in once
+            for _ in range(args.queries):
+                start = time.perf_counter()
+                store.search(query, args.top_k)
+                scan_times.append(time.perf_counter() - start)
+
+                start = time.perf_counter()
+                store.search(embedder.embed([QUERY])[0], args.top_k)
+                query_times.append(time.perf_counter() - start)
+
+            print(
+                f"{size:>10} {disk / (1024 * 1024):>8.0f} {size / append_seconds:>10.0f} "
+                f"{percentile(scan_times, 0.5) * 1000:>8.2f}ms {percentile(scan_times, 0.95) * 1000:>8.2f}ms "
+                f"{percentile(query_times, 0.5) * 1000:>8.2f}ms"
+            )
+            store.destroy()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
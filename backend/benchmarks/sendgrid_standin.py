@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Local SendGrid stand-in for offline testing and benchmarking
+
+Accepts POST /v3/mail/send like the real API (202, empty body), validates
+the personalization limits and counts what it receives. GET /stats returns
+the counters; DELETE /stats resets them.
+
+Usage:
+    python benchmarks/sendgrid_standin.py --port 8025 --latency-ms 80
+    SENDGRID_API_KEY=test SENDGRID_API_HOST=http://127.0.0.1:8025 uvicorn app.main:app
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MAX_PERSONALIZATIONS = 1000
+
+
+class StandinStats:
+    """Thread-safe counters for received requests"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self.lock:
+            self.requests = 0
+            self.emails = 0
+            self.rejected = 0
+
+    def record(self, emails: int):
+        with self.lock:
+            self.requests += 1
+            self.emails += emails
+
+    def snapshot(self) -> dict:
+        with self.lock:
+            return {"requests": self.requests, "emails": self.emails, "rejected": self.rejected}
+
+
+def make_handler(stats: StandinStats, latency: float):
+    class SendGridHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _reply(self, code: int, body: bytes = b"", content_type: str = "application/json"):
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _error(self, code: int, message: str):
+            with stats.lock:
+                stats.rejected += 1
+            self._reply(code, json.dumps({"errors": [{"message": message}]}).encode())
+
+        def do_POST(self):
+            if self.path != "/v3/mail/send":
+                return self._error(404, "not found")
+
+            if not self.headers.get("Authorization", "").startswith("Bearer "):
+                return self._error(401, "missing bearer token")
+
+            length = int(self.headers.get("Content-Length", "0"))
+            try:
+                body = json.loads(self.rfile.read(length))
+            except ValueError:
+                return self._error(400, "invalid JSON")
+
+            personalizations = body.get("personalizations") or []
+            if not personalizations or len(personalizations) > MAX_PERSONALIZATIONS:
+                return self._error(400, f"personalizations must contain 1-{MAX_PERSONALIZATIONS} items")
+            if not body.get("from") or not body.get("content"):
+                return self._error(400, "from and content are required")
+
+            if latency:
+                time.sleep(latency)
+
+            stats.record(sum(len(p.get("to", [])) for p in personalizations))
+            self._reply(202)
+
+        def do_GET(self):
+            if self.path != "/stats":
+                return self._error(404, "not found")
+            self._reply(200, json.dumps(stats.snapshot()).encode())
+
+        def do_DELETE(self):
+            if self.path != "/stats":
+                return self._error(404, "not found")
+            stats.reset()
+            self._reply(204)
+
+        def log_message(self, format, *args):
+            pass
+
+    return SendGridHandler
+
+
+def start_standin(host: str = "127.0.0.1", port: int = 0, latency_ms: float = 0) -> tuple:
+    """Start the stand-in on a background thread; returns (server, stats, base_url)"""
+    stats = StandinStats()
+    server = ThreadingHTTPServer((host, port), make_handler(stats, latency_ms / 1000))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, stats, f"http://{host}:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SendGrid v3 mail/send stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8025)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Simulated provider latency per request")
+    args = parser.parse_args()
+
+    server, _, url = start_standin(args.host, args.port, args.latency_ms)
+    print(f"SendGrid stand-in listening on {url} (latency {args.latency_ms}ms)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Shared test setup
+Points the app at a scratch SQLite database and upload directory before
+any app module is imported, and gives each test empty tables.
+"""
+
+import os
+import sys
+import tempfile
+
+import pytest
+
+_scratch = tempfile.mkdtemp(prefix="taskflow-tests-")
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_scratch, 'test.db')}"
+os.environ["UPLOAD_DIR"] = os.path.join(_scratch, "uploads")
+os.environ["EMAIL_TRANSPORT"] = "memory"
+os.environ.setdefault("BETTER_AUTH_SECRET", "test-secret-for-the-test-suite-only")
+os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlmodel import Session, SQLModel  # noqa: E402
+
+from app.database import engine  # noqa: E402
+
+engine.echo = False
+
+
+@pytest.fixture
+def session():
+    """A session on freshly created, empty tables"""
+    SQLModel.metadata.drop_all(engine)
+    SQLModel.metadata.create_all(engine)
+    with Session(engine) as session:
+        yield session
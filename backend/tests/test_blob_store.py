@@ -0,0 +1,92 @@
+"""Content-addressed blobs: reference counting and garbage collection"""
+
+import hashlib
+
+from sqlmodel import select
+
+from app.blob_store import acquire_blob, collect_unreferenced_blobs, release_blob
+from app.models.file import FileBlob, FilePage
+from app.storage import get_storage
+
+
+def _temp_upload(tmp_path, name: str, content: bytes):
+    path = tmp_path / name
+    path.write_bytes(content)
+    return str(path), hashlib.sha256(content).hexdigest(), len(content)
+
+
+def test_identical_uploads_share_one_blob(session, tmp_path):
+    first, content_hash, size = _temp_upload(tmp_path, "a.pdf", b"%PDF same bytes")
+    second, _, _ = _temp_upload(tmp_path, "b.pdf", b"%PDF same bytes")
+
+    blob, created = acquire_blob(session, first, content_hash, size, "pdf")
+    session.commit()
+    again, created_again = acquire_blob(session, second, content_hash, size, "pdf")
+    session.commit()
+
+    assert created and not created_again
+    assert again.ref_count == 2
+    assert not (tmp_path / "a.pdf").exists() and not (tmp_path / "b.pdf").exists()
+    assert get_storage(blob.storage_backend).exists(blob.storage_key)
+
+
+def test_blob_is_collected_only_after_the_last_reference(session, tmp_path):
+    path, content_hash, size = _temp_upload(tmp_path, "a.pdf", b"%PDF shared")
+    blob, _ = acquire_blob(session, path, content_hash, size, "pdf")
+    acquire_blob(session, _temp_upload(tmp_path, "b.pdf", b"%PDF shared")[0], content_hash, size, "pdf")
+    blob.extraction_status = "done"
+    session.add(FilePage(content_hash=content_hash, page_number=0, content="text"))
+    session.commit()
+    key = blob.storage_key
+
+    release_blob(session, content_hash)
+    session.commit()
+    assert collect_unreferenced_blobs() == 0
+
+    release_blob(session, content_hash)
+    session.commit()
+    assert collect_unreferenced_blobs() == 1
+
+    session.expire_all()
+    assert session.get(FileBlob, content_hash) is None
+    assert session.exec(select(FilePage)).all() == []
+    assert not get_storage().exists(key)
+
+
+def test_release_never_goes_below_zero(session, tmp_path):
+    path, content_hash, size = _temp_upload(tmp_path, "a.pdf", b"%PDF once")
+    acquire_blob(session, path, content_hash, size, "pdf")
+    session.commit()
+
+    release_blob(session, content_hash)
+    release_blob(session, content_hash)
+    session.commit()
+
+    session.expire_all()
+    assert session.get(FileBlob, content_hash).ref_count == 0
+
+
+def test_blobs_being_extracted_are_not_collected(session, tmp_path):
+    path, content_hash, size = _temp_upload(tmp_path, "a.pdf", b"%PDF busy")
+    blob, _ = acquire_blob(session, path, content_hash, size, "pdf")
+    blob.extraction_status = "processing"
+    session.commit()
+
+    release_blob(session, content_hash)
+    session.commit()
+
+    assert collect_unreferenced_blobs() == 0
+
+
+def test_reacquiring_an_unreferenced_blob_reuses_it(session, tmp_path):
+    path, content_hash, size = _temp_upload(tmp_path, "a.pdf", b"%PDF back again")
+    acquire_blob(session, path, content_hash, size, "pdf")
+    session.commit()
+    release_blob(session, content_hash)
+    session.commit()
+
+    blob, created = acquire_blob(session, _temp_upload(tmp_path, "b.pdf", b"%PDF back again")[0], content_hash, size, "pdf")
+    session.commit()
+
+    assert not created and blob.ref_count == 1
+    assert collect_unreferenced_blobs() == 0
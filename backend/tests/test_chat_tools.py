@@ -0,0 +1,152 @@
+"""Chat tool execution: list_tasks filters and tool rounds"""
+
+import json
+
+import anyio
+import pytest
+from sqlmodel import select
+
+from app.models.task import Task
+from app.models.user import User
+from app.routers.chat import _run_tools, execute_tool
+
+
+@pytest.fixture
+def user(session):
+    session.add(User(id="u1", email="u1@example.com", name="U1", hashed_password="x"))
+    session.commit()
+    return "u1"
+
+
+def _call(call_id: str, name: str, **arguments) -> dict:
+    return {"id": call_id, "name": name, "arguments": json.dumps(arguments)}
+
+
+def _add_tasks(session, user_id: str, *tasks: dict):
+    for fields in tasks:
+        session.add(Task(user_id=user_id, **fields))
+    session.commit()
+
+
+def _list(session, user_id: str, **arguments) -> list:
+    """Titles in a list_tasks result table, in order"""
+    result = execute_tool(session, user_id, "list_tasks", arguments)
+    assert result["success"]
+    return [line.split(" | ")[1] for line in result["tasks"].splitlines()[1:]]
+
+
+def test_list_tasks_filters_status_and_priority(session, user):
+    _add_tasks(
+        session, user,
+        {"title": "Open high", "priority": "high"},
+        {"title": "Open low", "priority": "low"},
+        {"title": "Done high", "priority": "high", "completed": True},
+    )
+
+    assert sorted(_list(session, user, status="active")) == ["Open high", "Open low"]
+    assert _list(session, user, status="completed") == ["Done high"]
+    assert sorted(_list(session, user, priority="HIGH")) == ["Done high", "Open high"]
+    assert len(_list(session, user)) == 3
+
+
+def test_list_tasks_search_takes_wildcards_literally(session, user):
+    _add_tasks(
+        session, user,
+        {"title": "Raise prices 10%"},
+        {"title": "Raise prices 100 units"},
+        {"title": "Rename file_a"},
+        {"title": "Rename fileXa", "description": "not the underscore one"},
+        {"title": "Back up C:\\data"},
+    )
+
+    assert _list(session, user, search="10%") == ["Raise prices 10%"]
+    assert _list(session, user, search="FILE_A") == ["Rename file_a"]
+    assert _list(session, user, search="underscore") == ["Rename fileXa"]
+    assert _list(session, user, search="c:\\data") == ["Back up C:\\data"]
+
+
+def test_list_tasks_matches_whole_tags(session, user):
+    _add_tasks(
+        session, user,
+        {"title": "Pastry", "tags": ["café", "Work"]},
+        {"title": "Coffee", "tags": ["cafe"]},
+        {"title": "Underscore", "tags": ["a_b"]},
+        {"title": "Lookalike", "tags": ["axb"]},
+        {"title": "Longer", "tags": ["workshop"]},
+    )
+
+    assert _list(session, user, tags=["café"]) == ["Pastry"]
+    assert _list(session, user, tags=["cafe"]) == ["Coffee"]
+    assert _list(session, user, tags=["a_b"]) == ["Underscore"]
+    assert _list(session, user, tags=["work"]) == ["Pastry"]
+    assert _list(session, user, tags=["café", "work"]) == ["Pastry"]
+    assert _list(session, user, tags=["café", "cafe"]) == []
+
+
+def test_list_tasks_is_limited_and_scoped_to_the_user(session, user):
+    session.add(User(id="u2", email="u2@example.com", name="U2", hashed_password="x"))
+    _add_tasks(session, user, *({"title": f"Task {i}"} for i in range(5)))
+    _add_tasks(session, "u2", {"title": "Someone else's"})
+
+    result = execute_tool(session, user, "list_tasks", {"limit": 2})
+
+    assert (result["total"], result["count"]) == (5, 2)
+    assert "Showing 2 of 5" in result["message"]
+    assert "Someone else's" not in result["tasks"]
+
+
+def test_reads_see_writes_from_the_same_round(session, user):
+    for _ in range(20):
+        records = anyio.run(
+            _run_tools,
+            user,
+            [_call("1", "list_tasks"), _call("2", "create_task", title="Call the bank")],
+            1,
+        )
+
+        assert [record["id"] for record in records] == ["1", "2"]
+        assert records[1]["result"]["success"]
+        assert "Call the bank" in records[0]["result"]["tasks"]
+
+        session.exec(Task.__table__.delete())
+        session.commit()
+
+
+def test_stream_done_response_includes_text_from_every_round(session, user, monkeypatch):
+    from app.models.conversation import Conversation, Message
+    from app.routers import chat
+
+    conversation = Conversation(user_id=user, title="t")
+    session.add(conversation)
+    session.commit()
+
+    rounds = iter([
+        (["Let me ", "check."], {0: {"id": "c1", "name": "list_tasks", "arguments": "{}"}}),
+        (["You have ", "no tasks."], {}),
+    ])
+
+    async def fake_stream(messages, tool_calls, tools=True):
+        tokens, calls = next(rounds)
+        tool_calls.update(calls)
+        for token in tokens:
+            yield token
+
+    monkeypatch.setattr(chat, "_stream_completion", fake_stream)
+    monkeypatch.setattr(chat, "schedule_summary", lambda *args: None)
+
+    async def collect():
+        return [event async for event in chat._chat_events(user, conversation.id, [])]
+
+    events = [
+        (lines[0][len("event: "):], json.loads(lines[1][len("data: "):]))
+        for lines in (event.strip().split("\n") for event in anyio.run(collect))
+    ]
+
+    streamed = "".join(data["content"] for name, data in events if name == "token")
+    done = [data for name, data in events if name == "done"][0]
+    assert streamed == "Let me check.\n\nYou have no tasks."
+    assert done["response"] == streamed
+    assert done["tool_calls"][0]["name"] == "list_tasks"
+
+    stored = session.exec(select(Message).where(Message.conversation_id == conversation.id)).all()
+    assert [message.content for message in stored] == [streamed]
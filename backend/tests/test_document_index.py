@@ -0,0 +1,93 @@
+"""Retrieval index: incremental indexing, BM25 ranking and rank fusion"""
+
+from sqlmodel import select
+
+from app.document_index import fuse_rankings, index_blob, rank_chunks, search_chunks
+from app.models.file import DocumentChunk, FileBlob, FilePage, FileUpload
+from app.models.user import User
+
+
+def _add_document(session, user_id: str, name: str, pages):
+    """A blob with extracted pages, uploaded by user_id"""
+    content_hash = name.ljust(64, "0")
+    session.add(FileBlob(
+        content_hash=content_hash, size=1, file_type="pdf", storage_key=content_hash,
+        extraction_status="done", pages_extracted=len(pages),
+    ))
+    for number, content in enumerate(pages):
+        session.add(FilePage(content_hash=content_hash, page_number=number, content=content))
+    session.add(FileUpload(
+        user_id=user_id, filename=name, original_filename=f"{name}.pdf", file_path=content_hash,
+        file_size=1, file_type="pdf", content_hash=content_hash,
+    ))
+    session.commit()
+    index_blob(content_hash)
+    return content_hash
+
+
+def _users(session, *user_ids):
+    for user_id in user_ids:
+        session.add(User(id=user_id, email=f"{user_id}@example.com", name=user_id, hashed_password="x"))
+    session.commit()
+
+
+def test_indexing_is_incremental(session):
+    _users(session, "u1")
+    content_hash = _add_document(session, "u1", "notes", ["first page about budgets"])
+    assert index_blob(content_hash) == 0
+
+    blob = session.get(FileBlob, content_hash)
+    session.add(FilePage(content_hash=content_hash, page_number=1, content="second page about hiring"))
+    blob.pages_extracted = 2
+    session.add(blob)
+    session.commit()
+
+    assert index_blob(content_hash) == 1
+    pages = session.exec(select(DocumentChunk.page_number).where(DocumentChunk.content_hash == content_hash)).all()
+    assert sorted(pages) == [0, 1]
+
+
+def test_rare_terms_and_repeated_terms_rank_higher(session):
+    _users(session, "u1")
+    _add_document(session, "u1", "a", ["project meeting notes"])
+    _add_document(session, "u1", "b", ["project meeting notes about the migration"])
+    _add_document(session, "u1", "c", ["project migration migration migration plan"])
+    _add_document(session, "u1", "d", ["project kickoff"])
+
+    hits = search_chunks(session, "u1", "project migration", limit=4)
+
+    # "project" is in every passage and barely counts; then shorter passages win
+    assert [hit.filename for hit in hits] == ["c.pdf", "b.pdf", "d.pdf", "a.pdf"]
+    assert hits[1].score > 2 * hits[2].score
+
+
+def test_ranking_only_sees_the_users_own_documents(session):
+    _users(session, "u1", "u2")
+    _add_document(session, "u1", "mine", ["quarterly budget review"])
+    _add_document(session, "u2", "theirs", ["confidential budget figures"])
+
+    assert [hit.filename for hit in search_chunks(session, "u1", "budget")] == ["mine.pdf"]
+    assert rank_chunks(session, "u1", "confidential") == []
+
+
+def test_query_of_only_stopwords_matches_nothing(session):
+    _users(session, "u1")
+    _add_document(session, "u1", "a", ["the and of"])
+
+    assert rank_chunks(session, "u1", "what is the") == []
+
+
+def test_fusion_favours_chunks_ranked_by_both_retrievers():
+    keyword = [(1, 12.0), (2, 9.5), (3, 1.0)]
+    semantic = [(4, 0.99), (3, 0.98), (2, 0.50)]
+
+    fused = dict(fuse_rankings(keyword, semantic, limit=4))
+
+    assert fused[1] == fused[4] < fused[3]
+    assert list(dict(fuse_rankings(keyword, semantic, limit=2))) == [2, 3]
+
+
+def test_fusion_ignores_score_scales():
+    fused = fuse_rankings([(1, 1000.0), (2, 999.0)], [(2, 0.2), (1, 0.1)], limit=2)
+
+    assert fused[0][1] == fused[1][1]
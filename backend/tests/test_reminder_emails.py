@@ -0,0 +1,103 @@
+"""Reminder sweep: one coalesced email per user, nothing sent early, failures retried"""
+
+from datetime import datetime, timedelta
+from functools import partial
+
+import pytest
+from sqlmodel import select
+
+from app import email_service as email_module
+from app.email_service import EmailService
+from app.email_transports import MemoryTransport
+from app.models.reminder import TaskReminder
+from app.models.task import Task
+from app.models.user import User
+from app.reminders import sync_task_reminders
+
+
+@pytest.fixture
+def service():
+    return EmailService(transport=MemoryTransport())
+
+
+def _add_task(session, user_id: str, title: str, due_in: timedelta) -> Task:
+    """A task with a "due" reminder; a past one is given a custom reminder then, which still fires"""
+    due_date = datetime.utcnow() + due_in
+    task = Task(
+        user_id=user_id,
+        title=title,
+        due_date=due_date,
+        reminder_offsets=["due"],
+        reminder_date=due_date if due_in < timedelta(0) else None,
+    )
+    session.add(task)
+    session.flush()
+    sync_task_reminders(session, task)
+    session.commit()
+    return task
+
+
+@pytest.fixture
+def users(session):
+    for user_id in ("u1", "u2"):
+        session.add(User(id=user_id, email=f"{user_id}@example.com", name=user_id.upper(), hashed_password="x"))
+    session.commit()
+
+
+def _sent_to(service, email: str):
+    return [message for message in service.transport.messages if message.to_email == email]
+
+
+def test_reminders_within_the_window_share_one_email(session, users, service):
+    _add_task(session, "u1", "Pay rent", -timedelta(minutes=1))
+    _add_task(session, "u1", "Call plumber", timedelta(minutes=11))
+    _add_task(session, "u1", "Book flights", timedelta(hours=3))
+
+    service.check_and_send_reminders(session)
+
+    emails = _sent_to(service, "u1@example.com")
+    assert len(emails) == 1
+    assert "Pay rent" in emails[0].html_content
+    assert "Call plumber" in emails[0].html_content
+    assert "Book flights" not in emails[0].html_content
+
+    service.check_and_send_reminders(session)
+    assert len(_sent_to(service, "u1@example.com")) == 1
+
+
+def test_nothing_is_sent_early_without_a_due_reminder(session, users, service):
+    task = _add_task(session, "u2", "Water plants", timedelta(minutes=30))
+
+    service.check_and_send_reminders(session)
+
+    assert service.transport.messages == []
+    assert session.exec(select(TaskReminder.sent_at).where(TaskReminder.task_id == task.id)).one() is None
+
+
+def test_one_email_per_user_across_claim_batches(session, users, service, monkeypatch):
+    monkeypatch.setattr(email_module, "claim_due_reminders", partial(email_module.claim_due_reminders, limit=1))
+    monkeypatch.setattr(email_module, "REMINDER_CLAIM_BATCH_SIZE", 1)
+    for title in ("A", "B", "C"):
+        _add_task(session, "u1", f"Task {title}", -timedelta(minutes=1))
+    _add_task(session, "u2", "Task D", -timedelta(minutes=1))
+
+    service.check_and_send_reminders(session)
+
+    assert len(_sent_to(service, "u1@example.com")) == 1
+    assert len(_sent_to(service, "u2@example.com")) == 1
+
+
+def test_failed_emails_are_released_for_the_next_sweep(session, users, service, monkeypatch):
+    _add_task(session, "u1", "Renew passport", -timedelta(minutes=1))
+    deliver = service.transport._send
+
+    def fail(message):
+        raise RuntimeError("transport down")
+
+    monkeypatch.setattr(service.transport, "_send", fail)
+    service.check_and_send_reminders(session)
+    assert session.exec(select(TaskReminder.sent_at).where(TaskReminder.kind == "custom")).one() is None
+
+    monkeypatch.setattr(service.transport, "_send", deliver)
+    service.check_and_send_reminders(session)
+    assert len(_sent_to(service, "u1@example.com")) == 1
@@ -0,0 +1,116 @@
+"""Reminder scheduling: task_reminders sync, claiming and releasing"""
+
+from datetime import datetime, timedelta
+
+import pytest
+from sqlmodel import select
+
+from app.models.reminder import TaskReminder
+from app.models.task import Task
+from app.models.user import User
+from app.reminders import (
+    REMINDER_OVERDUE_AFTER_MINUTES,
+    claim_due_reminders,
+    parse_offset,
+    release_reminders,
+    sync_task_reminders,
+)
+
+
+@pytest.fixture
+def task(session):
+    session.add(User(id="u1", email="u1@example.com", name="U1", hashed_password="x"))
+    task = Task(user_id="u1", title="Report", due_date=datetime.utcnow() + timedelta(days=2), reminder_offsets=["1d", "due"])
+    session.add(task)
+    session.flush()
+    sync_task_reminders(session, task)
+    session.commit()
+    return task
+
+
+def _rows(session, task):
+    return {
+        row.kind: row
+        for row in session.exec(select(TaskReminder).where(TaskReminder.task_id == task.id)).all()
+    }
+
+
+def test_parse_offset():
+    assert parse_offset("1d") == ("before_1d", timedelta(days=1))
+    assert parse_offset(" 30M ") == ("before_30m", timedelta(minutes=30))
+    assert parse_offset("overdue") == ("overdue", None)
+    with pytest.raises(ValueError):
+        parse_offset("soon")
+
+
+def test_sync_creates_a_row_per_offset(session, task):
+    rows = _rows(session, task)
+
+    assert set(rows) == {"before_1d", "due"}
+    assert rows["due"].fire_at == task.due_date
+    assert rows["before_1d"].fire_at == task.due_date - timedelta(days=1)
+
+
+def test_sync_moves_rows_when_the_due_date_changes(session, task):
+    task.due_date += timedelta(hours=3)
+    sync_task_reminders(session, task)
+    session.commit()
+
+    assert _rows(session, task)["due"].fire_at == task.due_date
+
+
+def test_sync_skips_past_offsets_but_keeps_past_custom_reminders(session, task):
+    task.due_date = datetime.utcnow() + timedelta(hours=2)
+    task.reminder_date = datetime.utcnow() - timedelta(minutes=5)
+    sync_task_reminders(session, task)
+    session.commit()
+
+    rows = _rows(session, task)
+    assert "before_1d" not in rows
+    assert {"due", "custom", "overdue"} <= set(rows)
+    assert rows["overdue"].fire_at == task.due_date + timedelta(minutes=REMINDER_OVERDUE_AFTER_MINUTES)
+
+
+def test_completing_and_reopening_never_resends(session, task):
+    task.reminder_date = datetime.utcnow() - timedelta(minutes=5)
+    sync_task_reminders(session, task)
+    session.commit()
+
+    claimed = claim_due_reminders(session, datetime.utcnow())
+    session.commit()
+    assert [reminder.kind for reminder in claimed] == ["custom"]
+
+    task.completed = True
+    sync_task_reminders(session, task)
+    session.commit()
+    task.completed = False
+    sync_task_reminders(session, task)
+    session.commit()
+
+    assert _rows(session, task)["custom"].sent_at is not None
+    assert claim_due_reminders(session, datetime.utcnow()) == []
+
+
+def test_claim_takes_only_due_rows_once(session, task):
+    now = datetime.utcnow()
+
+    assert claim_due_reminders(session, now) == []
+
+    later = task.due_date + timedelta(minutes=1)
+    first = claim_due_reminders(session, later)
+    session.commit()
+    second = claim_due_reminders(session, later)
+
+    assert sorted(reminder.kind for reminder in first) == ["before_1d", "due"]
+    assert second == []
+
+
+def test_released_rows_are_claimed_again(session, task):
+    later = task.due_date + timedelta(minutes=1)
+    claimed = claim_due_reminders(session, later)
+    session.commit()
+
+    release_reminders(session, [reminder.id for reminder in claimed if reminder.kind == "due"])
+    session.commit()
+
+    assert [reminder.kind for reminder in claim_due_reminders(session, later)] == ["due"]
@@ -0,0 +1,126 @@
+"""Resumable (tus-style) uploads: offsets, resuming and completion"""
+
+import base64
+import hashlib
+import os
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlmodel import select
+
+from app.auth import create_access_token
+from app.main import app
+from app.models.file import FilePermission, FileUpload, UploadChunk, UploadSession
+from app.models.user import User
+from app.resumable_uploads import OffsetMismatchError, append_chunk
+
+DATA = b"%PDF-1.4 " + bytes(range(256)) * 4
+
+
+@pytest.fixture
+def client(session):
+    session.add(User(id="admin", email="admin@example.com", name="Admin", hashed_password="x", role="admin"))
+    session.add(User(id="u1", email="u1@example.com", name="U1", hashed_password="x"))
+    session.commit()
+    session.add(FilePermission(user_id="u1", granted_by="admin"))
+    session.commit()
+
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {create_access_token({'sub': 'u1'})}"
+    return client
+
+
+def _start(client, data: bytes = DATA) -> str:
+    response = client.post("/api/files/uploads", json={
+        "filename": "report.pdf", "size": len(data), "sha256": hashlib.sha256(data).hexdigest()
+    })
+    assert response.status_code == 201
+    assert response.headers["Upload-Offset"] == "0"
+    return response.headers["Location"]
+
+
+def _patch(client, location: str, offset: int, chunk: bytes, **headers):
+    return client.patch(location, content=chunk, headers={
+        "Content-Type": "application/offset+octet-stream", "Upload-Offset": str(offset), **headers
+    })
+
+
+def test_chunks_advance_the_offset_and_complete_into_one_file(client, session):
+    location = _start(client)
+
+    assert _patch(client, location, 0, DATA[:500]).headers["Upload-Offset"] == "500"
+    assert client.head(location).headers["Upload-Offset"] == "500"
+    assert _patch(client, location, 500, DATA[500:]).headers["Upload-Offset"] == str(len(DATA))
+
+    response = client.post(f"{location}/complete")
+    assert response.status_code == 200
+    assert response.json()["file_size"] == len(DATA)
+
+    upload = session.exec(select(FileUpload)).one()
+    assert upload.content_hash == hashlib.sha256(DATA).hexdigest()
+    assert session.exec(select(UploadSession)).all() == []
+    assert session.exec(select(UploadChunk)).all() == []
+
+
+def test_chunk_at_the_wrong_offset_is_rejected_with_the_current_offset(client):
+    location = _start(client)
+    _patch(client, location, 0, DATA[:500])
+
+    for offset in (0, 400, 600):
+        response = _patch(client, location, offset, DATA[offset:offset + 100])
+        assert response.status_code == 409
+        assert response.headers["Upload-Offset"] == "500"
+
+    assert client.get(location).json()["offset"] == 500
+
+
+def test_chunk_with_a_bad_checksum_is_discarded(client):
+    location = _start(client)
+    wrong = base64.b64encode(hashlib.sha256(b"something else").digest()).decode()
+
+    response = _patch(client, location, 0, DATA[:500], **{"Upload-Checksum": f"sha256 {wrong}"})
+    assert response.status_code == 460
+    assert client.head(location).headers["Upload-Offset"] == "0"
+
+    right = base64.b64encode(hashlib.sha256(DATA[:500]).digest()).decode()
+    response = _patch(client, location, 0, DATA[:500], **{"Upload-Checksum": f"sha256 {right}"})
+    assert response.headers["Upload-Offset"] == "500"
+
+
+def test_chunk_past_the_declared_size_is_refused(client):
+    location = _start(client)
+
+    response = _patch(client, location, 0, DATA + b"extra")
+    assert response.status_code == 413
+    assert client.head(location).headers["Upload-Offset"] == "0"
+
+
+def test_incomplete_upload_cannot_be_completed(client, session):
+    location = _start(client)
+    _patch(client, location, 0, DATA[:500])
+
+    response = client.post(f"{location}/complete")
+    assert response.status_code == 409
+    assert response.headers["Upload-Offset"] == "500"
+    assert session.exec(select(FileUpload)).all() == []
+
+
+def test_append_rechecks_the_offset_under_the_lock(client, session, tmp_path):
+    # Two requests for the same range both passed the route's early check
+    location = _start(client)
+    upload_id = location.rsplit("/", 1)[1]
+
+    paths = []
+    for name in ("first", "second"):
+        path = tmp_path / name
+        path.write_bytes(DATA[:500])
+        paths.append(str(path))
+    digest = hashlib.sha256(DATA[:500]).hexdigest()
+
+    assert append_chunk(session, upload_id, 0, paths[0], 500, digest) == 500
+    with pytest.raises(OffsetMismatchError) as e:
+        append_chunk(session, upload_id, 0, paths[1], 500, digest)
+
+    assert e.value.expected == 500
+    assert len(session.exec(select(UploadChunk)).all()) == 1
+    assert not any(os.path.exists(path) for path in paths)
@@ -0,0 +1,79 @@
+"""S3 storage backend against a local moto server"""
+
+import os
+import socket
+import urllib.request
+
+import pytest
+
+moto_server = pytest.importorskip("moto.server")
+
+from app.storage import S3Storage  # noqa: E402
+
+
+@pytest.fixture
+def s3_endpoint():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    os.environ.setdefault("AWS_ACCESS_KEY_ID", "testing")
+    os.environ.setdefault("AWS_SECRET_ACCESS_KEY", "testing")
+    server = moto_server.ThreadedMotoServer(ip_address="127.0.0.1", port=port)
+    server.start()
+    yield f"http://127.0.0.1:{port}"
+    server.stop()
+
+
+@pytest.fixture
+def storage(s3_endpoint):
+    backend = S3Storage(bucket="taskflow-test", prefix="blobs/", endpoint_url=s3_endpoint, max_pool_connections=4)
+    backend.client.create_bucket(Bucket="taskflow-test")
+    return backend
+
+
+def _temp_file(tmp_path, content: bytes) -> str:
+    path = tmp_path / "upload.tmp"
+    path.write_bytes(content)
+    return str(path)
+
+
+def test_put_consumes_source_and_stores_object(storage, tmp_path):
+    source = _temp_file(tmp_path, b"hello blob")
+
+    storage.put("ab/cd/abcd", source)
+
+    assert not os.path.exists(source)
+    assert storage.exists("ab/cd/abcd")
+    stored = storage.client.get_object(Bucket="taskflow-test", Key="blobs/ab/cd/abcd")
+    assert stored["Body"].read() == b"hello blob"
+
+
+def test_local_copy_yields_bytes_and_cleans_up(storage, tmp_path):
+    storage.put("ab/cd/abcd", _temp_file(tmp_path, b"page text"))
+
+    with storage.local_copy("ab/cd/abcd") as path:
+        with open(path, "rb") as f:
+            assert f.read() == b"page text"
+
+    assert not os.path.exists(path)
+
+
+def test_presigned_url_downloads_with_filename(storage, tmp_path):
+    storage.put("ab/cd/abcd", _temp_file(tmp_path, b"%PDF-1.4"))
+
+    url = storage.presigned_url("ab/cd/abcd", "Quarterly report.pdf", "application/pdf")
+
+    with urllib.request.urlopen(url) as response:
+        assert response.read() == b"%PDF-1.4"
+        assert response.headers["Content-Type"] == "application/pdf"
+        assert "Quarterly%20report.pdf" in response.headers["Content-Disposition"]
+
+
+def test_delete_removes_object_and_ignores_missing_keys(storage, tmp_path):
+    storage.put("ab/cd/abcd", _temp_file(tmp_path, b"bytes"))
+
+    storage.delete("ab/cd/abcd")
+    storage.delete("ab/cd/abcd")
+
+    assert not storage.exists("ab/cd/abcd")
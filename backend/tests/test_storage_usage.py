@@ -0,0 +1,79 @@
+"""Per-user quota counters: reservation, release and reconciliation"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.file import FileUpload, UserStorageUsage
+from app.models.user import User
+from app.storage_usage import get_usage, reconcile_storage_usage, release_upload, reserve_upload
+
+
+@pytest.fixture
+def user(session):
+    session.add(User(id="u1", email="u1@example.com", name="U1", hashed_password="x"))
+    session.commit()
+    return "u1"
+
+
+def _add_upload(session, user_id: str, size: int):
+    session.add(FileUpload(
+        user_id=user_id, filename="f", original_filename="f.pdf", file_path="f", file_size=size, file_type="pdf"
+    ))
+    session.commit()
+
+
+def test_new_users_have_no_usage(session, user):
+    assert get_usage(session, user) == (0, 0)
+
+
+def test_reservations_count_files_and_bytes_up_to_the_limit(session, user):
+    assert reserve_upload(session, user, 100, max_files=2)
+    assert reserve_upload(session, user, 50, max_files=2)
+    assert not reserve_upload(session, user, 10, max_files=2)
+
+    assert get_usage(session, user) == (2, 150)
+
+
+def test_unlimited_users_are_never_refused(session, user):
+    for _ in range(5):
+        assert reserve_upload(session, user, 1, max_files=None)
+
+    assert get_usage(session, user) == (5, 5)
+
+
+def test_release_frees_a_slot(session, user):
+    reserve_upload(session, user, 100, max_files=1)
+    release_upload(session, user, 100)
+    session.commit()
+
+    assert get_usage(session, user) == (0, 0)
+    assert reserve_upload(session, user, 20, max_files=1)
+
+
+def test_reconcile_fixes_stale_drift_only(session, user):
+    _add_upload(session, user, 300)
+    reserve_upload(session, user, 300, max_files=None)
+    reserve_upload(session, user, 999, max_files=None)  # Upload that died before its row was stored
+
+    assert reconcile_storage_usage() == 0  # Still within the grace period
+    session.expire_all()
+    assert get_usage(session, user) == (2, 1299)
+
+    usage = session.get(UserStorageUsage, user)
+    usage.updated_at = datetime.utcnow() - timedelta(hours=1)
+    session.add(usage)
+    session.commit()
+
+    assert reconcile_storage_usage() == 1
+    session.expire_all()
+    assert get_usage(session, user) == (1, 300)
+
+
+def test_reconcile_creates_missing_usage_rows(session, user):
+    _add_upload(session, user, 40)
+    _add_upload(session, user, 60)
+
+    assert reconcile_storage_usage() == 1
+    session.expire_all()
+    assert get_usage(session, user) == (2, 100)